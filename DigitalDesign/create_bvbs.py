@@ -1,7 +1,9 @@
 import math
+from typing import Optional
 
 from DigitalDesign.get_data import ShearWallData
 from DigitalDesign.ifc_core import IfcDocument
+from DoubleWallDesign.instrumentation import count, span
 from DoubleWallDesign.models import RebarforBVBS, RebarBVBS
 
 """
@@ -91,25 +93,35 @@ class BVBS():
         return checksum_string
 
 
-def create_bvbs(ifc_doc: IfcDocument, rebar_for_BVBS: RebarforBVBS, shear_wall_data: ShearWallData):
+def create_bvbs(ifc_doc: IfcDocument, rebar_for_BVBS: RebarforBVBS, shear_wall_data: ShearWallData,
+                file_name: Optional[str] = "../bvbs_code.abs") -> str:
+    """
+    生成 BVBS 加工数据
+    :param file_name: 保存路径,为 None 时不保存
+    :return: BVBS 文本
+    """
     detailed_design_result = shear_wall_data.detailed_design_result
     detailed_design = shear_wall_data.detailed_design_result.detailed_design
     ascii_strings = ''
-    for attr, type in rebar_for_BVBS.__dict__.items():
-        for value in type:
-            value: RebarBVBS
-            bvbs = BVBS(project_number=value.project_ID, schedule_number=value.shear_wall_ID, bar_mark=str(value.mark),
-                        bar_length=str(value.rebar_length), bar_quantity=str(value.rebar_quantity),
-                        bar_diameter=str(value.rebar_diameter), steel_grade=value.rebar_grade,
-                        mandrel_diameter=str(value.mandrel_diameter))
-            ascii_strings += bvbs.create_BF2D(Geometry_block=value.geometric)
+    with span("bvbs.create"):
+        for attr, type in rebar_for_BVBS.__dict__.items():
+            for value in type:
+                value: RebarBVBS
+                bvbs = BVBS(project_number=value.project_ID, schedule_number=value.shear_wall_ID,
+                            bar_mark=str(value.mark), bar_length=str(value.rebar_length),
+                            bar_quantity=str(value.rebar_quantity), bar_diameter=str(value.rebar_diameter),
+                            steel_grade=value.rebar_grade, mandrel_diameter=str(value.mandrel_diameter))
+                ascii_strings += bvbs.create_BF2D(Geometry_block=value.geometric)
+            count("bvbs.records", len(type))
 
-    save_string_to_file(ascii_strings)
+    if file_name is not None:
+        save_string_to_file(ascii_strings, file_name)
+    return ascii_strings
 
 
 # Saves the resulting string to the directory runnning the script.
-def save_string_to_file(ascii_strings):
-    with open("../bvbs_code.abs", "w") as f:
+def save_string_to_file(ascii_strings, file_name: str = "../bvbs_code.abs"):
+    with open(file_name, "w") as f:
         try:
             f.write(ascii_strings)
             f.close()
@@ -9,7 +9,7 @@ import math
 from typing import List
 
 import numpy as np
-from dc_rebar import Rebar, IndexedPolyCurve
+from dc_rebar import Rebar, IndexedPolyCurve, PointArray
 
 from RebarLayout.fcl_models import Rebar_fcl, Box_fcl, Cylinder_fcl
 from DoubleWallDesign.models import DetailedDesignResult, ShearWallType, RebarDiamSpac, WallLengthType, \
@@ -345,36 +345,40 @@ class ShearWallData:
                                              mandrel_diameter=mandrel_diameter_min,
                                              geometric=exterior_geometric))
         transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), np.array([[1, 0, 0]]))
+        interior_horizontal_rebar_max_points = PointArray.pack(interior_horizontal_rebar_max)
         for i in range(len(interior_horizontal_rebar_max)):
             rebars_BIM.append(Rebar(radius=int(self.horizontal_rebar_dia_max / 2),
-                                    poly=IndexedPolyCurve(interior_horizontal_rebar_max[i])))
+                                    poly=IndexedPolyCurve.from_array(interior_horizontal_rebar_max_points[i])))
             position = np.array(
                 [(interior_horizontal_rebar_max[i][0][0] + interior_horizontal_rebar_max[i][1][0]) / 2,
                  (interior_horizontal_rebar_max[i][0][1] + interior_horizontal_rebar_max[i][1][1]) / 2,
                  (interior_horizontal_rebar_max[i][0][2] + interior_horizontal_rebar_max[i][1][2]) / 2])
             rebars_objs.append(Rebar_fcl(diameter=self.horizontal_rebar_dia_max, length=interior_rebar_length,
                                          transformation=transformation, position=position))
+        interior_horizontal_rebar_min_points = PointArray.pack(interior_horizontal_rebar_min)
         for i in range(len(interior_horizontal_rebar_min)):
             rebars_BIM.append(Rebar(radius=int(self.horizontal_rebar_dia_min / 2),
-                                    poly=IndexedPolyCurve(interior_horizontal_rebar_min[i])))
+                                    poly=IndexedPolyCurve.from_array(interior_horizontal_rebar_min_points[i])))
             position = np.array(
                 [(interior_horizontal_rebar_min[i][0][0] + interior_horizontal_rebar_min[i][1][0]) / 2,
                  (interior_horizontal_rebar_min[i][0][1] + interior_horizontal_rebar_min[i][1][1]) / 2,
                  (interior_horizontal_rebar_min[i][0][2] + interior_horizontal_rebar_min[i][1][2]) / 2])
             rebars_objs.append(Rebar_fcl(diameter=self.horizontal_rebar_dia_min, length=interior_rebar_length,
                                          transformation=transformation, position=position))
+        exterior_horizontal_rebar_max_points = PointArray.pack(exterior_horizontal_rebar_max)
         for i in range(len(exterior_horizontal_rebar_max)):
             rebars_BIM.append(Rebar(radius=int(self.horizontal_rebar_dia_max / 2),
-                                    poly=IndexedPolyCurve(exterior_horizontal_rebar_max[i])))
+                                    poly=IndexedPolyCurve.from_array(exterior_horizontal_rebar_max_points[i])))
             position = np.array(
                 [(exterior_horizontal_rebar_max[i][0][0] + exterior_horizontal_rebar_max[i][1][0]) / 2,
                  (exterior_horizontal_rebar_max[i][0][1] + exterior_horizontal_rebar_max[i][1][1]) / 2,
                  (exterior_horizontal_rebar_max[i][0][2] + exterior_horizontal_rebar_max[i][1][2]) / 2])
             rebars_objs.append(Rebar_fcl(diameter=self.horizontal_rebar_dia_max, length=exterior_rebar_length,
                                          transformation=transformation, position=position))
+        exterior_horizontal_rebar_min_points = PointArray.pack(exterior_horizontal_rebar_min)
         for i in range(len(exterior_horizontal_rebar_min)):
             rebars_BIM.append(Rebar(radius=int(self.horizontal_rebar_dia_min / 2),
-                                    poly=IndexedPolyCurve(exterior_horizontal_rebar_min[i])))
+                                    poly=IndexedPolyCurve.from_array(exterior_horizontal_rebar_min_points[i])))
             position = np.array(
                 [(exterior_horizontal_rebar_min[i][0][0] + exterior_horizontal_rebar_min[i][1][0]) / 2,
                  (exterior_horizontal_rebar_min[i][0][1] + exterior_horizontal_rebar_min[i][1][1]) / 2,
@@ -566,36 +570,40 @@ class ShearWallData:
                                              mandrel_diameter=mandrel_diameter_min,
                                              geometric=exterior_geometric))
         transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), np.array([[0, 0, 1]]))
+        interior_vertical_rebar_max_points = PointArray.pack(interior_vertical_rebar_max)
         for i in range(len(interior_vertical_rebar_max)):
             rebars_BIM.append(Rebar(radius=int(self.vertical_rebar_dia_max / 2),
-                                    poly=IndexedPolyCurve(interior_vertical_rebar_max[i])))
+                                    poly=IndexedPolyCurve.from_array(interior_vertical_rebar_max_points[i])))
             position = np.array(
                 [(interior_vertical_rebar_max[i][0][0] + interior_vertical_rebar_max[i][1][0]) / 2,
                  (interior_vertical_rebar_max[i][0][1] + interior_vertical_rebar_max[i][1][1]) / 2,
                  (interior_vertical_rebar_max[i][0][2] + interior_vertical_rebar_max[i][1][2]) / 2])
             rebars_objs.append(Rebar_fcl(diameter=self.vertical_rebar_dia_max, length=interior_rebar_length,
                                          transformation=transformation, position=position))
+        interior_vertical_rebar_min_points = PointArray.pack(interior_vertical_rebar_min)
         for i in range(len(interior_vertical_rebar_min)):
             rebars_BIM.append(Rebar(radius=int(self.vertical_rebar_dia_min / 2),
-                                    poly=IndexedPolyCurve(interior_vertical_rebar_min[i])))
+                                    poly=IndexedPolyCurve.from_array(interior_vertical_rebar_min_points[i])))
             position = np.array(
                 [(interior_vertical_rebar_min[i][0][0] + interior_vertical_rebar_min[i][1][0]) / 2,
                  (interior_vertical_rebar_min[i][0][1] + interior_vertical_rebar_min[i][1][1]) / 2,
                  (interior_vertical_rebar_min[i][0][2] + interior_vertical_rebar_min[i][1][2]) / 2])
             rebars_objs.append(Rebar_fcl(diameter=self.vertical_rebar_dia_min, length=interior_rebar_length,
                                          transformation=transformation, position=position))
+        exterior_vertical_rebar_max_points = PointArray.pack(exterior_vertical_rebar_max)
         for i in range(len(exterior_vertical_rebar_max)):
             rebars_BIM.append(Rebar(radius=int(self.vertical_rebar_dia_max / 2),
-                                    poly=IndexedPolyCurve(exterior_vertical_rebar_max[i])))
+                                    poly=IndexedPolyCurve.from_array(exterior_vertical_rebar_max_points[i])))
             position = np.array(
                 [(exterior_vertical_rebar_max[i][0][0] + exterior_vertical_rebar_max[i][1][0]) / 2,
                  (exterior_vertical_rebar_max[i][0][1] + exterior_vertical_rebar_max[i][1][1]) / 2,
                  (exterior_vertical_rebar_max[i][0][2] + exterior_vertical_rebar_max[i][1][2]) / 2])
             rebars_objs.append(Rebar_fcl(diameter=self.vertical_rebar_dia_max, length=exterior_rebar_length,
                                          transformation=transformation, position=position))
+        exterior_vertical_rebar_min_points = PointArray.pack(exterior_vertical_rebar_min)
         for i in range(len(exterior_vertical_rebar_min)):
             rebars_BIM.append(Rebar(radius=int(self.vertical_rebar_dia_min / 2),
-                                    poly=IndexedPolyCurve(exterior_vertical_rebar_min[i])))
+                                    poly=IndexedPolyCurve.from_array(exterior_vertical_rebar_min_points[i])))
             position = np.array(
                 [(exterior_vertical_rebar_min[i][0][0] + exterior_vertical_rebar_min[i][1][0]) / 2,
                  (exterior_vertical_rebar_min[i][0][1] + exterior_vertical_rebar_min[i][1][1]) / 2,
@@ -746,15 +754,15 @@ class ShearWallData:
                                (2 * j + 1) * self.truss_detailed.diagonal_rebar.spacing / 2)])
             truss_rebar_for_ifc = TrussRebar(
                 top_rebar=Rebar(radius=int(self.truss_detailed.top_rebar.diameter / 2),
-                                poly=IndexedPolyCurve(top_rebar_poly)),
+                                poly=IndexedPolyCurve.from_array(top_rebar_poly)),
                 bottom_rebar_left=Rebar(radius=int(self.truss_detailed.bottom_rebar.diameter / 2),
-                                        poly=IndexedPolyCurve(bottom_rebar_left_poly)),
+                                        poly=IndexedPolyCurve.from_array(bottom_rebar_left_poly)),
                 bottom_rebar_right=Rebar(radius=int(self.truss_detailed.bottom_rebar.diameter / 2),
-                                         poly=IndexedPolyCurve(bottom_rebar_right_poly)),
+                                         poly=IndexedPolyCurve.from_array(bottom_rebar_right_poly)),
                 diagonal_rebar_left=Rebar(radius=int(self.truss_detailed.diagonal_rebar.diameter / 2),
-                                          poly=IndexedPolyCurve(diagonal_rebar_left_poly)),
+                                          poly=IndexedPolyCurve.from_array(diagonal_rebar_left_poly)),
                 diagonal_rebar_right=Rebar(radius=int(self.truss_detailed.diagonal_rebar.diameter / 2),
-                                           poly=IndexedPolyCurve(diagonal_rebar_right_poly)))
+                                           poly=IndexedPolyCurve.from_array(diagonal_rebar_right_poly)))
 
             truss_rebar_for_bim.truss_rebars.append(truss_rebar_for_ifc)
         return truss_rebar_for_bim
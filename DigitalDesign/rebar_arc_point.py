@@ -34,17 +34,15 @@ def rebar_arc(rebar: Rebar, rebar_grade=1):
     else:
         bending_radius = 2.5 * radius
 
-    points = rebar.poly.points
+    points = rebar.poly.point_array  # (N, 3)
     poly_curve_points = []
     seg_s = []
     if len(rebar.poly.segments) == 0:
-        poly_curve_points.append([float(points[0].x),
-                                  float(points[0].y),
-                                  float(points[0].z)])
+        poly_curve_points.append(points[0].tolist())
         for i in range(1, len(points) - 1):
             # 定义原本三个点
-            point_mid: np.ndarray = np.asarray([points[i].x, points[i].y, points[i].z])
-            point_next: np.ndarray = np.asarray([points[i + 1].x, points[i + 1].y, points[i + 1].z])  # 下一个点
+            point_mid: np.ndarray = points[i]
+            point_next: np.ndarray = points[i + 1]  # 下一个点
             last_point = np.asarray(poly_curve_points[- 1])
             # 计算向量
             v_m_2_s: np.ndarray = (last_point - point_mid) / np.linalg.norm(last_point - point_mid)  # 单位化
@@ -74,14 +72,11 @@ def rebar_arc(rebar: Rebar, rebar_grade=1):
             seg_s.append(Seg(index_s=[start_index, start_index + 1], seg_type="IfcLineIndex"))
             seg_s.append(Seg(index_s=[start_index + 1, start_index + 2, start_index + 3], seg_type="IfcArcIndex"))
 
-        poly_curve_points.append([float(points[-1].x),
-                                  float(points[-1].y),
-                                  float(points[-1].z)])
+        poly_curve_points.append(points[-1].tolist())
         index_use = len(poly_curve_points) - 1
         seg_s.append(Seg(index_s=[index_use, index_use + 1], seg_type="IfcLineIndex"))
     else:
-        for p in points:
-            poly_curve_points.append([float(p.x), float(p.y), float(p.z)])
+        poly_curve_points = points.tolist()
         for segment in rebar.poly.segments:
             if len(segment) == 3:
                 seg_s.append(Seg(index_s=segment, seg_type="IfcArcIndex"))
@@ -11,6 +11,7 @@ import ifcopenshell
 from ifcopenshell.entity_instance import entity_instance
 
 from DigitalDesign.ifc_core import IfcDocument
+from DoubleWallDesign.instrumentation import span
 from DoubleWallDesign.models import RebarforBIM, ConcreteParameter, RebarParameter, \
     TrussRebarforBIM
 from DigitalDesign.get_data import ShearWallData
@@ -22,7 +23,8 @@ def create_ifc_doc(header_file: Optional[dict] = None, init_doc: Optional[dict]
     return ifc_doc
 
 
-def create_shear_wall_ifc(ifc_doc: IfcDocument, rebar_data: RebarforBIM, truss_rebar_data:TrussRebarforBIM, shear_wall_data: ShearWallData):
+def create_shear_wall_ifc(ifc_doc: IfcDocument, rebar_data: RebarforBIM, truss_rebar_data:TrussRebarforBIM, shear_wall_data: ShearWallData,
+                          save: bool = True):
     schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(ifc_doc._schema.name())
     ifc_ReinforcingBarSurfaceEnum = schema.declaration_by_name("IfcReinforcingBarSurfaceEnum")
     ifc_ReinforcingBarTypeEnum = schema.declaration_by_name("IfcReinforcingBarTypeEnum")
@@ -139,17 +141,20 @@ def create_shear_wall_ifc(ifc_doc: IfcDocument, rebar_data: RebarforBIM, truss_r
     truss_rebars_ifc = ifc_doc.create_truss_rebars(shear_wall_placement, truss_rebar_data, shear_wall_data, shear_wall,
                                                    building_storey)
 
-    with open(ifc_doc.ifcfile.wrapped_data.header.file_name.name, "w") as f:
-        f.write(ifc_doc.ifcfile.to_string())
+    if save:  # 保存至当前目录,文件名取自文件头
+        with open(ifc_doc.ifcfile.wrapped_data.header.file_name.name, "w") as f:
+            f.write(ifc_doc.ifcfile.to_string())
     return ifc_doc
 
 
-def shear_wall_IFC_creation(rebar_data: RebarforBIM, truss_rebar_data: TrussRebarforBIM, shear_wall_data: ShearWallData):
+def shear_wall_IFC_creation(rebar_data: RebarforBIM, truss_rebar_data: TrussRebarforBIM, shear_wall_data: ShearWallData,
+                            save: bool = True):
     '''
     绘制楼梯主体并绑定到指定位置,同时绘制开洞
     :param rebar_data:
     :param truss_rebar_for_BIM:
     :param shear_wall_data:
+    :param save: 是否保存至当前目录,为 False 时由调用方通过 ifc_doc.ifcfile.write 保存
     :return: ifc
     '''
 
@@ -162,6 +167,8 @@ def shear_wall_IFC_creation(rebar_data: RebarforBIM, truss_rebar_data: TrussReba
     ifc_doc = create_ifc_doc(header_file, init_doc)
 
     ifc_doc = create_ifc_doc()
-    ifc_doc = create_shear_wall_ifc(ifc_doc, rebar_data, truss_rebar_data, shear_wall_data)
-    print("IFC文件保存成功!!!")
+    with span("ifc.create"):
+        ifc_doc = create_shear_wall_ifc(ifc_doc, rebar_data, truss_rebar_data, shear_wall_data, save=save)
+    if save:
+        print("IFC文件保存成功!!!")
     return ifc_doc
@@ -0,0 +1,397 @@
+"""
+深化设计结果与钢筋数据的二进制编码
+
+用于缓存与进程间传递 DetailedDesignResult、RebarforBIM、RebarforBVBS、TrussRebarforBIM 等数据类,
+比 asdict + json 更紧凑,且解码后保持原有类型(枚举、嵌套数据类、PointArray)。
+
+格式(小端):
+    b"DWDC" | 版本(uint8) | 类表 | 值 | 点数组表
+- 类表记录编码中用到的数据类与枚举的名称及字段名,解码时按字段名赋值,字段顺序变化不影响解码
+- 值以 1 字节类型标记开头,数据类只写字段值;重复的字符串只写一次,之后以序号引用
+- 点数据以数组整体写入: PointArray 按共享的存储数组写一次,由 PointArray.pack
+  生成的多根钢筋解码后仍共享同一数组;坐标均可由 float32 精确表示时以 float32 写入,否则为 float64;
+  坐标均为 float 的 List[Point3D] 以 float64 数组写入
+
+只能解码 DoubleWallDesign.models 与 dc_rebar 中定义的数据类和枚举。
+解码时不执行数据类的 __init__ 与强制类型转换,得到与编码前相等的对象
+"""
+import copy
+import struct
+from dataclasses import MISSING, fields, is_dataclass
+from enum import Enum
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+import dc_rebar
+from DoubleWallDesign import models
+from dc_rebar import Point3D, PointArray
+
+MAGIC = b"DWDC"
+VERSION = 1
+
+_NONE, _TRUE, _FALSE = 0, 1, 2
+_INT8, _INT32, _INT64, _BIGINT = 3, 4, 5, 6
+_FLOAT = 7
+_STR, _STR_REF = 8, 9
+_LIST, _TUPLE, _DICT = 10, 11, 12
+_ENUM, _DATACLASS = 13, 14
+_POINT_ARRAY, _POINT_LIST = 15, 16
+
+_CLASS_DATACLASS, _CLASS_ENUM = 0, 1
+
+_FLOAT64, _FLOAT32 = 0, 1
+_DTYPES = {_FLOAT64: np.dtype("<f8"), _FLOAT32: np.dtype("<f4")}
+
+_B = struct.Struct("<B")
+_H = struct.Struct("<H")
+_I = struct.Struct("<I")
+_b = struct.Struct("<b")
+_i = struct.Struct("<i")
+_q = struct.Struct("<q")
+_d = struct.Struct("<d")
+_BH = struct.Struct("<BH")
+_BI = struct.Struct("<BI")
+_Bb = struct.Struct("<Bb")
+_Bi = struct.Struct("<Bi")
+_Bq = struct.Struct("<Bq")
+_Bd = struct.Struct("<Bd")
+_BIII = struct.Struct("<BIII")
+_III = struct.Struct("<III")
+_HEADER = struct.Struct("<4sB")
+
+
+class CodecError(ValueError):
+    """
+    数据无法编码或解码
+    """
+
+
+def _class_name(cls) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _registry() -> Dict[str, type]:
+    registry = {}
+    for module in (models, dc_rebar):
+        for value in vars(module).values():
+            if isinstance(value, type) and value.__module__ == module.__name__ and (
+                is_dataclass(value) or issubclass(value, Enum)
+            ):
+                registry[_class_name(value)] = value
+    return registry
+
+
+_REGISTRY = _registry()
+
+
+class _Encoder:
+    def __init__(self):
+        self.out = bytearray()
+        self.classes: Dict[type, Tuple[int, Tuple[str, ...]]] = {}
+        self.strings: Dict[str, int] = {}
+        self.buffers: Dict[int, int] = {}
+        self.buffer_arrays: List[np.ndarray] = []
+
+    def class_index(self, cls) -> Tuple[int, Tuple[str, ...]]:
+        entry = self.classes.get(cls)
+        if entry is None:
+            if _REGISTRY.get(_class_name(cls)) is not cls:
+                raise CodecError(f"不支持编码的类型:{_class_name(cls)}")
+            names = tuple(f.name for f in fields(cls)) if is_dataclass(cls) else ()
+            entry = self.classes[cls] = (len(self.classes), names)
+        return entry
+
+    def buffer_index(self, data: np.ndarray) -> int:
+        index = self.buffers.get(id(data))
+        if index is None:
+            index = self.buffers[id(data)] = len(self.buffer_arrays)
+            self.buffer_arrays.append(data)  # 保持引用,避免 id 被复用
+        return index
+
+    def value(self, value: Any):
+        out = self.out
+        kind = type(value)
+        if value is None:
+            out += _B.pack(_NONE)
+        elif kind is bool:
+            out += _B.pack(_TRUE if value else _FALSE)
+        elif kind is float:
+            out += _Bd.pack(_FLOAT, value)
+        elif kind is int:
+            if -0x80 <= value < 0x80:
+                out += _Bb.pack(_INT8, value)
+            elif -0x80000000 <= value < 0x80000000:
+                out += _Bi.pack(_INT32, value)
+            elif -0x8000000000000000 <= value < 0x8000000000000000:
+                out += _Bq.pack(_INT64, value)
+            else:
+                self.text(_BIGINT, str(value))
+        elif kind is str:
+            index = self.strings.get(value)
+            if index is None:
+                self.strings[value] = len(self.strings)
+                self.text(_STR, value)
+            else:
+                out += _BI.pack(_STR_REF, index)
+        elif kind is PointArray:
+            data, start, stop = value.storage
+            out += _BIII.pack(_POINT_ARRAY, self.buffer_index(data), start, stop)
+        elif kind is list and value and _is_float_points(value):
+            out += _BI.pack(_POINT_LIST, len(value))
+            out += np.array([(p.x, p.y, p.z) for p in value], dtype="<f8").tobytes()
+        elif kind is list or kind is tuple:
+            out += _BI.pack(_LIST if kind is list else _TUPLE, len(value))
+            for item in value:
+                self.value(item)
+        elif isinstance(value, dict):
+            # 序列化器生成的 ReturnDict 等按 dict 编码
+            out += _BI.pack(_DICT, len(value))
+            for key, item in value.items():
+                self.value(key)
+                self.value(item)
+        elif isinstance(value, Enum):
+            index, _ = self.class_index(kind)
+            out += _BH.pack(_ENUM, index)
+            self.value(value.value)
+        elif is_dataclass(value):
+            index, names = self.class_index(kind)
+            out += _BH.pack(_DATACLASS, index)
+            for name in names:
+                self.value(getattr(value, name))
+        elif isinstance(value, (np.integer, np.floating)):
+            self.value(value.item())
+        else:
+            raise CodecError(f"不支持编码的类型:{kind.__name__}")
+
+    def text(self, tag: int, value: str):
+        data = value.encode("utf-8")
+        self.out += _BI.pack(tag, len(data))
+        self.out += data
+
+    def finish(self) -> bytes:
+        head = bytearray(_HEADER.pack(MAGIC, VERSION))
+        head += _H.pack(len(self.classes))
+        for cls, (_, names) in sorted(self.classes.items(), key=lambda item: item[1][0]):
+            head += _B.pack(_CLASS_ENUM if issubclass(cls, Enum) else _CLASS_DATACLASS)
+            head += _H.pack(len(names))
+            for name in (_class_name(cls),) + names:
+                data = name.encode("utf-8")
+                head += _H.pack(len(data))
+                head += data
+        tail = bytearray(_I.pack(len(self.buffer_arrays)))
+        for data in self.buffer_arrays:
+            # 坐标可由 float32 精确表示时(如整数毫米)按 float32 写入
+            single = data.astype("<f4")
+            exact = bool(np.array_equal(single, data))
+            tail += _BI.pack(_FLOAT32 if exact else _FLOAT64, data.shape[0])
+            tail += single.tobytes() if exact else np.ascontiguousarray(data, dtype="<f8").tobytes()
+        return bytes(head + self.out + tail)
+
+
+class _Decoder:
+    """
+    数据不完整时 struct.unpack_from 抛出 struct.error,由 decode 统一转换为 CodecError
+    """
+
+    def __init__(self, data: bytes):
+        self.data = bytes(data)
+        self.offset = 0
+        # (类, 字段名, 编码后新增字段的默认值)
+        self.classes: List[Tuple[type, Tuple[str, ...], Tuple[Tuple[str, Any], ...]]] = []
+        self.strings: List[str] = []
+        self.point_arrays: List[Tuple[PointArray, int, int, int]] = []  # 点数组表在值之后,读取后再填充数据
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def read(self, size: int) -> bytes:
+        end = self.offset + size
+        if end > len(self.data):
+            raise CodecError("数据不完整")
+        chunk = self.data[self.offset: end]
+        self.offset = end
+        return chunk
+
+    def name(self) -> str:
+        size, = self.unpack(_H)
+        return self.read(size).decode("utf-8")
+
+    def header(self):
+        magic, version = self.unpack(_HEADER)
+        if magic != MAGIC:
+            raise CodecError("不是深化设计二进制数据")
+        if version != VERSION:
+            raise CodecError(f"不支持的版本:{version}")
+        number, = self.unpack(_H)
+        for _ in range(number):
+            kind, field_number = self.unpack(_BH)
+            name = self.name()
+            cls = _REGISTRY.get(name)
+            if cls is None or (kind == _CLASS_ENUM) != issubclass(cls, Enum):
+                raise CodecError(f"未知的类型:{name}")
+            names = tuple(self.name() for _ in range(field_number))
+            self.classes.append((cls, names, _missing_defaults(cls, names) if kind == _CLASS_DATACLASS else ()))
+
+    def value(self) -> Any:
+        data = self.data
+        offset = self.offset
+        tag = data[offset]
+        offset += 1
+        if tag == _DATACLASS:
+            index, = _H.unpack_from(data, offset)
+            self.offset = offset + 2
+            cls, names, defaults = self.classes[index]
+            obj = cls.__new__(cls)
+            for name in names:
+                object.__setattr__(obj, name, self.value())
+            for name, default in defaults:
+                object.__setattr__(obj, name, default())
+            return obj
+        if tag == _INT8:
+            self.offset = offset + 1
+            return _b.unpack_from(data, offset)[0]
+        if tag == _FLOAT:
+            self.offset = offset + 8
+            return _d.unpack_from(data, offset)[0]
+        if tag == _NONE:
+            self.offset = offset
+            return None
+        if tag == _POINT_ARRAY:
+            buffer, start, stop = _III.unpack_from(data, offset)
+            self.offset = offset + 12
+            points = PointArray.__new__(PointArray)
+            self.point_arrays.append((points, buffer, start, stop))
+            return points
+        if tag == _LIST or tag == _TUPLE:
+            number, = _I.unpack_from(data, offset)
+            self.offset = offset + 4
+            items = [self.value() for _ in range(number)]
+            return items if tag == _LIST else tuple(items)
+        if tag == _STR_REF:
+            index, = _I.unpack_from(data, offset)
+            self.offset = offset + 4
+            return self.strings[index]
+        if tag == _INT32:
+            self.offset = offset + 4
+            return _i.unpack_from(data, offset)[0]
+        if tag == _TRUE or tag == _FALSE:
+            self.offset = offset
+            return tag == _TRUE
+        if tag == _STR:
+            self.offset = offset
+            value = self.text()
+            self.strings.append(value)
+            return value
+        if tag == _POINT_LIST:
+            number, = _I.unpack_from(data, offset)
+            self.offset = offset + 4
+            coordinates = np.frombuffer(self.read(number * 24), dtype="<f8").tolist()
+            points = []
+            for i in range(0, 3 * number, 3):
+                point = Point3D.__new__(Point3D)
+                point.x, point.y, point.z = coordinates[i: i + 3]
+                points.append(point)
+            return points
+        if tag == _DICT:
+            number, = _I.unpack_from(data, offset)
+            self.offset = offset + 4
+            result = {}
+            for _ in range(number):
+                key = self.value()
+                result[key] = self.value()
+            return result
+        if tag == _ENUM:
+            index, = _H.unpack_from(data, offset)
+            self.offset = offset + 2
+            cls = self.classes[index][0]
+            try:
+                return cls(self.value())
+            except ValueError as e:
+                raise CodecError(e)
+        if tag == _INT64:
+            self.offset = offset + 8
+            return _q.unpack_from(data, offset)[0]
+        if tag == _BIGINT:
+            self.offset = offset
+            return int(self.text())
+        raise CodecError(f"未知的类型标记:{tag}")
+
+    def text(self) -> str:
+        size, = self.unpack(_I)
+        return self.read(size).decode("utf-8")
+
+    def buffers(self):
+        number, = self.unpack(_I)
+        arrays = []
+        for _ in range(number):
+            dtype, rows = self.unpack(_BI)
+            if dtype not in _DTYPES:
+                raise CodecError(f"未知的点数组类型:{dtype}")
+            dtype = _DTYPES[dtype]
+            # 复制一次,使解码结果可写
+            data = self.read(rows * 3 * dtype.itemsize)
+            arrays.append(np.frombuffer(data, dtype=dtype).reshape(rows, 3).astype(np.float64))
+        for points, buffer, start, stop in self.point_arrays:
+            if buffer >= number or not 0 <= start <= stop <= arrays[buffer].shape[0]:
+                raise CodecError(f"点数组引用超出范围:{buffer}[{start}:{stop}]")
+            points.__setstate__((arrays[buffer], start, stop))
+
+
+def _missing_defaults(cls, names: Tuple[str, ...]) -> Tuple[Tuple[str, Callable[[], Any]], ...]:
+    """
+    编码后新增的字段取默认值,返回 (字段名, 生成默认值的函数)
+    """
+    defaults = []
+    for f in fields(cls):
+        if f.name in names:
+            continue
+        if f.default is not MISSING:
+            defaults.append((f.name, partial(copy.copy, f.default)))
+        elif f.default_factory is not MISSING:
+            defaults.append((f.name, f.default_factory))
+        else:
+            raise CodecError(f"缺少字段:{_class_name(cls)}.{f.name}")
+    return tuple(defaults)
+
+
+def encode(obj: Any) -> bytes:
+    """
+    编码深化设计数据
+    :param obj: DetailedDesignResult、RebarforBIM、RebarforBVBS、TrussRebarforBIM 等,
+        可以是由这些对象组成的 list / tuple / dict
+    :return:
+    """
+    encoder = _Encoder()
+    encoder.value(obj)
+    return encoder.finish()
+
+
+def decode(data: bytes) -> Any:
+    """
+    解码 encode 生成的数据
+    :param data:
+    :return: 与编码前相等的对象
+    """
+    decoder = _Decoder(data)
+    try:
+        decoder.header()
+        obj = decoder.value()
+        decoder.buffers()
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise CodecError(f"数据不完整或已损坏:{e!r}")
+    if decoder.offset != len(decoder.data):
+        raise CodecError("数据末尾有多余内容")
+    return obj
+
+
+def _is_float_points(value: list) -> bool:
+    for point in value:
+        if type(point) is not Point3D or not (
+            type(point.x) is float and type(point.y) is float and type(point.z) is float
+        ):
+            return False
+    return True
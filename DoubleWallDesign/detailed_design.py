@@ -1,14 +1,19 @@
 import logging
+import multiprocessing
+import pickle
+import time
+from dataclasses import dataclass
 from io import BytesIO
-from typing import IO, Tuple, Any
+from traceback import format_exc
+from typing import IO, Tuple, Any, Optional, Iterable, Iterator
 from docxtpl import DocxTemplate
 
-from DigitalDesign.get_data import ShearWallData
-from RebarLayout.layout_opt import layout_opt
-from DoubleWallDesign.models import RebarDesignMode, ShearWallType, DetailedDesign, DetailedDesignResult, \
-    ConcreteParameter, RebarforBIM, RebarforBVBS, RebarParameter, WallLengthType, TrussRebarMode, WallHole
-from RebarLayout.tools import get_volume, get_area, rebar_opt, truss_design
-from RebarLayout.collision_detection import ShearWallFCLModel
+from DoubleWallDesign import config
+from DoubleWallDesign.instrumentation import MetricsSummary
+from DoubleWallDesign.models import DetailedDesign, ConcreteParameter, RebarParameter, DetailedDesignResult, \
+    RebarforBIM, RebarforBVBS, TrussRebarforBIM
+from DoubleWallDesign.pipeline import DesignPipeline
+from DoubleWallDesign.session import DesignSession
 
 from DoubleWallDesign.tools import (
     DetailedCalculationBook
@@ -17,128 +22,130 @@ from DoubleWallDesign.tools import (
 _logger = logging.getLogger(__name__)
 
 
-def detailed_design(parameter: DetailedDesign):
+def detailed_design(parameter: DetailedDesign, pipeline: Optional[DesignPipeline] = None):
     """
     该部分需要完成结构计算的逻辑,并返回结构计算对应的数据
     :param parameter:
+    :param pipeline: 带阶段缓存的计算流程,为空时各阶段全部重新计算
     :return: ConstructionResult_detailed
     x 墙长， y 墙厚， z墙高
+    只需要部分结果时使用 DesignSession 按需计算
     """
-    assert isinstance(parameter, DetailedDesign), Exception(f"parameter 数据异常")
-
-    # 几何信息
-    shear_wall_type: ShearWallType = parameter.geometric_detailed.shear_wall_type  # 剪力墙类型
-    length: int = parameter.geometric_detailed.length  # 剪力墙长度 mm
-    thickness: int = parameter.geometric_detailed.thickness  # 剪力墙总厚度 mm
-    height: int = parameter.geometric_detailed.height  # 剪力墙总高度 mm
-    interior_thickness: int = parameter.geometric_detailed.interior_thickness  # 内墙厚度
-    exterior_thickness: int = parameter.geometric_detailed.exterior_thickness  # 外墙厚度
-    bottom_gap_height: int = parameter.geometric_detailed.bottom_gap_height  # 底部间隙
-    top_gap_height: int = parameter.geometric_detailed.top_gap_height  # 顶部间隙
-    if shear_wall_type == ShearWallType.INTERIOR:  # 内外墙等高
-        interior_height = height - bottom_gap_height - top_gap_height  # 内墙高度
-        exterior_height = height - bottom_gap_height - top_gap_height  # 外墙高度
-    else:  # shear_wall_type ==ShearWallType.EXTERIOR: # 外墙比内墙高
-        interior_height = height - bottom_gap_height - top_gap_height  # 内墙高度
-        exterior_height = height - bottom_gap_height  # 外墙高度
-    wall_length_type: WallLengthType = parameter.geometric_detailed.wall_length_type  # 内外墙是否等长
-
-    if wall_length_type == WallLengthType.YES:  # 若内外 等长
-        left_gap_length = 0
-        right_gap_length = 0
-        interior_length: int = length  # 内墙长度
-        exterior_length: int = length  # 外墙长度
-    else:  # wall_length_type == WallLengthType.NO:  # 若内外不等长
-        left_gap_length = parameter.geometric_detailed.left_gap_length
-        right_gap_length = parameter.geometric_detailed.right_gap_length
-        interior_length: int = length - left_gap_length - right_gap_length  # 内墙长度
-        exterior_length: int = length  # 外墙长度
-
-    if parameter.geometric_detailed.wall_hole == WallHole.YES:
-        wall_hole_parameter = parameter.geometric_detailed.wall_hole_parameter
-        wall_hole_height = parameter.geometric_detailed.wall_hole_parameter.hole_height
-        wall_hole_length = parameter.geometric_detailed.wall_hole_parameter.hole_length
-        wall_hole_horizontal = parameter.geometric_detailed.wall_hole_parameter.hole_horizontal
-        wall_hole_vertical = parameter.geometric_detailed.wall_hole_parameter.hole_vertical
-
-    else:
-        wall_hole_height = 0
-        wall_hole_length = 0
-        wall_hole_horizontal =0
-        wall_hole_vertical = 0
-    wall_hole_region = [[wall_hole_horizontal - wall_hole_length / 2, wall_hole_vertical - wall_hole_height / 2],
-                        [wall_hole_horizontal + wall_hole_length / 2, wall_hole_vertical + wall_hole_height / 2]]
-
-    cover = parameter.construction_detailed.concrete_cover_thickness
-    # 材料信息
-    concrete_grade = parameter.material.concrete_grade  # 混凝土强度等级 无量纲
-    concrete_parameter = ConcreteParameter.by_grade(concrete_grade)  # 混凝土参数-类
-    rebar_name = parameter.material.rebar_name  # 钢筋强度等级 无量纲
-    rebar_parameter = RebarParameter.by_name(rebar_name)  # 钢筋参数-类
-
-    rc = concrete_parameter.rc  # 混凝土容重
-    # 体积、面积、重量
-    volume = get_volume(interior_length=interior_length, interior_thickness=interior_thickness, interior_height=interior_height,
-                        exterior_length = exterior_length, exterior_thickness=exterior_thickness, exterior_height=exterior_height,
-                        wall_hole_height=wall_hole_height, wall_hole_length=wall_hole_length)  # m^3
-    area = get_area(length=length, interior_height=interior_height, exterior_height=exterior_height)  # m^2
-    weight = rc / 10 * volume  # T
-
-    # 钢筋设计
-    rebar_design_mode = parameter.rebar_detailed.rebar_design_mode
-    if rebar_design_mode == RebarDesignMode.AUTOMATIC:
-        horizontal_rebars_ratio = parameter.rebar_detailed.vertical_rebars_ratio
-        vertical_rebars_ratio = parameter.rebar_detailed.vertical_rebars_ratio
-        horizontal_rebars = rebar_opt(thickness, horizontal_rebars_ratio, interior_thickness, exterior_thickness, cover)
-        vertical_rebars = rebar_opt(thickness, vertical_rebars_ratio, interior_thickness, exterior_thickness, cover)
-    else:  # rebar_design_mode == RebarDesignMode.MANUAL:
-        horizontal_rebars = parameter.rebar_detailed.horizontal_rebars
-        vertical_rebars = parameter.rebar_detailed.vertical_rebars
-    # 桁架钢筋设计
-    truss_rebar_mode = parameter.truss_detailed.truss_rebar_mode
-    if truss_rebar_mode == TrussRebarMode.AUTOMATIC:
-        parameter = truss_design(parameter)
-
-    result = DetailedDesignResult(
-        detailed_design=parameter,
-        interior_height=interior_height,
-        exterior_height=exterior_height,
-        left_gap_length=left_gap_length,
-        right_gap_length=right_gap_length,
-        interior_length=interior_length,
-        exterior_length=exterior_length,
-        volume=volume,
-        area=area,
-        weight=weight,
-        horizontal_rebars=horizontal_rebars,
-        vertical_rebars=vertical_rebars,
+    return DesignSession(parameter, pipeline=pipeline).detailed_design_output()
+
+
+@dataclass
+class DesignOutcome:
+    """
+    批量深化设计中单个墙体的计算结果,失败时 error 不为空
+    """
+    index: int  # 在输入中的序号
+    result: Optional[DetailedDesignResult] = None
+    rebar_for_BIM: Optional[RebarforBIM] = None
+    rebar_for_BVBS: Optional[RebarforBVBS] = None
+    truss_rebar_for_BIM: Optional[TrussRebarforBIM] = None
+    error: Optional[BaseException] = None
+    traceback: Optional[str] = None
+    seconds: float = 0.0  # 计算耗时
+    metrics: Optional[MetricsSummary] = None  # 各阶段耗时与计数
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    @property
+    def shear_wall_data(self):
+        """
+        ShearWallData 含材料配置,不在进程间传递,在当前进程中由计算结果重建
+        """
+        from DigitalDesign.get_data import ShearWallData
+
+        return ShearWallData(detailed_design_result=self.result)
+
+
+def detailed_design_many(
+    parameters: Iterable[DetailedDesign],
+    processes: Optional[int] = None,
+    chunksize: int = 4,
+    max_tasks_per_child: Optional[int] = 50,
+) -> Iterator[DesignOutcome]:
+    """
+    批量深化设计,在进程池中并行计算,按输入顺序逐个返回,单个墙体失败不影响其他墙体
+    :param parameters: 深化设计参数
+    :param processes: 计算进程数,None 表示 cpu 核数,0 表示在当前进程中计算
+    :param chunksize: 每次分发给计算进程的墙体数量
+    :param max_tasks_per_child: 计算进程处理该数量的分块后重启,释放 OCC、FCL 对象占用的内存,None 表示不重启
+    :return:
+    """
+    items = enumerate(parameters)
+    if processes == 0:
+        _init_design_worker(None)
+        for item in items:
+            yield _design_one(item)
+        return
+
+    # 材料配置在进程启动时传递一次,任务只传递深化设计参数
+    shared_config = dict(
+        CONCRETE_CONFIG_DICT=config.CONCRETE_CONFIG_DICT,
+        REBAR_GRADE_CONFIG=config.REBAR_GRADE_CONFIG,
+        REBAR_NAME_CONFIG=config.REBAR_NAME_CONFIG,
     )
-    rebar_for_BIM = RebarforBIM()  # 创建用于生成钢筋BIM模型的实例
-    rebar_for_BVBS = RebarforBVBS()
-    fcl_model = ShearWallFCLModel()  # 创建fcl碰撞检测模型
-    shear_wall_data = ShearWallData(detailed_design_result=result)
-
-    # 保护层障碍物
-    cover_objs = shear_wall_data.get_cover()
-    fcl_model.add_obj(cover_objs)
-
-    # 横向钢筋
-    horizontal_rebars_BVBS, horizontal_rebars_objs, horizontal_rebars_BIM = shear_wall_data.get_horizontal_rebars()
-    rebar_for_BVBS.horizontal_rebars = horizontal_rebars_BVBS
-    rebar_for_BIM.horizontal_rebars = horizontal_rebars_BIM
-    fcl_model.add_obj(horizontal_rebars_objs)
-
-    # 竖向钢筋
-    vertical_rebars_BVBS, vertical_rebars_objs, vertical_rebars_BIM = shear_wall_data.get_vertical_rebars(
-        number_s=len(horizontal_rebars_BVBS))  # number_s = bvbs钢筋编号开始数字
-    rebar_for_BVBS.vertical_rebars = vertical_rebars_BVBS
-    rebar_for_BIM.vertical_rebars = vertical_rebars_BIM
-    fcl_model.add_obj(vertical_rebars_objs)
-
-    truss_layout = layout_opt(fcl_model, detailed_design_result=result)
-    truss_rebar_for_BIM = shear_wall_data.get_truss_rebars(truss_layout)
-
-    return result, rebar_for_BIM, rebar_for_BVBS, truss_rebar_for_BIM, shear_wall_data,
+    with multiprocessing.Pool(
+        processes=processes,
+        initializer=_init_design_worker,
+        initargs=(shared_config,),
+        maxtasksperchild=max_tasks_per_child,
+    ) as pool:
+        yield from pool.imap(_design_one, items, chunksize=max(chunksize, 1))
+
+
+_worker_pipeline: Optional[DesignPipeline] = None
+
+
+def _init_design_worker(shared_config: Optional[dict]):
+    global _worker_pipeline
+    if shared_config is not None:
+        for name, value in shared_config.items():
+            target = getattr(config, name)
+            if target is not value:  # fork 启动时与主进程为同一对象
+                target.clear()
+                target.update(value)
+    _worker_pipeline = DesignPipeline()
+
+
+def _design_one(item: Tuple[int, DetailedDesign]) -> DesignOutcome:
+    index, parameter = item
+    started = time.perf_counter()
+    session = None
+    try:
+        session = DesignSession(parameter, pipeline=_worker_pipeline)
+        result, rebar_for_BIM, rebar_for_BVBS, truss_rebar_for_BIM, _ = session.detailed_design_output()
+        return DesignOutcome(
+            index=index,
+            result=result,
+            rebar_for_BIM=rebar_for_BIM,
+            rebar_for_BVBS=rebar_for_BVBS,
+            truss_rebar_for_BIM=truss_rebar_for_BIM,
+            seconds=time.perf_counter() - started,
+            metrics=session.metrics,
+        )
+    except Exception as e:
+        return DesignOutcome(
+            index=index,
+            error=_picklable_error(e),
+            traceback=format_exc(),
+            seconds=time.perf_counter() - started,
+            metrics=session.metrics if session is not None else None,
+        )
+
+
+def _picklable_error(error: Exception) -> Exception:
+    try:
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        return RuntimeError(repr(error))
+    return error
+
 
 def to_word_detailed(
     data: DetailedCalculationBook, file: IO[bytes]
@@ -0,0 +1,302 @@
+"""
+深化设计性能统计
+
+span 记录代码区间耗时,count 记录数量(钢筋、碰撞检测对象、碰撞检测次数等),
+统计结果发送至:
+- collect(): 内存汇总,统计 with 语句内(当前线程)的全部数据
+- LogExporter: 结构化日志(json),每个 span 一条
+- PrometheusExporter: Prometheus 文本格式文件,可由 node_exporter 的 textfile collector 采集
+
+进程退出时(含进程池的子进程)调用各输出的 close()
+
+输出出错时只记录日志,不影响深化设计计算
+
+未配置任何输出且不在 collect() 中时,span 与 count 只做一次判断,不计时
+"""
+import json
+import logging
+import multiprocessing.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpanStats:
+    """
+    同名 span 的累计耗时
+    """
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+class MetricsSummary:
+    """
+    内存中的统计汇总
+    """
+
+    def __init__(self):
+        self.spans: Dict[str, SpanStats] = {}
+        self.counters: Dict[str, float] = {}
+
+    def on_span(self, name: str, seconds: float):
+        self.spans.setdefault(name, SpanStats()).add(seconds)
+
+    def on_count(self, name: str, value: float):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other: "MetricsSummary"):
+        for name, stats in other.spans.items():
+            target = self.spans.setdefault(name, SpanStats())
+            target.count += stats.count
+            target.total_seconds += stats.total_seconds
+            target.max_seconds = max(target.max_seconds, stats.max_seconds)
+        for name, value in other.counters.items():
+            self.on_count(name, value)
+
+    def as_dict(self) -> Dict:
+        return {
+            "spans": {name: asdict(stats) for name, stats in self.spans.items()},
+            "counters": dict(self.counters),
+        }
+
+    def __repr__(self):
+        return f"MetricsSummary({self.as_dict()})"
+
+
+class LogExporter:
+    """
+    以 json 格式记录每个 span,计数次数较多,不逐条输出
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or _logger
+        self.level = level
+
+    def on_span(self, name: str, seconds: float):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level,
+                json.dumps({"event": "span", "name": name, "seconds": round(seconds, 6), "pid": os.getpid()}),
+            )
+
+    def on_count(self, name: str, value: float):
+        pass
+
+
+class PrometheusExporter:
+    """
+    累计本进程的统计数据,写入 Prometheus 文本格式文件,每个进程一个文件(以 pid 区分)
+
+    文件在 span 结束与计数时写入,两次写入间隔不小于 interval 秒,多个线程的写入依次执行;
+    进程退出时删除本进程的文件,避免已退出的进程一直被采集,keep_file 为 True 时改为写入最终的统计数据
+    """
+
+    def __init__(self, directory: str, prefix: str = "shear_wall_design", interval: float = 1.0,
+                 keep_file: bool = False):
+        self.directory = directory
+        self.prefix = prefix
+        self.interval = interval
+        self.keep_file = keep_file
+        self.summary = MetricsSummary()
+        self._written = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # 各线程共用同一个临时文件
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{self.prefix}_{os.getpid()}.prom")
+
+    def on_span(self, name: str, seconds: float):
+        with self._lock:
+            self.summary.on_span(name, seconds)
+            self._dirty = True
+        self._throttled_write()
+
+    def on_count(self, name: str, value: float):
+        with self._lock:
+            self.summary.on_count(name, value)
+            self._dirty = True
+        self._throttled_write()
+
+    def _throttled_write(self):
+        if time.monotonic() - self._written >= self.interval:
+            self.write()
+
+    def flush(self):
+        """
+        写入上次写入后新增的统计数据
+        """
+        if self._dirty:
+            self.write()
+
+    def close(self):
+        """
+        进程退出时调用: 删除本进程的文件,keep_file 为 True 时写入最终的统计数据
+        """
+        if self.keep_file:
+            self.flush()
+            return
+        with self._write_lock:
+            for path in (self.path, f"{self.path}.tmp"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def render(self) -> str:
+        pid = os.getpid()
+        lines = [
+            f"# HELP {self.prefix}_span_seconds_total 区间累计耗时(秒)",
+            f"# TYPE {self.prefix}_span_seconds_total counter",
+        ]
+        with self._lock:
+            spans = sorted(self.summary.spans.items())
+            counters = sorted(self.summary.counters.items())
+        for name, stats in spans:
+            lines.append(f'{self.prefix}_span_seconds_total{{span="{name}",pid="{pid}"}} {stats.total_seconds:.6f}')
+        lines += [f"# HELP {self.prefix}_span_count_total 区间执行次数", f"# TYPE {self.prefix}_span_count_total counter"]
+        for name, stats in spans:
+            lines.append(f'{self.prefix}_span_count_total{{span="{name}",pid="{pid}"}} {stats.count}')
+        lines += [f"# HELP {self.prefix}_items_total 计数", f"# TYPE {self.prefix}_items_total counter"]
+        for name, value in counters:
+            lines.append(f'{self.prefix}_items_total{{name="{name}",pid="{pid}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """
+        先写临时文件再替换,采集时不会读到写了一半的文件
+        """
+        with self._write_lock:
+            self._written = time.monotonic()
+            self._dirty = False
+            path = self.path
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(temp_path, path)
+
+
+_exporters: List = []  # 进程内全局输出
+_configured: List = []  # configure() 添加的输出
+_collectors: ContextVar[Tuple[MetricsSummary, ...]] = ContextVar("design_metric_collectors", default=())
+_finalizer_pid: Optional[int] = None  # 已注册退出处理的进程,fork 出的子进程需要重新注册
+
+
+def add_exporter(exporter):
+    global _finalizer_pid
+    if _finalizer_pid != os.getpid():
+        # multiprocessing 的退出处理在主进程(atexit)与进程池的子进程中都会执行,atexit 在子进程中不执行
+        multiprocessing.util.Finalize(None, close_exporters, exitpriority=0)
+        _finalizer_pid = os.getpid()
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter):
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+
+def close_exporters():
+    """
+    关闭全部输出,进程退出时自动调用
+    """
+    for exporter in list(_exporters):
+        close = getattr(exporter, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                _logger.warning(f"关闭统计输出失败: {e!r}")
+
+
+def configure(log: bool = False, prometheus_dir: Optional[str] = None):
+    """
+    配置本进程的统计输出,重复调用时关闭并替换上一次的配置,可作为进程池的 initializer
+    :param log: 是否输出结构化日志
+    :param prometheus_dir: Prometheus 文本文件目录,为空时不输出
+    """
+    for exporter in _configured:
+        remove_exporter(exporter)
+        close = getattr(exporter, "close", None)
+        if callable(close):
+            close()
+    _configured.clear()
+    if log:
+        _configured.append(LogExporter())
+    if prometheus_dir:
+        _configured.append(PrometheusExporter(prometheus_dir))
+    for exporter in _configured:
+        add_exporter(exporter)
+
+
+@contextmanager
+def collect(summary: Optional[MetricsSummary] = None) -> Iterator[MetricsSummary]:
+    """
+    在内存中汇总 with 语句内的统计数据
+    :param summary: 汇总对象,为空时新建
+    """
+    summary = summary if summary is not None else MetricsSummary()
+    collectors = _collectors.get()
+    if any(collector is summary for collector in collectors):
+        yield summary
+        return
+    token = _collectors.set(collectors + (summary,))
+    try:
+        yield summary
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    记录 with 语句内的耗时
+    :param name: 区间名称,如 "design.geometry"
+    """
+    if not _exporters and not _collectors.get():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def record_span(name: str, seconds: float):
+    """
+    记录已测量的耗时
+    """
+    for target in _collectors.get() + tuple(_exporters):
+        try:
+            target.on_span(name, seconds)
+        except Exception as e:
+            _logger.warning(f"记录区间耗时失败 {name}: {e!r}")
+
+
+def count(name: str, value: float = 1):
+    """
+    计数
+    :param name: 名称,如 "fcl.objects"
+    :param value: 增量
+    """
+    for target in _collectors.get() + tuple(_exporters):
+        try:
+            target.on_count(name, value)
+        except Exception as e:
+            _logger.warning(f"计数失败 {name}: {e!r}")
@@ -274,16 +274,28 @@ class GeometricDetailed:
     wall_hole_parameter: Union[CircleHole, RectangleHole]
 
     def __post_converter__(self):
+        # 枚举字段可以传入对应的整数值(json 或数据库中的值)
+        if isinstance(self.shear_wall_type, int):
+            self.shear_wall_type = ShearWallType(self.shear_wall_type)
+        assert isinstance(self.shear_wall_type, ShearWallType), Exception(f"shear_wall_type 传入类型错误")
+        if isinstance(self.wall_length_type, int):
+            self.wall_length_type = WallLengthType(self.wall_length_type)
+        assert isinstance(self.wall_length_type, WallLengthType), Exception(f"wall_length_type 传入类型错误")
+        if isinstance(self.wall_hole, int):
+            self.wall_hole = WallHole(self.wall_hole)
+        assert isinstance(self.wall_hole, WallHole), Exception(f"wall_hole 传入类型错误")
+        if isinstance(self.wall_hole_type, int):
+            self.wall_hole_type = WallHoleType(self.wall_hole_type)
+
         if self.wall_hole == WallHole.YES:  # 是否有孔洞
             # 孔洞信息
             assert self.wall_hole_type is not None, Exception(f"wall_hole_type 不能为空")
-            if isinstance(self.wall_hole_type, dict):  # 兼容
+            assert isinstance(self.wall_hole_type, WallHoleType), Exception(f"wall_hole_type 传入类型错误")
+            if isinstance(self.wall_hole_parameter, dict):
                 if self.wall_hole_type == WallHoleType.CIRCLE:
-                    if isinstance(self.wall_hole_parameter, dict):
-                        self.wall_hole_parameter = CircleHole(**self.wall_hole_parameter)
-                elif self.wall_hole_type == WallHoleType.RECTANGLE:
-                    if isinstance(self.wall_hole_parameter, dict):
-                        self.wall_hole_parameter = RectangleHole(**self.wall_hole_parameter)
+                    self.wall_hole_parameter = CircleHole(**self.wall_hole_parameter)
+                else:
+                    self.wall_hole_parameter = RectangleHole(**self.wall_hole_parameter)
             if not isinstance(self.wall_hole_parameter, CircleHole) and not isinstance(
                     self.wall_hole_parameter, RectangleHole):
                 raise Exception(f"wall_hole_parameter 数据异常:{self.wall_hole_parameter}")
@@ -347,19 +359,21 @@ class RebarDetailed:
             assert self.horizontal_rebars is not None, Exception(
                 f"horizontal_rebars 不能为空")
             if isinstance(self.horizontal_rebars, dict):
-                for i in range(len(self.horizontal_rebars)):
-                    self.horizontal_rebars[i]: dict
+                self.horizontal_rebars = [self.horizontal_rebars]
+            for i in range(len(self.horizontal_rebars)):
+                if isinstance(self.horizontal_rebars[i], dict):
                     self.horizontal_rebars[i] = RebarDiamSpac(**self.horizontal_rebars[i])
-                    if not isinstance(self.horizontal_rebars[i], RebarDiamSpac):
-                        raise Exception(f"horizontal_rebars 数据异常:{self.horizontal_rebars}")
+                if not isinstance(self.horizontal_rebars[i], RebarDiamSpac):
+                    raise Exception(f"horizontal_rebars 数据异常:{self.horizontal_rebars}")
             assert self.vertical_rebars is not None, Exception(
                 f"vertical_rebar 不能为空")
             if isinstance(self.vertical_rebars, dict):
-                for i in range(len(self.vertical_rebars)):
-                    self.vertical_rebars[i]: dict
+                self.vertical_rebars = [self.vertical_rebars]
+            for i in range(len(self.vertical_rebars)):
+                if isinstance(self.vertical_rebars[i], dict):
                     self.vertical_rebars[i] = RebarDiamSpac(**self.vertical_rebars[i])
-                    if not isinstance(self.vertical_rebars[i], RebarDiamSpac):
-                        raise Exception(f"vertical_rebars 数据异常:{self.vertical_rebars}")
+                if not isinstance(self.vertical_rebars[i], RebarDiamSpac):
+                    raise Exception(f"vertical_rebars 数据异常:{self.vertical_rebars}")
 
 
 @dataclass
@@ -504,8 +518,10 @@ class InsertsDetailed:
             if not isinstance(self.lifting_inserts_position, LiftingInsertsPosition):
                 raise Exception(f"lifting_inserts_position 数据异常:{self.lifting_inserts_position}")
 
-        elif self.support_inserts_design_mode == SupportInsertsDesignMode.AUTOMATIC:
-            pass
+        elif self.lifting_inserts_design_mode == LiftingInsertsDesignMode.AUTOMATIC:
+            # 位置由深化设计流程中的 RebarLayout.inserts_layout.place_inserts 确定,传入的位置只做类型转换
+            if isinstance(self.lifting_inserts_position, dict):
+                self.lifting_inserts_position = LiftingInsertsPosition(**self.lifting_inserts_position)
 
         assert self.support_inserts_design_mode is not None, Exception(f"support_design_mode 不能为空")
         if isinstance(self.support_inserts_design_mode, int):
@@ -525,7 +541,9 @@ class InsertsDetailed:
                 raise Exception(f"support_position 数据异常:{self.support_inserts_position}")
 
         elif self.support_inserts_design_mode == SupportInsertsDesignMode.AUTOMATIC:
-            pass
+            # 位置由深化设计流程中的 RebarLayout.inserts_layout.place_inserts 确定,传入的位置只做类型转换
+            if isinstance(self.support_inserts_position, dict):
+                self.support_inserts_position = SupportInsertsPosition(**self.support_inserts_position)
 
 
 #         # 埋件设计--脱模预埋件
@@ -688,6 +706,7 @@ class DetailedDesignResult:
     weight: int  # "计算跨度 mm.
     horizontal_rebars: List[RebarDiamSpac]
     vertical_rebars: List[RebarDiamSpac]
+    warnings: List[str] = field(default_factory=list)  # 警告,如自动定位的预埋件没有满足净距要求的位置
 
     def __post_init__(self):
         pass
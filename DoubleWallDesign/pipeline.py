@@ -0,0 +1,406 @@
+"""
+深化设计计算流程
+
+将深化设计拆分为若干阶段,每个阶段声明其依赖的参数字段与上游阶段,
+阶段输出按 (依赖字段内容 + 上游阶段键) 的哈希缓存。参数修改后只重新计算受影响的下游阶段,
+例如只修改预埋件参数时,钢筋与碰撞检测模型直接复用,只重新计算预埋件定位与桁架排布。
+
+阶段输出会在多次计算之间共享,调用方不应修改
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields, is_dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from DoubleWallDesign.instrumentation import MetricsSummary, collect, count, span
+from DoubleWallDesign.models import (
+    ConcreteParameter,
+    DetailedDesign,
+    DetailedDesignResult,
+    RebarDesignMode,
+    RebarforBIM,
+    RebarforBVBS,
+    ShearWallType,
+    TrussRebarMode,
+    WallHole,
+    WallLengthType,
+)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    深化设计计算阶段
+    """
+    name: str
+    func: Callable[[DetailedDesign, Dict[str, Any]], Any]  # func(深化设计参数, 上游阶段输出) -> 阶段输出
+    inputs: Tuple[str, ...] = ()  # 依赖的参数字段路径,如 "geometric_detailed.thickness"
+    requires: Tuple[str, ...] = ()  # 依赖的上游阶段
+    cacheable: bool = True  # 计算量很小或依赖全部参数的阶段不缓存
+
+
+@dataclass
+class PipelineRun:
+    """
+    一次深化设计计算的各阶段输出
+    """
+    outputs: Dict[str, Any]
+    keys: Dict[str, str]  # 阶段 -> 输入哈希
+    reused: List[str] = field(default_factory=list)  # 复用缓存的阶段
+    computed: List[str] = field(default_factory=list)  # 重新计算的阶段
+    metrics: MetricsSummary = field(default_factory=MetricsSummary)  # 各阶段耗时与计数
+
+
+def canonical(value: Any) -> Any:
+    """
+    将参数转换为可 json 序列化的规范形式,枚举取值,dataclass 按字段展开
+    """
+    if isinstance(value, Enum):
+        return value.value
+    if is_dataclass(value) and not isinstance(value, type):
+        return {f.name: canonical(getattr(value, f.name)) for f in fields(value)}
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    return value
+
+
+def _get_field(parameter: DetailedDesign, path: str) -> Any:
+    value = parameter
+    for name in path.split("."):
+        value = getattr(value, name, None)
+    return value
+
+
+def stage_key(stage: Stage, parameter: DetailedDesign, upstream_keys: Dict[str, str]) -> str:
+    """
+    阶段输入哈希(sha256)
+    :param stage: 阶段
+    :param parameter: 深化设计参数
+    :param upstream_keys: 上游阶段 -> 输入哈希
+    :return:
+    """
+    content = {
+        "stage": stage.name,
+        "inputs": {path: canonical(_get_field(parameter, path)) for path in stage.inputs},
+        "requires": {name: upstream_keys[name] for name in stage.requires},
+    }
+    text = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DesignPipeline:
+    """
+    带阶段缓存的深化设计流程,线程安全,缓存超过容量时淘汰最久未使用的阶段输出
+    """
+
+    def __init__(self, stages: Optional[Sequence[Stage]] = None, maxsize: int = 128):
+        self.stages: Tuple[Stage, ...] = tuple(stages if stages is not None else DESIGN_STAGES)
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Stage] = {}
+        for stage in self.stages:
+            for name in stage.requires:
+                assert name in self._stages, Exception(f"阶段 {stage.name} 依赖的阶段 {name} 需排在其之前")
+            self._stages[stage.name] = stage
+
+    def run(self, parameter: DetailedDesign, targets: Optional[Sequence[str]] = None) -> PipelineRun:
+        """
+        执行深化设计,输入未变化的阶段直接复用缓存
+        :param parameter: 深化设计参数,计算过程不修改该参数
+        :param targets: 需要的阶段,只计算这些阶段及其上游阶段,为空时计算全部阶段
+        :return:
+        """
+        assert isinstance(parameter, DetailedDesign), Exception(f"parameter 数据异常")
+        run = PipelineRun(outputs={}, keys={})
+        for name in targets if targets is not None else [stage.name for stage in self.stages]:
+            self.evaluate(parameter, name, run)
+        return run
+
+    def evaluate(self, parameter: DetailedDesign, name: str, run: PipelineRun) -> Any:
+        """
+        计算单个阶段的输出,先计算其尚未计算的上游阶段,结果记录在 run 中
+        :param parameter: 深化设计参数
+        :param name: 阶段名称
+        :param run: 本次计算已有的阶段输出
+        :return: 阶段输出
+        """
+        if name in run.outputs:
+            return run.outputs[name]
+        stage = self._stages[name]
+        upstream = {required: self.evaluate(parameter, required, run) for required in stage.requires}
+        key = stage_key(stage, parameter, run.keys)
+        run.keys[stage.name] = key
+        with collect(run.metrics):
+            found = False
+            if stage.cacheable:
+                with self._lock:
+                    found = (stage.name, key) in self._data
+                    if found:
+                        self._data.move_to_end((stage.name, key))
+                        output = self._data[(stage.name, key)]
+            if found:
+                count("design.stages_reused")
+                run.reused.append(stage.name)
+            else:
+                with span(f"design.{stage.name}"):
+                    output = stage.func(parameter, upstream)
+                if stage.cacheable:
+                    self._put((stage.name, key), output)
+                run.computed.append(stage.name)
+        run.outputs[stage.name] = output
+        return output
+
+    def _put(self, key: Tuple[str, str], output: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = output
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _design_result(parameter: DetailedDesign, upstream: Dict[str, Any]) -> DetailedDesignResult:
+    """
+    由上游阶段输出组装深化设计结果,结果中的参数为包含桁架设计结果的副本
+    """
+    design = parameter
+    warnings = ()
+    if "truss" in upstream or "inserts" in upstream:
+        design = copy.copy(parameter)
+        design.truss_detailed = upstream.get("truss", parameter.truss_detailed)
+        design.inserts_detailed, warnings = upstream.get("inserts", (parameter.inserts_detailed, ()))
+    horizontal_rebars, vertical_rebars = upstream["rebar"]
+    return DetailedDesignResult(
+        detailed_design=design,
+        horizontal_rebars=horizontal_rebars,
+        vertical_rebars=vertical_rebars,
+        warnings=list(warnings),
+        **upstream["geometry"],
+    )
+
+
+def _shear_wall_data(parameter: DetailedDesign, upstream: Dict[str, Any]):
+    from DigitalDesign.get_data import ShearWallData
+
+    return ShearWallData(detailed_design_result=_design_result(parameter, upstream))
+
+
+def _geometry_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    墙体尺寸、体积、面积、重量
+    """
+    from RebarLayout.tools import get_area, get_volume
+
+    geometric_detailed = parameter.geometric_detailed
+    length: int = geometric_detailed.length  # 剪力墙长度 mm
+    height: int = geometric_detailed.height  # 剪力墙总高度 mm
+    bottom_gap_height: int = geometric_detailed.bottom_gap_height  # 底部间隙
+    top_gap_height: int = geometric_detailed.top_gap_height  # 顶部间隙
+    if geometric_detailed.shear_wall_type == ShearWallType.INTERIOR:  # 内外墙等高
+        interior_height = height - bottom_gap_height - top_gap_height  # 内墙高度
+        exterior_height = height - bottom_gap_height - top_gap_height  # 外墙高度
+    else:  # 外墙比内墙高
+        interior_height = height - bottom_gap_height - top_gap_height  # 内墙高度
+        exterior_height = height - bottom_gap_height  # 外墙高度
+
+    if geometric_detailed.wall_length_type == WallLengthType.YES:  # 若内外 等长
+        left_gap_length = 0
+        right_gap_length = 0
+        interior_length: int = length  # 内墙长度
+        exterior_length: int = length  # 外墙长度
+    else:  # 若内外不等长
+        left_gap_length = geometric_detailed.left_gap_length
+        right_gap_length = geometric_detailed.right_gap_length
+        interior_length: int = length - left_gap_length - right_gap_length  # 内墙长度
+        exterior_length: int = length  # 外墙长度
+
+    if geometric_detailed.wall_hole == WallHole.YES:
+        wall_hole_height = geometric_detailed.wall_hole_parameter.hole_height
+        wall_hole_length = geometric_detailed.wall_hole_parameter.hole_length
+    else:
+        wall_hole_height = 0
+        wall_hole_length = 0
+
+    rc = ConcreteParameter.by_grade(parameter.material.concrete_grade).rc  # 混凝土容重
+    volume = get_volume(interior_length=interior_length, interior_thickness=geometric_detailed.interior_thickness,
+                        interior_height=interior_height, exterior_length=exterior_length,
+                        exterior_thickness=geometric_detailed.exterior_thickness, exterior_height=exterior_height,
+                        wall_hole_height=wall_hole_height, wall_hole_length=wall_hole_length)  # m^3
+    area = get_area(length=length, interior_height=interior_height, exterior_height=exterior_height)  # m^2
+    weight = rc / 10 * volume  # T
+    return dict(
+        interior_height=interior_height,
+        exterior_height=exterior_height,
+        left_gap_length=left_gap_length,
+        right_gap_length=right_gap_length,
+        interior_length=interior_length,
+        exterior_length=exterior_length,
+        volume=volume,
+        area=area,
+        weight=weight,
+    )
+
+
+def _rebar_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> tuple:
+    """
+    横向、竖向钢筋配筋
+    """
+    from RebarLayout.tools import rebar_opt
+
+    rebar_detailed = parameter.rebar_detailed
+    if rebar_detailed.rebar_design_mode == RebarDesignMode.AUTOMATIC:
+        geometric_detailed = parameter.geometric_detailed
+        section = (geometric_detailed.thickness, rebar_detailed.vertical_rebars_ratio,
+                   geometric_detailed.interior_thickness, geometric_detailed.exterior_thickness,
+                   parameter.construction_detailed.concrete_cover_thickness)
+        return rebar_opt(*section), rebar_opt(*section)
+    return rebar_detailed.horizontal_rebars, rebar_detailed.vertical_rebars
+
+
+def _truss_stage(parameter: DetailedDesign, upstream: Dict[str, Any]):
+    """
+    桁架钢筋参数,自动模式下由 truss_design 确定
+    """
+    from RebarLayout.tools import truss_design
+
+    if parameter.truss_detailed.truss_rebar_mode != TrussRebarMode.AUTOMATIC:
+        return parameter.truss_detailed
+    design = copy.copy(parameter)
+    design.truss_detailed = copy.copy(parameter.truss_detailed)
+    return truss_design(design).truss_detailed
+
+
+def _inserts_stage(parameter: DetailedDesign, upstream: Dict[str, Any]):
+    """
+    预埋件参数与警告,自动模式下由 place_inserts 定位吊装、斜撑预埋件,
+    没有满足净距要求的位置时仍给出位置并记录警告,不中断深化设计
+    """
+    from RebarLayout.inserts_layout import place_inserts
+
+    warnings = []
+    inserts = place_inserts(_design_result(parameter, upstream), warnings=warnings)
+    return inserts, tuple(warnings)
+
+
+def _result_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> DetailedDesignResult:
+    return _design_result(parameter, upstream)
+
+
+def _cover_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> list:
+    """
+    保护层障碍物
+    """
+    return _shear_wall_data(parameter, upstream).get_cover()
+
+
+def _horizontal_rebars_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> tuple:
+    """
+    横向钢筋: BVBS 数据, 碰撞检测对象, BIM 数据
+    """
+    output = _shear_wall_data(parameter, upstream).get_horizontal_rebars()
+    count("rebar.horizontal", len(output[2]))
+    return output
+
+
+def _vertical_rebars_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> tuple:
+    """
+    竖向钢筋: BVBS 数据, 碰撞检测对象, BIM 数据
+    """
+    horizontal_rebars_BVBS, _, _ = upstream["horizontal_rebars"]
+    output = _shear_wall_data(parameter, upstream).get_vertical_rebars(
+        number_s=len(horizontal_rebars_BVBS))  # number_s = bvbs钢筋编号开始数字
+    count("rebar.vertical", len(output[2]))
+    return output
+
+
+def _fcl_model_stage(parameter: DetailedDesign, upstream: Dict[str, Any]):
+    """
+    fcl 碰撞检测模型
+    """
+    from RebarLayout.collision_detection import ShearWallFCLModel
+
+    fcl_model = ShearWallFCLModel()
+    fcl_model.add_obj(upstream["cover"])
+    fcl_model.add_obj(upstream["horizontal_rebars"][1])
+    fcl_model.add_obj(upstream["vertical_rebars"][1])
+    return fcl_model
+
+
+def _truss_layout_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> list:
+    """
+    桁架排布
+    """
+    from RebarLayout.layout_opt import layout_opt
+
+    return layout_opt(upstream["fcl_model"], detailed_design_result=_design_result(parameter, upstream))
+
+
+def _truss_rebars_stage(parameter: DetailedDesign, upstream: Dict[str, Any]):
+    """
+    桁架钢筋 BIM 数据
+    """
+    truss_rebar_for_BIM = _shear_wall_data(parameter, upstream).get_truss_rebars(upstream["truss_layout"])
+    count("rebar.truss", len(truss_rebar_for_BIM.truss_rebars))
+    return truss_rebar_for_BIM
+
+
+def _rebar_data_stage(parameter: DetailedDesign, upstream: Dict[str, Any]) -> tuple:
+    """
+    汇总 BIM 与 BVBS 钢筋数据
+    """
+    horizontal_rebars_BVBS, _, horizontal_rebars_BIM = upstream["horizontal_rebars"]
+    vertical_rebars_BVBS, _, vertical_rebars_BIM = upstream["vertical_rebars"]
+    rebar_for_BIM = RebarforBIM(horizontal_rebars=horizontal_rebars_BIM, vertical_rebars=vertical_rebars_BIM)
+    rebar_for_BVBS = RebarforBVBS(horizontal_rebars=horizontal_rebars_BVBS, vertical_rebars=vertical_rebars_BVBS)
+    return rebar_for_BIM, rebar_for_BVBS
+
+
+_WALL = (
+    "shear_wall_id",  # BVBS 数据包含项目与构件编号
+    "material",
+    "geometric_detailed",
+    "construction_detailed.concrete_cover_thickness",
+)
+
+DESIGN_STAGES: Tuple[Stage, ...] = (
+    Stage("geometry", _geometry_stage, inputs=("geometric_detailed", "material.concrete_grade")),
+    Stage("rebar", _rebar_stage, inputs=(
+        "rebar_detailed",
+        "geometric_detailed.thickness",
+        "geometric_detailed.interior_thickness",
+        "geometric_detailed.exterior_thickness",
+        "construction_detailed.concrete_cover_thickness",
+    )),
+    Stage("truss", _truss_stage, inputs=("truss_detailed",)),
+    Stage("inserts", _inserts_stage, inputs=(
+        "inserts_detailed",
+        "geometric_detailed",
+        "construction_detailed.concrete_cover_thickness",
+    ), requires=("geometry", "rebar", "truss")),
+    Stage("result", _result_stage, requires=("geometry", "rebar", "truss", "inserts"), cacheable=False),
+    Stage("cover", _cover_stage, inputs=_WALL + ("construction_detailed",), requires=("geometry", "rebar")),
+    Stage("horizontal_rebars", _horizontal_rebars_stage, inputs=_WALL, requires=("geometry", "rebar")),
+    Stage("vertical_rebars", _vertical_rebars_stage, inputs=_WALL,
+          requires=("geometry", "rebar", "horizontal_rebars")),
+    Stage("fcl_model", _fcl_model_stage, requires=("cover", "horizontal_rebars", "vertical_rebars")),
+    Stage("truss_layout", _truss_layout_stage, inputs=_WALL,
+          requires=("geometry", "rebar", "truss", "inserts", "fcl_model")),
+    Stage("truss_rebars", _truss_rebars_stage, inputs=_WALL,
+          requires=("geometry", "rebar", "truss", "truss_layout")),
+    Stage("rebar_data", _rebar_data_stage, requires=("horizontal_rebars", "vertical_rebars"), cacheable=False),
+)
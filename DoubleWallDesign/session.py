@@ -0,0 +1,110 @@
+"""
+惰性深化设计
+
+DesignSession 只在访问时计算所需的阶段:访问 result 只计算几何、配筋、桁架参数与预埋件定位,
+BIM/BVBS 钢筋、碰撞检测模型与桁架排布在首次访问时才生成
+"""
+from functools import cached_property
+from typing import Any, List, Optional
+
+from DoubleWallDesign.instrumentation import MetricsSummary
+from DoubleWallDesign.models import (
+    DetailedDesign,
+    DetailedDesignResult,
+    RebarforBIM,
+    RebarforBVBS,
+    TrussRebarforBIM,
+)
+from DoubleWallDesign.pipeline import DesignPipeline, PipelineRun
+
+
+class DesignSession:
+    """
+    深化设计会话,各阶段输出按需计算,同一会话内只计算一次
+    """
+
+    def __init__(self, parameter: DetailedDesign, pipeline: Optional[DesignPipeline] = None):
+        """
+        :param parameter: 深化设计参数,计算过程不修改该参数
+        :param pipeline: 带阶段缓存的计算流程,为空时不跨会话缓存
+        """
+        assert isinstance(parameter, DetailedDesign), Exception(f"parameter 数据异常")
+        self.parameter = parameter
+        self.pipeline = pipeline if pipeline is not None else DesignPipeline(maxsize=0)
+        self.run = PipelineRun(outputs={}, keys={})
+
+    def stage(self, name: str) -> Any:
+        """
+        获取阶段输出,未计算时计算该阶段及其上游阶段
+        """
+        return self.pipeline.evaluate(self.parameter, name, self.run)
+
+    @property
+    def result(self) -> DetailedDesignResult:
+        """
+        深化设计结果(尺寸、体积、重量与配筋),不生成钢筋
+        """
+        return self.stage("result")
+
+    @property
+    def rebar_for_BIM(self) -> RebarforBIM:
+        return self.stage("rebar_data")[0]
+
+    @property
+    def rebar_for_BVBS(self) -> RebarforBVBS:
+        return self.stage("rebar_data")[1]
+
+    @property
+    def fcl_model(self):
+        """
+        保护层与钢筋组成的 fcl 碰撞检测模型
+        """
+        return self.stage("fcl_model")
+
+    @property
+    def truss_layout(self) -> list:
+        return self.stage("truss_layout")
+
+    @property
+    def truss_rebar_for_BIM(self) -> TrussRebarforBIM:
+        return self.stage("truss_rebars")
+
+    @cached_property
+    def shear_wall_data(self):
+        from DigitalDesign.get_data import ShearWallData
+
+        return ShearWallData(detailed_design_result=self.result)
+
+    @property
+    def metrics(self) -> MetricsSummary:
+        """
+        本会话中各阶段的耗时与计数
+        """
+        return self.run.metrics
+
+    @property
+    def computed(self) -> List[str]:
+        """
+        本会话中计算的阶段
+        """
+        return self.run.computed
+
+    @property
+    def reused(self) -> List[str]:
+        """
+        本会话中复用缓存的阶段
+        """
+        return self.run.reused
+
+    def detailed_design_output(self) -> tuple:
+        """
+        计算全部阶段,返回值与 detailed_design 一致
+        :return: 深化设计结果, BIM 钢筋数据, BVBS 钢筋数据, BIM 桁架钢筋数据, ShearWallData
+        """
+        return (
+            self.result,
+            self.rebar_for_BIM,
+            self.rebar_for_BVBS,
+            self.truss_rebar_for_BIM,
+            self.shear_wall_data,
+        )
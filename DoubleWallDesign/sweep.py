@@ -0,0 +1,202 @@
+"""
+标准墙型参数扫描
+
+在基准深化设计参数上按墙长、墙高、墙厚与配筋率的取值组合批量深化设计,生成标准墙型目录。
+- 等效的组合只计算一次(取值重复,或手动配筋时配筋率不影响结果)
+- 组合按 墙长 > 墙高 > 墙厚 > 配筋率 的顺序排列,相邻组合在同一计算进程中计算,
+  通过 DesignPipeline 的阶段缓存复用钢筋选型、保护层障碍物等中间结果
+- 各组合使用基准参数的构件编号,以便阶段缓存在组合之间共享
+- 结果按列写入 csv
+"""
+import csv
+import hashlib
+import json
+from dataclasses import dataclass, replace
+from itertools import product
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from DoubleWallDesign.detailed_design import DesignOutcome, detailed_design_many
+from DoubleWallDesign.models import DetailedDesign, RebarDesignMode
+from DoubleWallDesign.pipeline import canonical
+
+SWEEP_COLUMNS = (
+    "length",
+    "height",
+    "thickness",
+    "rebar_ratio",
+    "status",  # ok, failed
+    "volume",
+    "area",
+    "weight",
+    "horizontal_rebars",  # 直径@间距,多种规格以 / 分隔
+    "vertical_rebars",
+    "truss_number",  # 排布的桁架数量
+    "layout_status",  # ok, no_truss, failed
+    "seconds",
+    "error",
+)
+
+
+@dataclass
+class SweepPoint:
+    """
+    参数扫描中的一个组合
+    """
+    length: int
+    height: int
+    thickness: int
+    rebar_ratio: Optional[float]  # 为空时使用基准参数的配筋
+    parameter: Optional[DetailedDesign] = None  # 参数不合法时为空
+    error: Optional[str] = None
+
+
+def parse_range(text: str) -> List[float]:
+    """
+    解析取值范围: "1950,2400,3000" 为列表,"1800:3000:300" 为 起点:终点:步长(含终点)
+    """
+    text = text.strip()
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        assert step > 0, Exception(f"步长应大于 0:{text}")
+        values = []
+        value = start
+        while value <= stop + step * 1e-9:
+            values.append(round(value, 10))
+            value = start + step * len(values)
+        return values
+    return [float(part) for part in text.split(",") if part.strip()]
+
+
+def sweep_points(
+    base: DetailedDesign,
+    lengths: Optional[Sequence[float]] = None,
+    heights: Optional[Sequence[float]] = None,
+    thicknesses: Optional[Sequence[float]] = None,
+    rebar_ratios: Optional[Sequence[float]] = None,
+) -> List[SweepPoint]:
+    """
+    生成去重后的扫描组合
+    :param base: 基准深化设计参数,未扫描的参数取基准值
+    :param lengths: 墙长取值,为空时取基准值
+    :param heights: 墙高取值
+    :param thicknesses: 墙厚取值
+    :param rebar_ratios: 配筋率取值(水平与竖向相同,按自动配筋计算),为空时使用基准参数的配筋
+    :return:
+    """
+    geometric = base.geometric_detailed
+    points = []
+    seen = set()
+    for length, height, thickness, rebar_ratio in product(
+        sorted(set(lengths or [geometric.length])),
+        sorted(set(heights or [geometric.height])),
+        sorted(set(thicknesses or [geometric.thickness])),
+        sorted(set(rebar_ratios)) if rebar_ratios else [None],
+    ):
+        point = SweepPoint(length=int(length), height=int(height), thickness=int(thickness), rebar_ratio=rebar_ratio)
+        try:
+            # replace 会重新执行强制类型转换与参数校验,未修改的字段保持原有类型(如枚举)
+            rebar_detailed = base.rebar_detailed
+            if rebar_ratio is not None:
+                rebar_detailed = replace(
+                    rebar_detailed,
+                    rebar_design_mode=RebarDesignMode.AUTOMATIC,
+                    horizontal_rebars_ratio=float(rebar_ratio),
+                    vertical_rebars_ratio=float(rebar_ratio),
+                )
+            point.parameter = replace(
+                base,
+                geometric_detailed=replace(geometric, length=point.length, height=point.height,
+                                           thickness=point.thickness),
+                rebar_detailed=rebar_detailed,
+            )
+        except Exception as e:
+            point.error = repr(e)
+        key = _equivalent_key(canonical(point.parameter) if point.parameter is not None else canonical(point))
+        if key in seen:
+            continue
+        seen.add(key)
+        points.append(point)
+    return points
+
+
+def _equivalent_key(data: Dict) -> str:
+    """
+    只保留影响计算结果的配筋参数:自动配筋时忽略钢筋规格,手动配筋时忽略配筋率
+    """
+    if "rebar_detailed" not in data:
+        return json.dumps(data, sort_keys=True, default=str)
+    rebar_detailed = dict(data["rebar_detailed"])
+    if rebar_detailed["rebar_design_mode"] == RebarDesignMode.AUTOMATIC.value:
+        rebar_detailed.update(horizontal_rebars=None, vertical_rebars=None)
+    else:
+        rebar_detailed.update(horizontal_rebars_ratio=None, vertical_rebars_ratio=None)
+    text = json.dumps(dict(data, rebar_detailed=rebar_detailed), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def run_sweep(
+    points: Sequence[SweepPoint], processes: Optional[int] = None, chunksize: int = 8
+) -> Iterator[Dict]:
+    """
+    计算扫描组合,按组合顺序逐行返回结果
+    :param points: sweep_points 生成的组合
+    :param processes: 计算进程数,None 表示 cpu 核数,0 表示在当前进程中计算
+    :param chunksize: 每次分发给计算进程的组合数量,相邻组合在同一进程中计算可复用中间结果
+    :return: 各列见 SWEEP_COLUMNS
+    """
+    valid = [point for point in points if point.parameter is not None]
+    outcomes = detailed_design_many(
+        (point.parameter for point in valid), processes=processes, chunksize=chunksize
+    )
+    outcome_iter: Iterator[Tuple[SweepPoint, DesignOutcome]] = zip(valid, outcomes)
+    pending = next(outcome_iter, None)
+    for point in points:
+        if point.parameter is None:
+            yield _sweep_row(point, None)
+            continue
+        yield _sweep_row(*pending)
+        pending = next(outcome_iter, None)
+
+
+def _sweep_row(point: SweepPoint, outcome: Optional[DesignOutcome]) -> Dict:
+    row = dict.fromkeys(SWEEP_COLUMNS, "")
+    row.update(length=point.length, height=point.height, thickness=point.thickness,
+               rebar_ratio="" if point.rebar_ratio is None else point.rebar_ratio)
+    if outcome is None or not outcome.success:
+        row.update(status="failed", layout_status="failed",
+                   error=point.error if outcome is None else repr(outcome.error))
+        if outcome is not None:
+            row["seconds"] = round(outcome.seconds, 4)
+        return row
+    result = outcome.result
+    truss_number = len(outcome.truss_rebar_for_BIM.truss_rebars) if outcome.truss_rebar_for_BIM else 0
+    row.update(
+        status="ok",
+        volume=result.volume,
+        area=result.area,
+        weight=result.weight,
+        horizontal_rebars=_rebar_specs(result.horizontal_rebars),
+        vertical_rebars=_rebar_specs(result.vertical_rebars),
+        truss_number=truss_number,
+        layout_status="ok" if truss_number else "no_truss",
+        seconds=round(outcome.seconds, 4),
+    )
+    return row
+
+
+def _rebar_specs(rebars) -> str:
+    return "/".join(f"{rebar.diameter}@{rebar.spacing}" for rebar in rebars)
+
+
+def write_sweep_csv(rows: Iterable[Dict], file: IO[str]) -> int:
+    """
+    按 SWEEP_COLUMNS 写入 csv
+    :return: 写入的行数
+    """
+    writer = csv.DictWriter(file, fieldnames=SWEEP_COLUMNS)
+    writer.writeheader()
+    number = 0
+    for row in rows:
+        writer.writerow(row)
+        number += 1
+    return number
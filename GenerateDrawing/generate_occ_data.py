@@ -1,5 +1,6 @@
 import copy
 
+from DoubleWallDesign.models import SupportInsertsPosition, WallLengthType
 from GenerateDrawing.tool import transform_cartesian_to_point,form_truss_stirrup_shape_data
 import math
 
@@ -32,9 +33,33 @@ class OCCData(object):
     """
     获取OCC数据
     """
-    def __init__(self,ifc_file,double_wall_geo):
+    def __init__(self,ifc_file,double_wall_geo,detailed_design=None):
+        """
+        :param detailed_design: 深化设计参数,提供时吊装、斜撑预埋件按其中的定位绘制,否则使用默认位置
+        """
         self.ifc_file = ifc_file
         self.double_wall_geo = double_wall_geo
+        self.detailed_design = detailed_design
+
+    def get_inserts_position(self,name):
+        """
+        预埋件定位,转换为以内墙左下角为原点的坐标
+        :param name: lifting_inserts_position 或 support_inserts_position
+        :return: (左侧 x, 右侧 x, 下部 z, 上部 z),没有定位时为 None
+        """
+        if self.detailed_design is None or self.detailed_design.inserts_detailed is None:
+            return None
+        position = getattr(self.detailed_design.inserts_detailed,name)
+        if position is None:
+            return None
+        geometric = self.detailed_design.geometric_detailed
+        x_offset = geometric.left_gap_length if geometric.wall_length_type != WallLengthType.YES else 0  # 内墙左端位置
+        z_offset = geometric.bottom_gap_height
+        left_x = position.x1-x_offset
+        right_x = geometric.length-position.x2-x_offset
+        if isinstance(position,SupportInsertsPosition):
+            return left_x,right_x,position.y1-z_offset,geometric.height-position.y2-z_offset
+        return left_x,right_x,None,None
     def get_ifc_solid_element(self,entity_name):
         """
         获取IFC文件实体元素
@@ -249,6 +274,9 @@ class OCCData(object):
         right_edge_distance = self.double_wall_geo.inner_side_wall_width-left_edge_distance
         bottom_height = 500
         top_height = self.double_wall_geo.inner_side_wall_height*2/3
+        position = self.get_inserts_position("support_inserts_position")
+        if position is not None:
+            left_edge_distance,right_edge_distance,bottom_height,top_height = position
         bolt_loc = [[left_edge_distance,0,bottom_height],[right_edge_distance,0,bottom_height],[left_edge_distance,0,top_height],[right_edge_distance,0,top_height]]
         bolt_profile = [(0,0,0),(0,bolt_length,0)]
         plate_shape = [(-plate_width/2,bolt_length,-plate_height/2),(plate_width/2,bolt_length,-plate_height/2),
@@ -317,6 +345,10 @@ class OCCData(object):
         top_project_width = 200 # 竖向投影宽度
         left_edge = 300  # 吊装预埋件左侧边距
         right_edge = 300
+        position = self.get_inserts_position("lifting_inserts_position")
+        if position is not None:
+            left_edge = position[0]
+            right_edge = self.double_wall_geo.inner_side_wall_width-position[1]
         horizon_height_1 = -(left_project_length-(320+diam/2))
         horizon_height_2 = -(left_project_length-(520+diam/2))
         notes = "D"+str(diam)+"钢筋"
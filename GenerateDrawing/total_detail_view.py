@@ -2,6 +2,7 @@
 开始绘制视图
 """
 
+from DoubleWallDesign.instrumentation import span
 from GenerateDrawing.model_data import DoubleShearWallViewData
 from GenerateDrawing.special_function import adjust_drawing_scale
 from GenerateDrawing.single_detail_view import DoubleWallFormFrontView,DoubleWallFormRightView,DoubleWallFormTopView,\
@@ -370,34 +371,36 @@ class DoubleShearWallTotalView(object):
                                           'yscale': 1,  # 缩放比例
                                           'rotation': 0})  # 逆时针旋转0度
 
-    def main_run_process(self):
+    def main_run_process(self, file_name: str = "tmp/double_shear_wall_detail_view.dxf"):
         """
         主要运行过程
+        :param file_name: dxf 保存路径
         :return:
         """
-        # 创建模板主视图
-        self.form_front_view.main_run_process()  # 绘制图形
-        self.place_form_front_view_block_position()  # 在模型空间放置块
-        self.form_right_view.main_run_process()  # 绘制右视图图形
-        self.place_form_right_view_block_position()  # 在模型空间放置块
-        self.form_top_view.main_run_process()
-        self.place_form_top_view_block_position()
-        # self.form_three_dim_view.main_run_process()
-        # self.place_form_three_dim_view_block_position()
-        self.rebar_reinforcement_view.main_run_process()
-        self.place_rebar_reinforcement_view_block_position()
-        self.reinforcement_one_section_view.main_run_process()
-        self.place_rebar_reinforcement_one_section_view_block_position()
-        self.reinforcement_two_section_view.main_run_process()
-        self.place_rebar_reinforcement_two_section_view_block_position()
-        self.truss_rebar_detail_view.main_run_process()
-        self.place_truss_rebar_detail_view_block_position()
-        self.truss_rebar_detail_rebar_view.main_run_process()
-        self.place_truss_rebar_detail_rebar_view_block_position()
-        self.hoist_embedded_part_view.main_run_process()
-        self.place_hoist_embedded_part_view_block_position()
-        self.total_design_info_table.main_run_process()
-        self.place_total_table_view_block_position()
-        self.dxf_doc.saveas("tmp/double_shear_wall_detail_view.dxf")
+        with span("drawing.create"):
+            # 创建模板主视图
+            self.form_front_view.main_run_process()  # 绘制图形
+            self.place_form_front_view_block_position()  # 在模型空间放置块
+            self.form_right_view.main_run_process()  # 绘制右视图图形
+            self.place_form_right_view_block_position()  # 在模型空间放置块
+            self.form_top_view.main_run_process()
+            self.place_form_top_view_block_position()
+            # self.form_three_dim_view.main_run_process()
+            # self.place_form_three_dim_view_block_position()
+            self.rebar_reinforcement_view.main_run_process()
+            self.place_rebar_reinforcement_view_block_position()
+            self.reinforcement_one_section_view.main_run_process()
+            self.place_rebar_reinforcement_one_section_view_block_position()
+            self.reinforcement_two_section_view.main_run_process()
+            self.place_rebar_reinforcement_two_section_view_block_position()
+            self.truss_rebar_detail_view.main_run_process()
+            self.place_truss_rebar_detail_view_block_position()
+            self.truss_rebar_detail_rebar_view.main_run_process()
+            self.place_truss_rebar_detail_rebar_view_block_position()
+            self.hoist_embedded_part_view.main_run_process()
+            self.place_hoist_embedded_part_view_block_position()
+            self.total_design_info_table.main_run_process()
+            self.place_total_table_view_block_position()
+            self.dxf_doc.saveas(file_name)
 
 
@@ -5,12 +5,14 @@
 # version    ：python 3.6
 # Description：
 """
+import math
 import time
 
 import numpy as np
 import copy
 
 
+from DoubleWallDesign.instrumentation import record_span
 from DoubleWallDesign.models import DetailedDesign, DetailedDesignResult
 from dc_rebar import *
 from .APF_compute import compute_aer, compute_Attract, compute_r
@@ -21,55 +23,25 @@ from DoubleWallDesign.models import RebarforBIM, RebarforBVBS
 
 
 
+_MAX_SHIFTS = 300  # 沿法向平移寻找不碰撞位置的最大次数
+
+
+def _shift_point(bar_dia, fcl_model, current_point_find, action, vecN):
+    """
+    current_point_find + vecN 沿 action 平移到不碰撞的位置
+    :return: 平移次数 - 1, 是否找到, 平移后的点(找不到时为平移 _MAX_SHIFTS + 1 次的点)
+    """
+    steps = fcl_model.free_agent_shift(current_point_find + vecN, action, bar_dia, _MAX_SHIFTS + 1)
+    found = steps is not None
+    if not found:
+        steps = _MAX_SHIFTS + 1
+    return steps - 1, found, current_point_find + steps * action + vecN
+
+
 def find_next_point(bar_dia, fcl_model, current_point_find, offset, action_1, action_2, vecN):
     if offset == 0:
-        L1 = 0
-        L2 = 0
-        current_point_1 = copy.deepcopy(current_point_find)
-        current_point_2 = copy.deepcopy(current_point_find)
-        num_1 = 0
-        current_point_1 = current_point_1 + action_1
-        check_point_1 = current_point_1 + vecN
-        agent = Agent(size=bar_dia, position=check_point_1)
-        check_ob = fcl_model.collision_agent(agent)
-        if check_ob == 0:
-            L1 = 1
-        else:
-            while check_ob == 1:
-                num_1 = num_1 + 1
-                current_point_1 = current_point_1 + action_1
-                check_point_1 = current_point_1 + vecN
-                agent = Agent(size=bar_dia, position=check_point_1)
-                check_ob = fcl_model.collision_agent(agent)
-                if check_ob == 0:
-                    L1 = 1
-                    break
-                if num_1 == 300:
-                    L1 = 0
-                    break
-        current_point_1 = current_point_1 + vecN
-
-        num_2 = 0
-        current_point_2 = current_point_2 + action_2
-        check_point_2 = current_point_2 + vecN
-        agent = Agent(size=bar_dia, position=check_point_2)
-        check_ob = fcl_model.collision_agent(agent)
-        if check_ob == 0:
-            L2 = 1
-        else:
-            while check_ob == 1:
-                num_2 = num_2 + 1
-                current_point_2 = current_point_2 + action_2
-                check_point_2 = current_point_2 + vecN
-                agent = Agent(size=bar_dia, position=check_point_2)
-                check_ob = fcl_model.collision_agent(agent)
-                if check_ob == 0:
-                    L2 = 1
-                    break
-                if num_2 == 300:
-                    L2 = 0
-                    break
-        current_point_2 = current_point_2 + vecN
+        num_1, L1, current_point_1 = _shift_point(bar_dia, fcl_model, current_point_find, action_1, vecN)
+        num_2, L2, current_point_2 = _shift_point(bar_dia, fcl_model, current_point_find, action_2, vecN)
         if num_1 <= num_2 or (not L2 and L1):
             next_point = current_point_1
         elif num_1 > num_2 or (not L1 and L2):
@@ -78,66 +50,23 @@ def find_next_point(bar_dia, fcl_model, current_point_find, offset, action_1, ac
             raise Exception("钢筋无法完成排布")
         return next_point
     if offset == 1:
-        L1 = 0
-        current_point_1 = copy.deepcopy(current_point_find)
-        num_1 = 0
-        current_point_1 = current_point_1 + action_1
-        check_point_1 = current_point_1 + vecN
-        agent = Agent(size=bar_dia, position=check_point_1)
-        check_ob = fcl_model.collision_agent(agent)
-        if check_ob == 0:
-            L1 = 1
-        else:
-            while check_ob == 1:
-                num_1 = num_1 + 1
-                current_point_1 = current_point_1 + action_1
-                check_point_1 = current_point_1 + vecN
-                agent = Agent(size=bar_dia, position=check_point_1)
-                check_ob = fcl_model.collision_agent(agent)
-                if check_ob == 0:
-                    L1 = 1
-                    break
-                if num_1 == 300:
-                    L1 = 0
-                    break
+        num_1, L1, current_point_1 = _shift_point(bar_dia, fcl_model, current_point_find, action_1, vecN)
         if not L1:
             raise Exception("钢筋无法完成排布")
-        current_point_1 = current_point_1 + vecN
         next_point = current_point_1
         return next_point
     if offset == 2:
-        L2 = 0
-        current_point_2 = copy.deepcopy(current_point_find)
-        num_2 = 0
-        current_point_2 = current_point_2 + action_2
-        check_point_2 = current_point_2 + vecN
-        agent = Agent(size=bar_dia, position=check_point_2)
-        check_ob = fcl_model.collision_agent(agent)
-        if check_ob == 0:
-            L2 = 1
-        else:
-            while check_ob == 1:
-                num_2 = num_2 + 1
-                current_point_2 = current_point_2 + action_2
-                check_point_2 = current_point_2 + vecN
-                agent = Agent(size=bar_dia, position=check_point_2)
-                check_ob = fcl_model.collision_agent(agent)
-                if check_ob == 0:
-                    L2 = 1
-                    break
-                if num_2 == 300:
-                    L2 = 0
-                    break
+        num_2, L2, current_point_2 = _shift_point(bar_dia, fcl_model, current_point_find, action_2, vecN)
         if not L2:
             raise Exception("钢筋无法完成排布")
-        current_point_2 = current_point_2 + vecN
         next_point = current_point_2
         return next_point
 
 
-def APF(st_p, object_p, fcl_model, bar_dia, offset, normal_vector, qa=1):
+def APF(st_p, object_p, fcl_model, bar_dia, offset, normal_vector, qa=1, continuous=False):
     '''
     势能场法APF
+    :param continuous: 连续碰撞检测,沿直线一次求得碰撞位置,代替逐步移动检测
     :param normal_vector:
     :param st_p:
     :param object_p:
@@ -159,6 +88,9 @@ def APF(st_p, object_p, fcl_model, bar_dia, offset, normal_vector, qa=1):
     bar_cell = [list(st_p)]
     current_point = copy.deepcopy(st_p_tem)
     bar_cell.append(current_point.tolist())
+    if continuous:
+        return _APF_continuous(object_p, fcl_model, bar_dia, offset, action_1, action_2, vecN, bar_cell,
+                               object_p_tem, label, step_length)
     for kstep in range(5000):
         att_r = compute_r(current_point, object_p_tem)
         att_azimuth, att_elevation = compute_aer(current_point, object_p_tem, att_r)
@@ -193,6 +125,32 @@ def APF(st_p, object_p, fcl_model, bar_dia, offset, normal_vector, qa=1):
     return bar_cell
 
 
+def _APF_continuous(object_p, fcl_model, bar_dia, offset, action_1, action_2, vecN, bar_cell, object_p_tem, label,
+                    step_length):
+    '''
+    APF 的连续碰撞检测模式: 沿指向目标点的直线求首次碰撞位置,直接移动到碰撞前最后一个步长整数倍的位置
+    (与逐步移动的位置相同),再按 find_next_point 绕开障碍物
+    '''
+    current_point = np.array(bar_cell[-1])
+    for kstep in range(5000):
+        length = np.linalg.norm(object_p_tem - current_point)
+        hit = fcl_model.sweep_agent(current_point, object_p_tem, bar_dia) if length > 0 else None
+        if hit is None:
+            bar_cell.append(object_p_tem.tolist())
+            break
+        num = math.ceil(hit * length / step_length)  # 第 num 步开始碰撞
+        if num > 1:
+            current_point = current_point + (num - 1) * step_length * (object_p_tem - current_point) / length
+            bar_cell.append(current_point.tolist())
+        next_point = find_next_point(bar_dia, fcl_model, current_point, offset, action_1, action_2, vecN)
+        bar_cell.append(next_point.tolist())
+        current_point = next_point
+        if abs(current_point[label] - object_p_tem[label]) <= step_length:
+            break
+    bar_cell.append(object_p.tolist())
+    return bar_cell
+
+
 def APF_rebar(fcl_model, bar, bar_dia, offset, normal_vector, qa=1):
     '''
     势能场法APF_钢筋
@@ -211,51 +169,8 @@ def APF_rebar(fcl_model, bar, bar_dia, offset, normal_vector, qa=1):
     check_ob = fcl_model.collision_check_add(rebar_objs)
     if check_ob == 1:
         if offset == 0:
-            L1 = 0
-            L2 = 0
-            current_rebar_1 = copy.deepcopy(bar)
-            current_rebar_2 = copy.deepcopy(bar)
-            num_1 = 0
-            current_rebar_1 = current_rebar_1 + action_1
-            rebar_fcls = fcl_model.new_rebar_fcl(current_rebar_1, bar_dia)
-            rebar_objs = fcl_model.new_obj(rebar_fcls)
-            check_ob = fcl_model.collision_check_add(rebar_objs)
-            if check_ob == 0:
-                L1 = 1
-            else:
-                while check_ob == 1:
-                    num_1 = num_1 + 1
-                    current_rebar_1 = current_rebar_1 + action_1
-                    rebar_fcls = fcl_model.new_rebar_fcl(current_rebar_1, bar_dia)
-                    rebar_objs = fcl_model.new_obj(rebar_fcls)
-                    check_ob = fcl_model.collision_check_add(rebar_objs)
-                    if check_ob == 0:
-                        L1 = 1
-                        break
-                    if num_1 == 300:
-                        L1 = 0
-                        break
-
-            num_2 = 0
-            current_rebar_2 = current_rebar_2 + action_2
-            rebar_fcls = fcl_model.new_rebar_fcl(current_rebar_2, bar_dia)
-            rebar_objs = fcl_model.new_obj(rebar_fcls)
-            check_ob = fcl_model.collision_check_add(rebar_objs)
-            if check_ob == 0:
-                L2 = 1
-            else:
-                while check_ob == 1:
-                    num_2 = num_2 + 1
-                    current_rebar_2 = current_rebar_2 + action_2
-                    rebar_fcls = fcl_model.new_rebar_fcl(current_rebar_2, bar_dia)
-                    rebar_objs = fcl_model.new_obj(rebar_fcls)
-                    check_ob = fcl_model.collision_check_add(rebar_objs)
-                    if check_ob == 0:
-                        L2 = 1
-                        break
-                    if num_2 == 300:
-                        L2 = 0
-                        break
+            num_1, L1, current_rebar_1 = _shift_rebar(fcl_model, bar, bar_dia, action_1)
+            num_2, L2, current_rebar_2 = _shift_rebar(fcl_model, bar, bar_dia, action_2)
             if num_1 <= num_2 or (not L2 and L1):
                 rebar_set = current_rebar_1
             elif num_1 > num_2 or (not L1 and L2):
@@ -268,6 +183,18 @@ def APF_rebar(fcl_model, bar, bar_dia, offset, normal_vector, qa=1):
         return rebar_set
 
 
+def _shift_rebar(fcl_model, bar, bar_dia, action):
+    """
+    钢筋 bar 整体沿 action 平移到不碰撞的位置
+    :return: 平移次数 - 1, 是否找到, 平移后的钢筋(找不到时为平移 _MAX_SHIFTS + 1 次的钢筋)
+    """
+    steps = fcl_model.free_rebar_shift(bar, action, bar_dia, _MAX_SHIFTS + 1)
+    found = steps is not None
+    if not found:
+        steps = _MAX_SHIFTS + 1
+    return steps - 1, found, copy.deepcopy(bar) + steps * action
+
+
 def long_rebar_data_convert(rebar_list, rebar_dia):
     '''
     整理钢筋数据
@@ -644,5 +571,5 @@ def rebar_layout(detailed_design: DetailedDesign, detailed_design_result: Detail
     fcl_model = mid_rebar_layout.fcl_model
     stop = time.time()
 
-    print(stop - start)
+    record_span("rebar_layout.edge_and_mid_rebars", stop - start)
     return rebar_for_BIM, rebar_for_BVBS
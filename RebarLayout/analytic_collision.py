@@ -0,0 +1,327 @@
+"""
+# File       : analytic_collision.py
+# Description：轴对齐几何体的解析碰撞检测
+
+保护层、孔洞与钢筋几乎都是轴对齐的长方体或沿坐标轴的圆柱体,用 NumPy 批量计算:
+- 长方体: 包围盒相交
+- 圆柱体与长方体、同向圆柱体: 沿轴向区间相交,截面内圆与矩形(圆)的距离小于半径(与 fcl 相同,相切不算碰撞)
+- 球与长方体、圆柱体: 球心到几何体的距离不大于球半径
+- 垂直的圆柱体: 两轴线在对方轴向范围内且距离小于半径之和时为碰撞,否则包围盒相交时交给 fcl 窄相检测
+- 长方体之间接触即为碰撞,与 fcl 相同
+- 其他情况(胶囊体等)只以紧包围盒过滤,包围盒相交时交给 fcl
+- 球沿线段扫掠: 求首次接触的位置参数
+斜向、非轴对齐的几何体不属于解析几何体,仍由 fcl 检测
+"""
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+BOX = 0
+CYLINDER = 1
+SPHERE = 2
+CAPSULE = 3
+
+_AXIS_TOLERANCE = 1e-9
+_CHUNK = 1 << 20  # 批量检测球时每次计算的 点数 × 几何体数
+_GOLDEN = (np.sqrt(5) - 1) / 2
+_SWEEP_TOLERANCE = 1e-6  # 线段扫掠求得的接触位置精度
+
+
+@dataclass
+class AnalyticShape:
+    """
+    轴对齐几何体
+    half: 包围盒的半尺寸,圆柱体与胶囊体沿轴向为半长(胶囊体含端部半球),其余两向为半径
+    """
+    kind: int
+    axis: int  # 圆柱体与胶囊体的轴向 0/1/2,长方体与球为 -1
+    center: np.ndarray
+    half: np.ndarray
+    radius: float = 0.0
+
+
+def _axis_of(transformation) -> Optional[np.ndarray]:
+    """
+    旋转矩阵为带符号的置换矩阵(轴对齐)时返回其绝对值,否则返回 None
+    """
+    R = np.abs(np.asarray(transformation, dtype=float).reshape(3, 3))
+    permutation = np.round(R)
+    if np.abs(R - permutation).max() > _AXIS_TOLERANCE or not (permutation.sum(axis=0) == 1).all() \
+            or not (permutation.sum(axis=1) == 1).all():
+        return None
+    return permutation
+
+
+def analytic_shape(obj) -> Optional[AnalyticShape]:
+    """
+    fcl_models 中的几何体转换为解析几何体,非轴对齐或尺寸不合法时返回 None
+    :param obj: Box_fcl, Diagonal_fcl, Cylinder_fcl, Rebar_fcl
+    """
+    center = np.asarray(obj.position, dtype=float).reshape(3)
+    if obj.type == "Box":
+        permutation = _axis_of(obj.transformation)
+        size = np.array([obj.x, obj.y, obj.z], dtype=float)
+        if permutation is None or (size <= 0).any():
+            return None
+        return AnalyticShape(BOX, -1, center, permutation @ size / 2)
+    if obj.type == "Cylinder":
+        axis, radius = 2, float(obj.radius)
+    elif obj.type == "Rebar":
+        permutation = _axis_of(obj.transformation)
+        if permutation is None:
+            return None
+        axis, radius = int(np.argmax(permutation[:, 2])), float(obj.diameter) / 2
+    else:
+        return None
+    if obj.length <= 0 or radius <= 0:
+        return None
+    half = np.full(3, radius)
+    half[axis] = float(obj.length) / 2
+    return AnalyticShape(CYLINDER, axis, center, half, radius)
+
+
+def sphere_shape(center, radius: float) -> AnalyticShape:
+    return AnalyticShape(SPHERE, -1, np.asarray(center, dtype=float).reshape(3), np.full(3, float(radius)),
+                         float(radius))
+
+
+def capsule_shape(start, end, radius: float) -> AnalyticShape:
+    """
+    胶囊体只用于包围盒过滤,轴向不必沿坐标轴
+    """
+    start, end = np.asarray(start, dtype=float).reshape(3), np.asarray(end, dtype=float).reshape(3)
+    return AnalyticShape(CAPSULE, -1, (start + end) / 2, np.abs(end - start) / 2 + radius, float(radius))
+
+
+class AnalyticShapes:
+    """
+    解析几何体集合,按批加入,查询时合并为数组
+    index: 几何体对应的 fcl 对象在 ShearWallFCLModel.objs 中的序号,用于不能解析判断时的窄相检测
+    前 _sorted 个几何体分组排序,之后加入的几何体逐个计算,超过已排序数量的 1/4 时重新排序,
+    加入与查询交替进行时排序的开销均摊为常数
+    """
+
+    def __init__(self):
+        self._pending: List[Tuple[AnalyticShape, int]] = []
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.axis = np.zeros(0, dtype=np.int8)
+        self.center = np.zeros((0, 3))
+        self.half = np.zeros((0, 3))
+        self.radius = np.zeros(0)
+        self.index = np.zeros(0, dtype=np.int64)
+        self._groups: List[Tuple[np.ndarray, int, int, np.ndarray, float]] = []
+        self._sorted = 0
+
+    def __len__(self):
+        return len(self.kind) + len(self._pending)
+
+    def append(self, shape: AnalyticShape, index: int):
+        self._pending.append((shape, index))
+
+    def _merge(self):
+        if not self._pending:
+            return
+        shapes, indices = zip(*self._pending)
+        self._pending = []
+        self.kind = np.concatenate([self.kind, [shape.kind for shape in shapes]]).astype(np.int8)
+        self.axis = np.concatenate([self.axis, [shape.axis for shape in shapes]]).astype(np.int8)
+        self.center = np.concatenate([self.center, [shape.center for shape in shapes]])
+        self.half = np.concatenate([self.half, [shape.half for shape in shapes]])
+        self.radius = np.concatenate([self.radius, [shape.radius for shape in shapes]])
+        self.index = np.concatenate([self.index, indices]).astype(np.int64)
+        if len(self.kind) - self._sorted <= max(64, self._sorted // 4):
+            return
+        self._sorted = len(self.kind)
+        # 长方体 (axis=-1) 与各轴向的圆柱体分组: (按排序轴排序的序号, 轴向, 排序轴, 排序后的中心坐标, 最大半尺寸)
+        # 排序轴取窗口占坐标范围比例最小的轴,如竖向钢筋取墙长方向
+        self._groups = []
+        groups = [(np.flatnonzero(self.kind == BOX), -1)]
+        groups += [(np.flatnonzero((self.kind == CYLINDER) & (self.axis == axis)), axis) for axis in range(3)]
+        for indices, axis in groups:
+            if len(indices) == 0:
+                continue
+            reach = self.half[indices].max(axis=0)
+            span = np.ptp(self.center[indices], axis=0)
+            key = int(np.argmin(reach / (span + 2 * reach)))
+            order = indices[np.argsort(self.center[indices, key], kind="stable")]
+            self._groups.append((order, axis, key, self.center[order, key], float(reach[key])))
+
+    def _candidates(self, shape: AnalyticShape) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        包围盒与 shape 相交的几何体序号及中心坐标差的绝对值
+        """
+        self._merge()
+        windows = [
+            order[np.searchsorted(keys, shape.center[key] - reach - shape.half[key], side="left"):
+                  np.searchsorted(keys, shape.center[key] + reach + shape.half[key], side="right")]
+            for order, _, key, keys, reach in self._groups
+        ]
+        candidates = np.concatenate(windows + [np.arange(self._sorted, len(self.kind))])
+        delta = np.abs(self.center[candidates] - shape.center)
+        overlap = (delta <= self.half[candidates] + shape.half).all(axis=1)
+        return candidates[overlap], delta[overlap]
+
+    def overlapping(self, shape: AnalyticShape) -> np.ndarray:
+        """
+        包围盒与 shape 相交的几何体的 fcl 对象序号
+        """
+        candidates, _ = self._candidates(shape)
+        return self.index[candidates]
+
+    def collide(self, shape: AnalyticShape) -> Tuple[bool, np.ndarray]:
+        """
+        单个几何体与集合的碰撞
+        :return: 是否确定碰撞, 需要 fcl 窄相检测的 fcl 对象序号(确定碰撞时为空)
+        """
+        candidates, delta = self._candidates(shape)
+        if len(candidates) == 0:
+            return False, candidates
+        kind, axis = self.kind[candidates], self.axis[candidates]
+        half, radius = self.half[candidates], self.radius[candidates]
+        if shape.kind == BOX:
+            length_half = half[np.arange(len(delta)), np.maximum(axis, 0)]
+            hit = np.where(kind == BOX, True, self._cylinder_box(delta, axis, radius, length_half, shape.half))
+            return bool(hit.any()), candidates[:0]
+        if shape.kind == SPHERE:
+            return bool((self._distance2(delta, candidates) <= shape.radius ** 2).any()), candidates[:0]
+        if shape.kind == CYLINDER:
+            a = shape.axis
+            rows = np.arange(len(delta))
+            same = (kind == CYLINDER) & (axis == a)
+            box = kind == BOX
+            # 长方体: 以长方体为参照,圆柱体沿 a 轴
+            hit_box = self._cylinder_box(delta, np.full(len(delta), a), np.full(len(delta), shape.radius),
+                                         np.full(len(delta), shape.half[a]), half)
+            # 同向圆柱体: 轴向区间相交,截面内两圆心距离小于半径之和
+            radial2 = (delta ** 2).sum(axis=1) - delta[:, a] ** 2
+            hit_same = (radial2 < (radius + shape.radius) ** 2) & (delta[:, a] < half[:, a] + shape.half[a])
+            # 垂直圆柱体: 两轴线在对方轴向范围内,且两轴线的距离(第三个轴向)小于半径之和
+            other = np.maximum(axis, 0)
+            third = (3 - a - other) % 3  # 同向圆柱体与长方体的结果不使用,只需序号有效
+            crossing = (delta[:, a] <= shape.half[a]) & (delta[rows, other] <= half[rows, other]) \
+                & (delta[rows, third] < radius + shape.radius)
+            hit = np.where(box, hit_box, np.where(same, hit_same, crossing))
+            if hit.any():
+                return True, candidates[:0]
+            return False, self.index[candidates[~box & ~same]]
+        # 胶囊体等只以包围盒过滤
+        return False, self.index[candidates]
+
+    def collide_spheres(self, points, radius: float) -> np.ndarray:
+        """
+        批量检测半径相同的球
+        长方体与各轴向的圆柱体分组,组内按排序轴的中心坐标排序,每个点只计算排序轴上可能相交的窗口
+        :param points: (N, 3) 球心
+        :return: (N,) bool
+        """
+        self._merge()
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        hits = np.zeros(len(points), dtype=bool)
+        if len(points) == 0:
+            return hits
+        radius2 = radius ** 2
+        for order, axis, key, keys, reach in self._groups:
+            lower = np.searchsorted(keys, points[:, key] - reach - radius, side="left")
+            upper = np.searchsorted(keys, points[:, key] + reach + radius, side="right")
+            step = max(1, _CHUNK // max(1, int((upper - lower).max())))
+            for start in range(0, len(points), step):
+                stop = start + step
+                width = int((upper[start:stop] - lower[start:stop]).max())
+                if width == 0:
+                    continue
+                columns = lower[start:stop, None] + np.arange(width)  # (N, W) 窗口内的序号
+                valid = columns < upper[start:stop, None]
+                indices = order[np.minimum(columns, len(order) - 1)]
+                delta = np.abs(points[start:stop, None, :] - self.center[indices])
+                half = self.half[indices]
+                if axis < 0:
+                    distance2 = (np.maximum(delta - half, 0) ** 2).sum(axis=2)
+                else:
+                    u, v = (k for k in range(3) if k != axis)
+                    radial = np.maximum(np.hypot(delta[..., u], delta[..., v]) - self.radius[indices], 0)
+                    distance2 = np.maximum(delta[..., axis] - half[..., axis], 0) ** 2 + radial ** 2
+                hits[start:stop] |= ((distance2 <= radius2) & valid).any(axis=1)
+        tail = np.arange(self._sorted, len(self.kind))
+        if len(tail):
+            step = max(1, _CHUNK // len(tail))
+            for start in range(0, len(points), step):
+                delta = np.abs(points[start:start + step, None, :] - self.center[tail])
+                hits[start:start + step] |= (self._distance2(delta, tail) <= radius2).any(axis=1)
+        return hits
+
+    def sweep_sphere(self, start, end, radius: float) -> float:
+        """
+        球心沿线段 start → end 移动时首次接触的位置参数
+        先求线段穿过各几何体包围盒(外扩 radius)的参数区间,接触只可能发生在区间内;
+        球心到凸几何体的距离沿线段为凸函数: 在区间内以黄金分割求最小距离处,再在 [区间起点, 最小距离处] 内二分
+        :return: t ∈ [0, 1],不接触时为 inf
+        """
+        start, end = np.asarray(start, dtype=float).reshape(3), np.asarray(end, dtype=float).reshape(3)
+        candidates, _ = self._candidates(capsule_shape(start, end, radius))
+        if len(candidates) == 0:
+            return np.inf
+        direction = end - start
+        # slab 法求线段在外扩包围盒内的参数区间
+        lower_bound = self.center[candidates] - self.half[candidates] - radius - start
+        upper_bound = self.center[candidates] + self.half[candidates] + radius - start
+        moving = direction != 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t1, t2 = lower_bound / direction, upper_bound / direction
+        inside = (lower_bound <= 0) & (upper_bound >= 0)  # 该轴不移动时起点须在包围盒内
+        enter = np.where(moving, np.minimum(t1, t2), np.where(inside, -np.inf, np.inf)).max(axis=1)
+        leave = np.where(moving, np.maximum(t1, t2), np.where(inside, np.inf, -np.inf)).min(axis=1)
+        enter, leave = np.maximum(enter, 0), np.minimum(leave, 1)
+        keep = enter <= leave
+        if not keep.any():
+            return np.inf
+        candidates, enter, leave = candidates[keep], enter[keep], leave[keep]
+
+        def gap(t: np.ndarray, indices: np.ndarray) -> np.ndarray:
+            delta = np.abs(start + t[:, None] * direction - self.center[indices])
+            return self._distance2(delta, indices) - radius ** 2
+
+        # 黄金分割与二分的次数: 区间长度缩小到 _SWEEP_TOLERANCE
+        scale = max(float(np.linalg.norm(direction)) / _SWEEP_TOLERANCE, 1.0)
+        # 区间起点即接触的几何体,首次接触为区间起点;其余几何体接触只可能早于该位置时才继续求解
+        touch = gap(enter, candidates) <= 0
+        first = enter[touch].min() if touch.any() else np.inf
+        search = ~touch & (enter < first)
+        candidates, lower, upper = candidates[search], enter[search], leave[search]
+        for _ in range(math.ceil(math.log(scale) / -math.log(_GOLDEN))):
+            left, right = upper - _GOLDEN * (upper - lower), lower + _GOLDEN * (upper - lower)
+            closer = gap(left, candidates) < gap(right, candidates)
+            lower, upper = np.where(closer, lower, left), np.where(closer, right, upper)
+        nearest = (lower + upper) / 2
+        touch = gap(nearest, candidates) <= 0
+        candidates, lower, upper = candidates[touch], enter[search][touch], nearest[touch]
+        for _ in range(math.ceil(math.log2(scale))):
+            middle = (lower + upper) / 2
+            inside = gap(middle, candidates) <= 0
+            lower, upper = np.where(inside, lower, middle), np.where(inside, middle, upper)
+        return float(min(first, upper.min(initial=np.inf)))
+
+    def _distance2(self, delta: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """
+        点到几何体距离的平方,delta 为 (..., M, 3) 的点与几何体中心坐标差的绝对值
+        """
+        kind, axis = self.kind[candidates], self.axis[candidates]
+        half, radius = self.half[candidates], self.radius[candidates]
+        onehot = np.arange(3) == np.maximum(axis, 0)[:, None]
+        box = (np.maximum(delta - half, 0) ** 2).sum(axis=-1)
+        axial = np.maximum(((delta - half) * onehot).sum(axis=-1), 0)
+        radial = np.maximum(np.sqrt((delta ** 2 * ~onehot).sum(axis=-1)) - radius, 0)
+        return np.where(kind == CYLINDER, axial ** 2 + radial ** 2, box)
+
+    @staticmethod
+    def _cylinder_box(delta: np.ndarray, axis: np.ndarray, radius: np.ndarray, length_half: np.ndarray,
+                      box_half: np.ndarray) -> np.ndarray:
+        """
+        圆柱体与长方体是否相交(包围盒已相交),相切不算相交,delta 为中心坐标差的绝对值
+        :param length_half: 圆柱体轴向的半长
+        """
+        onehot = np.arange(3) == axis[:, None]
+        excess = np.maximum(delta - box_half, 0) * ~onehot
+        axial = (delta * onehot).sum(axis=1) < (box_half * onehot).sum(axis=1) + length_half
+        return ((excess ** 2).sum(axis=1) < radius ** 2) & axial
@@ -7,17 +7,89 @@
 """
 import copy
 import math
-from typing import List
+from typing import Callable, Iterator, List, Optional, Sequence
 
 import fcl
 import numpy as np
-from RebarLayout.fcl_models import Rebar_fcl, Box_fcl, Diagonal_fcl, Cylinder_fcl
+from DoubleWallDesign.instrumentation import count
+from RebarLayout.analytic_collision import AnalyticShapes, analytic_shape, capsule_shape, sphere_shape
+from RebarLayout.fcl_models import Rebar_fcl, Box_fcl, Diagonal_fcl, Cylinder_fcl, Agent
 from RebarLayout.tools import rotation_matrix_from_vectors
 
+
+_ADVANCE_ITERATIONS = 100  # 保守推进的最大次数
+_ADVANCE_TOLERANCE = 1e-6  # 保守推进时视为接触的距离
+
+
+def first_contact_callback(o1, o2, cdata):
+    """
+    broadphase 回调: 找到第一个接触即停止遍历
+    """
+    if fcl.collide(o1, o2, cdata.request, cdata.result):
+        cdata.done = True
+    return cdata.done
+
+
+def contact_pairs_callback(o1, o2, pairs):
+    """
+    broadphase 回调: 收集碰撞的几何体对(接触点中的几何体即注册时的几何体)
+    """
+    result = fcl.CollisionResult()
+    if fcl.collide(o1, o2, fcl.CollisionRequest(num_max_contacts=1, enable_contact=True), result):
+        pairs.append((result.contacts[0].o1, result.contacts[0].o2))
+    return False
+
+
+def first_free_shift(collides: Callable[[int], bool], blockers: Callable[[int], list], max_steps: int) -> Optional[int]:
+    """
+    沿固定方向平移 k 次(k = 1..max_steps)后不碰撞的最小 k,结果与逐次平移检测相同
+    凸几何体对沿直线平移时碰撞的位置连续: 对当前碰撞的每一对,以穿透深度跳过必然碰撞的位置,
+    再倍增步数确定碰撞区间的上界、二分求最后碰撞的位置,直接跳到所有碰撞区间之后
+    :param collides: 平移 k 次后是否碰撞
+    :param blockers: 平移 k 次后碰撞的几何体对 [(平移 k' 次后该对是否碰撞, 返回之后必然碰撞的平移次数的函数), ...]
+    :return: 找不到时返回 None
+    """
+    k = 1
+    while k <= max_steps:
+        if not collides(k):
+            return k
+        last = k
+        for pair_collides, skip in blockers(k):
+            # 已跳过的位置之后该对不再碰撞时,其碰撞区间不超过 last
+            if last > k and (last >= max_steps or not pair_collides(last + 1)):
+                continue
+            lower = max(k + skip(), last + 1 if last > k else k)
+            last = _last_collision(pair_collides, min(lower, max_steps), max_steps)
+        k = last + 1
+    return None
+
+
+def _last_collision(collides: Callable[[int], bool], lower: int, max_steps: int) -> int:
+    # lower 处碰撞且碰撞位置连续: 倍增确定上界,二分求不超过 max_steps 的最后碰撞位置
+    width = 1
+    while lower + width <= max_steps and collides(lower + width):
+        lower, width = lower + width, width * 2
+    upper = min(lower + width, max_steps + 1)
+    while upper - lower > 1:
+        middle = (lower + upper) // 2
+        if collides(middle):
+            lower = middle
+        else:
+            upper = middle
+    return lower
+
+
 class ShearWallFCLModel():
     def __init__(self):
         self.geoms = []  # 几何体列表
         self.objs = []  # 对象列表
+        # 持久的 broadphase,随 add_obj 增量插入,碰撞查询不再重复注册已有对象
+        self.manager = fcl.DynamicAABBTreeCollisionManager()
+        self._agent_spheres = {}  # 半径: 点智能体复用的球体几何
+        # 轴对齐的长方体与圆柱体由 NumPy 解析检测,其余对象另建 manager 由 fcl 检测
+        self.shapes = AnalyticShapes()
+        self.fallback_manager = fcl.DynamicAABBTreeCollisionManager()
+        self._geom_objs = {}  # id(几何体): 对象,由碰撞接触中的几何体找到对象
 
     def add_rebar(self, rebar, dia):
         objs = []
@@ -40,7 +112,11 @@ class ShearWallFCLModel():
         self.add_obj(objs)
 
     def add_obj(self, objs_new):
+        count("fcl.objects", len(objs_new))
+        objs_added = len(self.objs)
+        fallback = []
         for obj_new in objs_new:
+            index, shape = len(self.objs), analytic_shape(obj_new)
             if obj_new.type == "Cylinder":
                 geo_new = fcl.Cylinder(obj_new.radius, obj_new.length)
                 T = np.array(obj_new.position)
@@ -61,6 +137,17 @@ class ShearWallFCLModel():
                 obj_new = fcl.CollisionObject(geo_new, fcl.Transform(R, T))
                 self.geoms.append(geo_new)
                 self.objs.append(obj_new)
+            if len(self.objs) > index:
+                if shape is None:
+                    fallback.append(self.objs[index])
+                else:
+                    self.shapes.append(shape, index)
+        # 空树时整体构建,之后逐个插入动态 AABB 树
+        self.manager.registerObjects(self.objs[objs_added:])
+        self.manager.setup()
+        self._geom_objs.update((id(geom), obj) for geom, obj in zip(self.geoms[objs_added:], self.objs[objs_added:]))
+        self.fallback_manager.registerObjects(fallback)
+        self.fallback_manager.setup()
 
     def new_rebar_fcl(self, rebar, dia):
         rebar_fcls = []
@@ -109,32 +196,13 @@ class ShearWallFCLModel():
         :param objs_new: [obj, obj]
         :return:
         '''
-        # 创建manager
-        manager_orginal = fcl.DynamicAABBTreeCollisionManager()  # 实例化
+        # 已有对象使用持久的 manager,只为新对象创建 manager
         manager_new = fcl.DynamicAABBTreeCollisionManager()  # 实例化
-
-        manager_orginal.registerObjects(self.objs)  # 注册
         manager_new.registerObjects(objs_new)  # 注册
-
-        manager_orginal.setup()
         manager_new.setup()
-        # 创建碰撞请求结构
-        crequest = fcl.CollisionRequest(num_max_contacts=10000, enable_contact=True)
-        cresult = fcl.CollisionResult()
-        cdata = fcl.CollisionData(crequest, cresult)
-
         # 运行碰撞请求
-        manager_orginal.collide(manager_new, cdata, fcl.defaultCollisionCallback)
-
-        if len(cdata.result.contacts) != 0:
-            for contact in cdata.result.contacts:
-                # 提取contacts中的碰撞几何
-                coll_geom_0 = contact.o1  # 碰撞是成对出现的所有是o1,o2
-                coll_geom_1 = contact.o2
-                # print(coll_geom_0, coll_geom_1, contact.pos)
-            return True
-        else:
-            return False
+        count("fcl.collision_queries")
+        return self._collide_first(manager_new)
     def collision_agent_rebar(self, agent):
         # 增加智能体
         objs_new = []
@@ -156,28 +224,218 @@ class ShearWallFCLModel():
             obj = fcl.CollisionObject(geo_new, fcl.Transform(R, T))
             objs_new.append(obj)
 
-        # 创建manager
-        manager_orginal = fcl.DynamicAABBTreeCollisionManager()  # 实例化
+        # 已有对象使用持久的 manager,只为新对象创建 manager
         manager_new = fcl.DynamicAABBTreeCollisionManager()  # 实例化
-
-        manager_orginal.registerObjects(self.objs)  # 注册
         manager_new.registerObjects(objs_new)  # 注册
-
-        manager_orginal.setup()
         manager_new.setup()
-        # 创建碰撞请求结构
-        crequest = fcl.CollisionRequest(num_max_contacts=10000, enable_contact=True)
-        cdata = fcl.CollisionData(crequest, fcl.CollisionResult())
-
         # 运行碰撞请求
-        manager_orginal.collide(manager_new, cdata, fcl.defaultCollisionCallback)
-
-        if len(cdata.result.contacts) != 0:
-            for contact in cdata.result.contacts:
-                # 提取contacts中的碰撞几何
-                coll_geom_0 = contact.o1  # 碰撞是成对出现的所有是o1,o2
-                coll_geom_1 = contact.o2
-                # print(coll_geom_0, coll_geom_1, contact.pos)
+        count("fcl.collision_queries")
+        return self._collide_first(manager_new)
+
+    def _agent_sphere(self, size: float):
+        # 几何体按半径缓存,对象每次新建: 模型可能被多个线程共享
+        radius = math.ceil(size / 2)
+        if radius not in self._agent_spheres:
+            self._agent_spheres[radius] = fcl.Sphere(radius)
+        return fcl.CollisionObject(self._agent_spheres[radius], fcl.Transform())
+
+    def _collide_first(self, obj, manager=None) -> bool:
+        # 只判断是否碰撞: 不生成接触点,第一个接触即返回; obj 为对象或 manager
+        manager = self.manager if manager is None else manager
+        if manager.empty():
+            return False
+        cdata = fcl.CollisionData(fcl.CollisionRequest(num_max_contacts=1, enable_contact=False),
+                                  fcl.CollisionResult())
+        manager.collide(obj, cdata, first_contact_callback)
+        return cdata.result.is_collision
+
+    def _collide_analytic(self, shape, new_obj) -> bool:
+        """
+        解析检测与轴对齐对象的碰撞,不能解析判断的对象与非轴对齐对象由 fcl 检测
+        :param shape: 解析几何体
+        :param new_obj: 返回 fcl 对象的函数,需要 fcl 检测时才创建
+        """
+        hit, indices = self.shapes.collide(shape)
+        if hit:
             return True
-        else:
+        if len(indices) == 0 and self.fallback_manager.empty():
             return False
+        obj = new_obj()
+        request = fcl.CollisionRequest(num_max_contacts=1, enable_contact=False)
+        if any(fcl.collide(obj, self.objs[index], request) for index in indices):
+            return True
+        return self._collide_first(obj, self.fallback_manager)
+
+    def collision_check(self, objs_new) -> bool:
+        """
+        与 collision_check_add 相同,objs_new 为 fcl_models 中的几何体(与 add_obj 相同),轴对齐的几何体解析检测
+        :param objs_new: [Rebar_fcl, Box_fcl, ...]
+        :return:
+        """
+        count("fcl.collision_queries")
+        for obj_new in objs_new:
+            shape = analytic_shape(obj_new)
+            if shape is None:
+                if self._collide_first(self.new_obj([obj_new])[0]):
+                    return True
+            elif self._collide_analytic(shape, lambda: self.new_obj([obj_new])[0]):
+                return True
+        return False
+
+    def collision_agent(self, agent: Agent) -> bool:
+        """
+        智能体与模型中已有对象是否碰撞
+        :param agent: end 为空时为球,否则为胶囊体,半径与 collision_agent_rebar 相同取 ceil(size / 2)
+        :return:
+        """
+        count("fcl.collision_queries")
+        start = np.asarray(agent.position, dtype=float).reshape(3)
+        direction = None if agent.end is None else np.asarray(agent.end, dtype=float).reshape(3) - start
+        radius = math.ceil(agent.size / 2)
+        if direction is None or not direction.any():
+            def new_obj():
+                obj = self._agent_sphere(agent.size)
+                obj.setTranslation(start)
+                return obj
+
+            return self._collide_analytic(sphere_shape(start, radius), new_obj)
+        end = start + direction
+
+        def new_obj():
+            R = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), direction.reshape(1, 3))
+            geom = fcl.Capsule(radius, float(np.linalg.norm(direction)))
+            return fcl.CollisionObject(geom, fcl.Transform(R, (start + end) / 2))
+
+        return self._collide_analytic(capsule_shape(start, end, radius), new_obj)
+
+    def collision_agents(self, positions: Sequence, size: float) -> np.ndarray:
+        """
+        批量检测直径为 size 的球形智能体,结果与逐个调用 collision_agent 相同:
+        轴对齐对象一次解析检测全部位置,非轴对齐对象依次移动同一个球体对象由 fcl 检测
+        :param positions: (N, 3) 候选位置
+        :param size: 直径
+        :return: (N,) bool, True 表示碰撞
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        count("fcl.collision_queries", len(positions))
+        collisions = self.shapes.collide_spheres(positions, math.ceil(size / 2))
+        if not self.fallback_manager.empty():
+            obj = self._agent_sphere(size)
+            for i in np.flatnonzero(~collisions):
+                obj.setTranslation(positions[i])
+                collisions[i] = self._collide_first(obj, self.fallback_manager)
+        return collisions
+
+    def sweep_agent(self, start, end, size: float) -> Optional[float]:
+        """
+        直径为 size 的球形智能体沿线段 start → end 移动时首次碰撞的位置,一次查询代替逐步移动检测
+        轴对齐对象解析求解,非轴对齐对象以 fcl 距离保守推进(每次前进不超过到障碍物的距离),
+        距离不超过 _ADVANCE_TOLERANCE 即视为接触,推进次数用尽时(擦边移动)保守地取当前位置
+        :return: 位置参数 t ∈ [0, 1],start + t * (end - start) 处开始碰撞;不碰撞时返回 None
+        """
+        count("fcl.collision_queries")
+        start, end = np.asarray(start, dtype=float).reshape(3), np.asarray(end, dtype=float).reshape(3)
+        radius = math.ceil(size / 2)
+        hit = self.shapes.sweep_sphere(start, end, radius)
+        length = float(np.linalg.norm(end - start))
+        if not self.fallback_manager.empty():
+            obj = self._agent_sphere(size)
+            t = 0.0
+            for _ in range(_ADVANCE_ITERATIONS):
+                if t >= hit or t > 1:
+                    break
+                obj.setTranslation(start + t * (end - start))
+                ddata = fcl.DistanceData(fcl.DistanceRequest(), fcl.DistanceResult())
+                self.fallback_manager.distance(obj, ddata, fcl.defaultDistanceCallback)
+                distance = ddata.result.min_distance
+                if distance <= _ADVANCE_TOLERANCE:
+                    hit = t
+                    break
+                if length == 0:
+                    break
+                t += distance / length
+            else:
+                hit = min(hit, t)
+        return None if hit > 1 else float(hit)
+
+    def _fcl_contacts(self, obj, bounds) -> Iterator:
+        """
+        逐个返回与 obj 碰撞的已有对象,与 collision_check_add 相同由 fcl 判断(恰好接触不算碰撞)
+        :param bounds: 包围 obj 的解析几何体,轴对齐对象先以包围盒过滤,其余对象由 fallback_manager 检测
+        """
+        request = fcl.CollisionRequest(num_max_contacts=1, enable_contact=False)
+        for index in self.shapes.overlapping(bounds):
+            if fcl.collide(obj, self.objs[index], request):
+                yield self.objs[index]
+        if not self.fallback_manager.empty():
+            pairs = []
+            self.fallback_manager.collide(obj, pairs, contact_pairs_callback)
+            for geom in (geom for pair in pairs for geom in pair):
+                if id(geom) in self._geom_objs:
+                    yield self._geom_objs[id(geom)]
+
+    def _shift_blockers(self, moving, action, k: int) -> list:
+        """
+        平移 k 次后与已有对象碰撞的几何体对,供 first_free_shift 使用
+        穿透深度由 fcl 有符号距离求得,平移距离小于穿透深度时该对必然碰撞
+        :param moving: 平移 k 次后的 [(几何体, 对象, 包围对象的解析几何体), ...]
+        """
+        step_length = float(np.linalg.norm(action))
+        request = fcl.DistanceRequest(enable_signed_distance=True)
+        blockers = []
+        for geom, obj, bounds in moving:
+            for other in self._fcl_contacts(obj, bounds):
+                def skip(obj=obj, other=other) -> int:
+                    depth = -fcl.distance(obj, other, request, fcl.DistanceResult())
+                    return max(math.ceil((depth - _ADVANCE_TOLERANCE) / step_length) - 1, 0)
+
+                def pair_collides(shift: int, geom=geom, rotation=obj.getRotation(),
+                                  translation=obj.getTranslation(), other=other) -> bool:
+                    shifted = fcl.CollisionObject(geom, fcl.Transform(rotation, translation + (shift - k) * action))
+                    return fcl.collide(shifted, other, fcl.CollisionRequest(num_max_contacts=1)) > 0
+
+                blockers.append((pair_collides, skip))
+        return blockers
+
+    def free_agent_shift(self, position, action, size: float, max_steps: int) -> Optional[int]:
+        """
+        直径为 size 的球形智能体从 position 沿 action 平移 k 次后不碰撞的最小 k(k = 1..max_steps)
+        代替逐次平移检测,见 first_free_shift
+        :return: 找不到时返回 None
+        """
+        position, action = np.asarray(position, dtype=float), np.asarray(action, dtype=float)
+        radius = math.ceil(size / 2)
+        geom = fcl.Sphere(radius)
+
+        def collides(k: int) -> bool:
+            return self.collision_agent(Agent(size=size, position=position + k * action))
+
+        def blockers(k: int) -> list:
+            center = position + k * action
+            obj = fcl.CollisionObject(geom, fcl.Transform(center))
+            return self._shift_blockers([(geom, obj, sphere_shape(center, radius))], action, k)
+
+        return first_free_shift(collides, blockers, max_steps)
+
+    def free_rebar_shift(self, rebar, action, dia, max_steps: int) -> Optional[int]:
+        """
+        钢筋 rebar 整体沿 action 平移 k 次后不碰撞的最小 k(k = 1..max_steps)
+        代替逐次平移的 collision_check_add,见 first_free_shift
+        :return: 找不到时返回 None
+        """
+        rebar, action = np.asarray(rebar, dtype=float), np.asarray(action, dtype=float)
+
+        def moving(k: int) -> list:
+            shifted = rebar + k * action
+            pieces = []
+            for i, rebar_fcl in enumerate(self.new_rebar_fcl(shifted, dia)):
+                geom = fcl.Cylinder(rebar_fcl.diameter / 2, rebar_fcl.length)
+                obj = fcl.CollisionObject(geom, fcl.Transform(rebar_fcl.transformation, rebar_fcl.position))
+                pieces.append((geom, obj, capsule_shape(shifted[i], shifted[i + 1], dia / 2)))
+            return pieces
+
+        def collides(k: int) -> bool:
+            count("fcl.collision_queries")
+            return any(next(self._fcl_contacts(obj, bounds), None) is not None for _, obj, bounds in moving(k))
+
+        return first_free_shift(collides, lambda k: self._shift_blockers(moving(k), action, k), max_steps)
@@ -54,6 +54,7 @@ class Cylinder_fcl():
 
 @dataclass
 class Agent:
-    # 智能体的fcl数据
+    # 智能体的fcl数据: size 为直径; end 为空时为球心在 position 的球,否则为 position 到 end 的胶囊体
     size: float
-    position: list
\ No newline at end of file
+    position: list
+    end: list = None
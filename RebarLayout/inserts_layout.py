@@ -0,0 +1,311 @@
+"""
+吊装预埋件与斜撑(安装)预埋件自动定位
+
+在网格候选位置上一次计算与墙边、洞口、桁架、钢筋、其他预埋件的净距,取满足要求且距目标位置最近者:
+- 吊装预埋件位于墙顶、内外页之间,避开桁架、埋入深度范围内的洞口与其他预埋件,左右优先对称
+- 斜撑预埋件位于内页,4 个预埋件共用 x1、x2、y1、y2,避开桁架、内页钢筋、洞口与其他预埋件
+
+坐标: x 自墙左端起,z 自墙底起;x1、x2 为距墙左、右端的距离,y1、y2 为距墙底、墙顶的距离。
+桁架排布依赖预埋件位置,此处按均匀排布估计桁架位置,桁架排布时再避开预埋件
+
+没有满足净距要求的位置时(如短墙)不中断深化设计: 吊装预埋件取与障碍物重叠最少的位置,
+斜撑预埋件取目标位置附近避开钢筋、桁架的位置,并记录警告(InsertsLayout.warnings)
+"""
+import copy
+import logging
+import math
+from typing import List, Optional
+
+import numpy as np
+
+from DoubleWallDesign.models import (
+    DetailedDesignResult,
+    InsertsDetailed,
+    LiftingInsertsDesignMode,
+    LiftingInsertsPosition,
+    OtherInserts,
+    SupportInsertsDesignMode,
+    SupportInsertsPosition,
+    WallHole,
+    WallHoleType,
+)
+
+# 目标位置,与 OCCData 中的默认值一致
+LIFTING_EDGE = 300  # 吊装预埋件距墙端
+LIFTING_DEPTH = 669  # 吊装预埋件埋入深度(吊环投影总长度)
+LIFTING_DIAMETER = 16
+SUPPORT_EDGE = 220  # 斜撑预埋件距墙端
+SUPPORT_BOTTOM = 500  # 下部斜撑预埋件距内页底
+SUPPORT_TOP_RATIO = 1 / 3  # 上部斜撑预埋件距内页顶为内页高度的 1/3
+SUPPORT_PARAMETER = 30
+START_DISTANCE = 50  # 钢筋起步间距,与 ShearWallData 一致
+SEARCH_STEP = 10  # 候选位置间距
+
+_logger = logging.getLogger(__name__)
+
+
+def rebar_grid(start: float, length: float, spacing: float, start_distance: float = START_DISTANCE) -> np.ndarray:
+    """
+    钢筋位置,与 ShearWallData 生成钢筋的规则一致:自起步间距起按间距排布,最后一根距末端起步间距
+    :param start: 起点
+    :param length: 布筋范围长度
+    :param spacing: 钢筋间距
+    :return:
+    """
+    number = math.ceil((length - 2 * start_distance) / spacing) + 1
+    positions = start + start_distance + spacing * np.arange(number, dtype=float)
+    positions[-1] = start + length - start_distance
+    return positions
+
+
+def free_mask(candidates: np.ndarray, intervals: np.ndarray) -> np.ndarray:
+    """
+    候选位置是否不在任何占用区间内(开区间)
+    :param candidates: (N,)
+    :param intervals: (M, 2) [[min, max], ...]
+    :return: (N,) bool
+    """
+    candidates = np.asarray(candidates, dtype=float)
+    intervals = np.asarray(intervals, dtype=float).reshape(-1, 2)
+    inside = (candidates[:, np.newaxis] > intervals[:, 0]) & (candidates[:, np.newaxis] < intervals[:, 1])
+    return ~inside.any(axis=1)
+
+
+def free_grid(xs: np.ndarray, zs: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """
+    网格点 (x, z) 是否不在任何占用矩形内(开区间)
+    :param xs: (N,)
+    :param zs: (K,)
+    :param boxes: (M, 4) [[x_min, x_max, z_min, z_max], ...]
+    :return: (N, K) bool
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    in_x = (xs[:, np.newaxis] > boxes[:, 0]) & (xs[:, np.newaxis] < boxes[:, 1])  # (N, M)
+    in_z = (zs[:, np.newaxis] > boxes[:, 2]) & (zs[:, np.newaxis] < boxes[:, 3])  # (K, M)
+    return ~(in_x @ in_z.T)  # bool 矩阵乘: 存在同时包含 x 与 z 的矩形
+
+
+def overlap_depth(candidates: np.ndarray, intervals: np.ndarray) -> np.ndarray:
+    """
+    候选位置进入占用区间的最大深度(到区间较近端的距离),不在任何区间内时为 0
+    :param candidates: (N,)
+    :param intervals: (M, 2) [[min, max], ...]
+    :return: (N,)
+    """
+    candidates = np.asarray(candidates, dtype=float)
+    intervals = np.asarray(intervals, dtype=float).reshape(-1, 2)
+    depth = np.minimum(candidates[:, np.newaxis] - intervals[:, 0], intervals[:, 1] - candidates[:, np.newaxis])
+    return np.maximum(depth, 0).max(axis=1, initial=0)
+
+
+def _candidates(low: float, high: float) -> np.ndarray:
+    return np.arange(math.ceil(low / SEARCH_STEP) * SEARCH_STEP, high + 1e-9, SEARCH_STEP, dtype=float)
+
+
+class InsertsLayout:
+    """
+    由深化设计结果计算预埋件占用与可用位置
+    """
+
+    def __init__(self, detailed_design_result: DetailedDesignResult, clearance: float = 50,
+                 rebar_clearance: float = 10):
+        """
+        :param detailed_design_result: 深化设计结果
+        :param clearance: 预埋件与墙边、洞口、桁架、其他预埋件的最小净距
+        :param rebar_clearance: 预埋件与钢筋的最小净距
+        """
+        from RebarLayout.layout_opt import truss_layout_problem
+
+        detailed_design = detailed_design_result.detailed_design
+        geometric = detailed_design.geometric_detailed
+        self.clearance = float(clearance)
+        self.rebar_clearance = float(rebar_clearance)
+        self.warnings: List[str] = []  # 没有满足净距要求的位置时的说明
+        self.cover = float(detailed_design.construction_detailed.concrete_cover_thickness)
+        self.length = float(geometric.length)
+        self.height = float(geometric.height)
+        self.interior_left = float(detailed_design_result.left_gap_length)  # 内外等长时为 0
+        self.interior_right = self.interior_left + detailed_design_result.interior_length
+        self.interior_bottom = float(geometric.bottom_gap_height)
+        self.interior_top = self.interior_bottom + detailed_design_result.interior_height
+
+        # 占用矩形 [x_min, x_max, z_min, z_max],未计入净距
+        boxes = []
+        if geometric.wall_hole == WallHole.YES and geometric.wall_hole_parameter is not None:
+            hole = geometric.wall_hole_parameter
+            if geometric.wall_hole_type == WallHoleType.CIRCLE:
+                half_x = half_z = hole.hole_diameter / 2
+            else:
+                half_x, half_z = hole.hole_length / 2, hole.hole_height / 2
+            boxes.append([hole.hole_horizontal - half_x, hole.hole_horizontal + half_x,
+                          hole.hole_vertical - half_z, hole.hole_vertical + half_z])
+        inserts = detailed_design.inserts_detailed
+        if inserts is not None and inserts.other_inserts == OtherInserts.YES and inserts.other_inserts_positions:
+            for position, diameter in zip(inserts.other_inserts_positions, inserts.other_inserts_parameters or []):
+                boxes.append([position[0] - diameter / 2, position[0] + diameter / 2,
+                              position[1] - diameter / 2, position[1] + diameter / 2])
+        self.boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+
+        # 桁架按均匀排布估计,占用 [x_min, x_max]
+        truss_detailed = detailed_design.truss_detailed
+        problem = truss_layout_problem(detailed_design_result)
+        trusses = problem.uniform()
+        self.trusses = np.stack([trusses - truss_detailed.width / 2, trusses + truss_detailed.width / 2], axis=1)
+
+        # 内页钢筋: 竖向钢筋 x 与横向钢筋 z,占用 [中心 - 半径, 中心 + 半径]
+        vertical, horizontal = detailed_design_result.vertical_rebars, detailed_design_result.horizontal_rebars
+        vertical_x = rebar_grid(self.interior_left, self.interior_right - self.interior_left, vertical[0].spacing)
+        horizontal_z = rebar_grid(self.interior_bottom, self.interior_top - self.interior_bottom,
+                                  horizontal[0].spacing)
+        vertical_radius = max(rebar.diameter for rebar in vertical) / 2
+        horizontal_radius = max(rebar.diameter for rebar in horizontal) / 2
+        self.vertical_rebars = np.stack([vertical_x - vertical_radius, vertical_x + vertical_radius], axis=1)
+        self.horizontal_rebars = np.stack([horizontal_z - horizontal_radius, horizontal_z + horizontal_radius],
+                                          axis=1)
+
+    def _expand(self, intervals: np.ndarray, margin: float) -> np.ndarray:
+        expanded = np.array(intervals, dtype=float)
+        expanded[:, 0::2] -= margin
+        expanded[:, 1::2] += margin
+        return expanded
+
+    def lifting(self, diameter: float = LIFTING_DIAMETER) -> LiftingInsertsPosition:
+        """
+        吊装预埋件位置
+        :param diameter: 吊装预埋件直径
+        :return:
+        """
+        margin = diameter / 2 + self.clearance
+        # 埋入深度范围内的洞口与其他预埋件
+        zone = (self.boxes[:, 3] > self.interior_top - LIFTING_DEPTH - margin)
+        obstacles = np.vstack([self._expand(self.trusses, margin), self._expand(self.boxes[zone, :2], margin)])
+
+        edge = self.cover + margin
+        # 距墙端的距离,左右两个预埋件之间同样保持净距
+        distance = _candidates(edge, (self.length - diameter - self.clearance) / 2)
+        free_left = free_mask(distance, obstacles)
+        free_right = free_mask(self.length - distance, obstacles)
+        target = min(LIFTING_EDGE, self.length / 4)
+        order = np.argsort(np.abs(distance - target), kind="stable")
+
+        symmetric = (free_left & free_right)[order]
+        if symmetric.any():
+            x1 = x2 = distance[order][np.argmax(symmetric)]
+        elif free_left.any() and free_right.any():
+            x1 = distance[order][np.argmax(free_left[order])]
+            x2 = distance[order][np.argmax(free_right[order])]
+        elif len(distance) == 0:  # 墙长不足两倍边距
+            x1 = x2 = target
+            self._warn(f"吊装预埋件无满足净距要求的位置,按目标位置 {int(x1)} 布置")
+        else:
+            # 与障碍物重叠最少的位置,相同时取距目标位置最近者
+            depth_left = overlap_depth(distance[order], obstacles)
+            depth_right = overlap_depth(self.length - distance[order], obstacles)
+            x1 = distance[order][np.argmin(depth_left)]
+            x2 = distance[order][np.argmin(depth_right)]
+            self._warn(f"吊装预埋件无满足净距要求的位置,按重叠最少的位置 {int(x1)}、{int(x2)} 布置")
+        return LiftingInsertsPosition(x1=int(x1), x2=int(x2))
+
+    def support(self, parameter: float = SUPPORT_PARAMETER) -> SupportInsertsPosition:
+        """
+        斜撑预埋件位置
+        :param parameter: 斜撑预埋件孔洞大小
+        :return:
+        """
+        margin = parameter / 2 + self.clearance
+        rebar_margin = parameter / 2 + self.rebar_clearance
+        edge = self.cover + margin
+        middle = (self.interior_left + self.interior_right) / 2
+        xs = _candidates(self.interior_left + edge, self.interior_right - edge)
+        zs = _candidates(self.interior_bottom + edge, self.interior_top - edge)
+        free_x = free_mask(xs, self._expand(self.trusses, margin)) \
+            & free_mask(xs, self._expand(self.vertical_rebars, rebar_margin))
+        free_z = free_mask(zs, self._expand(self.horizontal_rebars, rebar_margin))
+        free = free_grid(xs, zs, self._expand(self.boxes, margin)) & free_x[:, np.newaxis] & free_z
+
+        # 上下两排预埋件共用 x: 对每对 (下排 z, 上排 z) 判断左右两侧是否存在同时可用的 x
+        lower = zs < (self.interior_bottom + self.interior_top) / 2
+        upper = ~lower
+        left, right = xs < middle, xs > middle
+        pair_left = free[left][:, lower].T.astype(np.float32) @ free[left][:, upper].astype(np.float32) > 0
+        pair_right = free[right][:, lower].T.astype(np.float32) @ free[right][:, upper].astype(np.float32) > 0
+        target_bottom = self.interior_bottom + SUPPORT_BOTTOM
+        target_top = self.interior_top - (self.interior_top - self.interior_bottom) * SUPPORT_TOP_RATIO
+        cost = np.abs(zs[lower] - target_bottom)[:, np.newaxis] + np.abs(zs[upper] - target_top)
+        cost[~(pair_left & pair_right)] = np.inf
+        target = min(SUPPORT_EDGE, (self.interior_right - self.interior_left) / 4)
+        if np.isfinite(cost).any():
+            bottom_index, top_index = np.unravel_index(np.argmin(cost), cost.shape)
+            bottom_z, top_z = zs[lower][bottom_index], zs[upper][top_index]
+            usable = free[:, np.flatnonzero(lower)[bottom_index]] & free[:, np.flatnonzero(upper)[top_index]]
+            x1 = _nearest(xs[left & usable], self.interior_left + target)
+            x2 = _nearest(xs[right & usable], self.interior_right - target)
+        else:
+            # 不考虑洞口与其他预埋件,x、z 分别取目标位置附近避开桁架、钢筋的位置,没有时取目标位置
+            bottom_z = _nearest_free(zs[lower], free_z[lower], target_bottom)
+            top_z = _nearest_free(zs[upper], free_z[upper], target_top)
+            x1 = _nearest_free(xs[left], free_x[left], self.interior_left + target)
+            x2 = _nearest_free(xs[right], free_x[right], self.interior_right - target)
+            self._warn(f"斜撑预埋件无满足净距要求的位置,按目标位置附近的位置布置")
+        return SupportInsertsPosition(x1=int(x1), x2=int(self.length - x2), y1=int(bottom_z),
+                                      y2=int(self.height - top_z))
+
+    def _warn(self, message: str):
+        _logger.warning(message)
+        self.warnings.append(message)
+
+
+def place_inserts(detailed_design_result: DetailedDesignResult, clearance: float = 50,
+                  rebar_clearance: float = 10, warnings: Optional[List[str]] = None) -> Optional[InsertsDetailed]:
+    """
+    自动设计模式的吊装、斜撑预埋件定位
+    :param detailed_design_result: 深化设计结果
+    :param clearance: 预埋件与墙边、洞口、桁架、其他预埋件的最小净距
+    :param rebar_clearance: 预埋件与钢筋的最小净距
+    :param warnings: 没有满足净距要求的位置时,说明追加到此列表
+    :return: 填入自动定位结果的预埋件参数副本;均为手动模式时返回原参数
+    """
+    inserts = detailed_design_result.detailed_design.inserts_detailed
+    if inserts is None:
+        return None
+    lifting = inserts.lifting_inserts_design_mode == LiftingInsertsDesignMode.AUTOMATIC
+    support = inserts.support_inserts_design_mode == SupportInsertsDesignMode.AUTOMATIC
+    if not (lifting or support):
+        return inserts
+    inserts = copy.copy(inserts)
+    # 自动模式下传入的位置即将被替换,不作为桁架估计位置的占用
+    if lifting:
+        inserts.lifting_inserts_position = None
+    if support:
+        inserts.support_inserts_position = None
+    design = copy.copy(detailed_design_result.detailed_design)
+    design.inserts_detailed = inserts
+    result = copy.copy(detailed_design_result)
+    result.detailed_design = design
+    layout = InsertsLayout(result, clearance=clearance, rebar_clearance=rebar_clearance)
+    if lifting:
+        if inserts.lifting_inserts_diameter is None:
+            inserts.lifting_inserts_diameter = LIFTING_DIAMETER
+        inserts.lifting_inserts_position = layout.lifting(inserts.lifting_inserts_diameter)
+    if support:
+        if inserts.support_inserts_parameter is None:
+            inserts.support_inserts_parameter = SUPPORT_PARAMETER
+        inserts.support_inserts_position = layout.support(inserts.support_inserts_parameter)
+    if warnings is not None:
+        warnings.extend(layout.warnings)
+    return inserts
+
+
+def _nearest(candidates: np.ndarray, target: float) -> float:
+    return candidates[np.argmin(np.abs(candidates - target))]
+
+
+def _nearest_free(candidates: np.ndarray, free: np.ndarray, target: float) -> float:
+    """
+    距 target 最近的可用位置,没有可用位置时取最近的候选位置,没有候选位置时取 target
+    """
+    if free.any():
+        return _nearest(candidates[free], target)
+    if len(candidates):
+        return _nearest(candidates, target)
+    return target
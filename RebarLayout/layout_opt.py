@@ -6,80 +6,298 @@
 # Description：
 """
 
+import time
+from typing import Callable, Optional
+
 import numpy as np
-from copy import deepcopy
 
-from DoubleWallDesign.models import DetailedDesignResult
+from DoubleWallDesign.instrumentation import count
+from DoubleWallDesign.models import DetailedDesignResult, OtherInserts, WallHole, WallHoleType
 from RebarLayout.tools import get_truss_layout
 
-def fitness(solution):
-    '''
-    最优位置适应度函数
+PENALTY = 10  # 每毫米间距不足、超出墙边距或占用洞口、预埋件的惩罚
+COLLISION_PENALTY = 1000  # 每榀桁架与钢筋碰撞的惩罚
+
+
+class TrussLayoutProblem:
+    """
+    桁架排布问题:沿墙长方向确定各榀桁架的中心位置 x
+    """
+
+    def __init__(self, length: float, truss_number: int, truss_width: float, edge_margin: float,
+                 obstacles: np.ndarray):
+        """
+        :param length: 墙长
+        :param truss_number: 桁架数量
+        :param truss_width: 桁架宽度,相邻桁架中心距不小于该宽度
+        :param edge_margin: 桁架中心距墙边的最小距离
+        :param obstacles: 洞口与预埋件在墙长方向上的占用区间(已计入净距) [[x_min, x_max], ...]
+        """
+        self.length = float(length)
+        self.truss_number = int(truss_number)
+        self.truss_width = float(truss_width)
+        self.edge_margin = float(edge_margin)
+        self.obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 2)
+
+    @property
+    def bounds(self) -> tuple:
+        return self.edge_margin, self.length - self.edge_margin
+
+    def uniform(self) -> np.ndarray:
+        """
+        均匀排布:中间间距相等,两端间距为中间间距的一半
+        """
+        spacing = self.length / self.truss_number
+        return spacing / 2 + spacing * np.arange(self.truss_number)
+
+    def repair(self, positions: np.ndarray) -> np.ndarray:
+        """
+        限制在墙长范围内,取整并按从左到右排序
+        """
+        return np.sort(np.round(np.clip(positions, *self.bounds)), axis=-1)
+
+    def spacing(self, positions: np.ndarray) -> list:
+        """
+        转换为 get_truss_layout 的间距列表(含右端间距)
+        """
+        return np.diff(np.concatenate(([0.0], positions, [self.length]))).tolist()
+
+
+def truss_layout_problem(detailed_design_result: DetailedDesignResult, clearance: float = 50) -> TrussLayoutProblem:
+    """
+    由深化设计结果生成桁架排布问题
+    :param detailed_design_result: 深化设计结果
+    :param clearance: 桁架与洞口、预埋件的最小净距
     :return:
-    '''
-    x_round = deepcopy(solution)
-    x_round = np.round(x_round)
-    NY = np.size(x_round, 0) + 3
-    position2 = [[]] * NY
-
-    for i in range(NY):
-        if i == 0:
-            position2[0] += int(x_round[0])
-        elif i == 1:
-            position2[1] += int(x_round[1])
-        elif i == 2:
-            position2[2] = position2[2]
-        elif i == 3:
-            position2[3] = position2[3]
-        elif i == 4:
-            position2[4] += int(x_round[2])
-        elif i == 5:
-            position2[5] += int(x_round[3])
-        elif i == 6:
-            position2[6] += int(x_round[4])
-        elif i == 7:
-            position2[7] += int(x_round[5])
-        elif i == 8:
-            position2[8] = position2[8]
-        elif i == 9:
-            position2[9] += int(x_round[6])
-        elif i == 10:
-            position2[10] += int(x_round[7])
-        elif i == 11:
-            position2[11] += int(x_round[8])
-
-    spac = np.array([])
-    for i in range(1, len(position2)):
-        spac = np.append(spac, [(position2[i] - position2[i - 1])])
-    spac_sum = np.sum(spac)
-    spac_mean = spac_sum / (NY - 1)
-
-    deviation = np.sqrt(np.sum(np.power((spac - spac_mean), 2)) / (NY - 1))
-    value = deviation
-    return value
-
-    return 1
-
-
-def layout_opt(fcl_model, detailed_design_result: DetailedDesignResult) -> list:
+    """
+    detailed_design = detailed_design_result.detailed_design
+    geometric = detailed_design.geometric_detailed
+    truss_detailed = detailed_design.truss_detailed
+    inserts = detailed_design.inserts_detailed
+    cover = detailed_design.construction_detailed.concrete_cover_thickness
+    length = float(geometric.length)
+
+    occupied = []  # [中心位置, 宽度]
+    if geometric.wall_hole == WallHole.YES and geometric.wall_hole_parameter is not None:
+        hole = geometric.wall_hole_parameter
+        if geometric.wall_hole_type == WallHoleType.CIRCLE:
+            occupied.append([hole.hole_horizontal, hole.hole_diameter])
+        else:
+            occupied.append([hole.hole_horizontal, hole.hole_length])
+    if inserts is not None:
+        if inserts.lifting_inserts_position is not None:
+            position = inserts.lifting_inserts_position
+            occupied.append([position.x1, inserts.lifting_inserts_diameter or 0])
+            occupied.append([length - position.x2, inserts.lifting_inserts_diameter or 0])
+        if inserts.support_inserts_position is not None:
+            position = inserts.support_inserts_position
+            occupied.append([position.x1, inserts.support_inserts_parameter or 0])
+            occupied.append([length - position.x2, inserts.support_inserts_parameter or 0])
+        if inserts.other_inserts == OtherInserts.YES and inserts.other_inserts_positions:
+            for position, diameter in zip(inserts.other_inserts_positions, inserts.other_inserts_parameters or []):
+                occupied.append([position[0], diameter])
+    occupied = np.array(occupied, dtype=float).reshape(-1, 2)
+    obstacles = np.stack([occupied[:, 0] - occupied[:, 1] / 2 - clearance,
+                          occupied[:, 0] + occupied[:, 1] / 2 + clearance], axis=1)
+
+    truss_number = int(np.ravel(truss_detailed.truss_number)[0])
+    return TrussLayoutProblem(length=length, truss_number=truss_number, truss_width=truss_detailed.width,
+                              edge_margin=cover + truss_detailed.width / 2, obstacles=obstacles)
+
+
+def truss_fitness_batch(population: np.ndarray, problem: TrussLayoutProblem) -> np.ndarray:
+    """
+    一次计算一组排布的适应度,越小越好
+    间距均匀性(两端间距按一半计)+ 间距不足、超出墙边距与占用洞口、预埋件的惩罚
+    :param population: 桁架中心位置 (排布数量, 桁架数量),每行按从左到右排序
+    :param problem: 桁架排布问题
+    :return: 各排布的适应度 (排布数量,)
+    """
+    population = np.asarray(population, dtype=float).reshape(-1, problem.truss_number)
+    size = population.shape[0]
+    gaps = np.diff(np.hstack((np.zeros((size, 1)), population, np.full((size, 1), problem.length))), axis=1)
+    weighted = gaps.copy()
+    weighted[:, [0, -1]] *= 2
+    deviation = np.std(weighted, axis=1)
+
+    crowding = np.sum(np.maximum(problem.truss_width - gaps[:, 1:-1], 0), axis=1)
+
+    low, high = problem.bounds
+    boundary = np.sum(np.maximum(low - population, 0) + np.maximum(population - high, 0), axis=1)
+
+    half_width = problem.truss_width / 2
+    left = np.maximum(population[:, :, None] - half_width, problem.obstacles[:, 0])
+    right = np.minimum(population[:, :, None] + half_width, problem.obstacles[:, 1])
+    overlap = np.sum(np.maximum(right - left, 0), axis=(1, 2))
+
+    return deviation + PENALTY * (crowding + boundary + overlap)
+
+
+def truss_fitness(positions: np.ndarray, problem: TrussLayoutProblem) -> float:
+    """
+    单个排布的适应度,见 truss_fitness_batch
+    :param positions: 从左到右排序的桁架中心位置
+    :param problem: 桁架排布问题
+    :return:
+    """
+    return float(truss_fitness_batch(positions, problem)[0])
+
+
+class TrussCollisionChecker:
+    """
+    桁架弦杆与已有钢筋的碰撞检测,各榀桁架互不影响,按位置缓存检测结果
+    检测时钢筋直径减去 tolerance,与相邻钢筋恰好接触不计为碰撞;不修改 fcl_model
+    """
+
+    def __init__(self, fcl_model, detailed_design_result: DetailedDesignResult, z_range: list,
+                 tolerance: float = 1):
+        detailed_design = detailed_design_result.detailed_design
+        truss_detailed = detailed_design.truss_detailed
+        geometric = detailed_design.geometric_detailed
+        cover = detailed_design.construction_detailed.concrete_cover_thickness
+        horizontal_dia_max = max([rebar.diameter for rebar in detailed_design_result.horizontal_rebars])
+
+        self.fcl_model = fcl_model
+        self.z_range = z_range
+        # 弦杆: [x 偏移, y, 直径]
+        bottom_offset = truss_detailed.width / 2 - truss_detailed.bottom_rebar.diameter / 2
+        bottom_y = cover + horizontal_dia_max + truss_detailed.bottom_rebar.diameter / 2
+        self.chords = [
+            [0.0, geometric.thickness - cover - horizontal_dia_max - truss_detailed.top_rebar.diameter / 2,
+             truss_detailed.top_rebar.diameter - tolerance],
+            [-bottom_offset, bottom_y, truss_detailed.bottom_rebar.diameter - tolerance],
+            [bottom_offset, bottom_y, truss_detailed.bottom_rebar.diameter - tolerance],
+        ]
+        self._cache = {}
+
+    def collides(self, x: float) -> bool:
+        x = int(x)
+        if x not in self._cache:
+            objs = []
+            for offset, y, diameter in self.chords:
+                line = [[x + offset, y, self.z_range[0]], [x + offset, y, self.z_range[1]]]
+                objs += self.fcl_model.new_rebar_fcl(line, diameter)
+            self._cache[x] = self.fcl_model.collision_check(objs)
+        return self._cache[x]
+
+    def nearest_free(self, x: float, max_shift: float) -> Optional[float]:
+        """
+        距 x 最近的无碰撞位置,max_shift 范围内没有时返回 None
+        """
+        for shift in range(int(max_shift) + 1):
+            for candidate in (x + shift, x - shift):
+                if not self.collides(candidate):
+                    return candidate
+        return None
+
+    def __call__(self, positions: np.ndarray, max_shift: float = 0) -> tuple:
+        """
+        将发生碰撞的桁架移至 max_shift 范围内最近的无碰撞位置
+        :return: 调整后的位置, 仍发生碰撞的桁架数量
+        """
+        positions = positions.copy()
+        collisions = 0
+        for i, x in enumerate(positions):
+            free = self.nearest_free(x, max_shift)
+            if free is None:
+                collisions += 1
+            else:
+                positions[i] = free
+        return positions, collisions
+
+
+def optimize_truss_positions(problem: TrussLayoutProblem, collision_check: Optional[Callable] = None,
+                             population_size: int = 20, max_iterations: int = 100,
+                             time_budget: Optional[float] = None, seed: Optional[int] = 0,
+                             differential_weight: float = 0.6, crossover_rate: float = 0.9) -> np.ndarray:
+    """
+    差分进化(DE/rand/1/bin)求解桁架位置,每代的试验解一次计算适应度
+    碰撞检测代价较高,试验解的适应度不优于父代时不做碰撞检测;
+    优于父代时将发生碰撞的桁架移至附近的无碰撞位置后重新计算适应度
+    :param problem: 桁架排布问题
+    :param collision_check: TrussCollisionChecker,为空时不检测碰撞
+    :param population_size: 种群大小
+    :param max_iterations: 最大迭代次数
+    :param time_budget: 计算时间上限(秒),为空时不限;达到时间上限提前结束时结果与机器速度有关
+    :param seed: 随机数种子,相同种子与迭代次数的结果相同
+    :param differential_weight: 差分权重 F
+    :param crossover_rate: 交叉概率 CR
+    :return: 从左到右排序的桁架中心位置
+    """
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    low, high = problem.bounds
+    assert low <= high, Exception(f"墙长 {problem.length} 小于桁架排布所需的边距")
+    number = problem.truss_number
+    population_size = max(population_size, 4)
+    max_shift = problem.truss_width / 2
+
+    def repair_collisions(positions: np.ndarray) -> tuple:
+        positions, collisions = collision_check(positions, max_shift)
+        positions = problem.repair(positions)
+        return positions, truss_fitness(positions, problem) + COLLISION_PENALTY * collisions
+
+    population = problem.repair(rng.uniform(low, high, size=(population_size, number)))
+    population[0] = problem.repair(problem.uniform())
+    scores = truss_fitness_batch(population, problem)
+    if collision_check is not None:
+        for i in range(population_size):
+            population[i], scores[i] = repair_collisions(population[i])
+    evaluations = population_size
+
+    rows = np.arange(population_size)
+    for iteration in range(max_iterations):
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            break
+        # 每个个体取 3 个互不相同且不同于自身的个体
+        order = rng.random((population_size, population_size))
+        order[rows, rows] = np.inf
+        a, b, c = np.argsort(order, axis=1)[:, :3].T
+        mutants = population[a] + differential_weight * (population[b] - population[c])
+        cross = rng.random((population_size, number)) < crossover_rate
+        cross[rows, rng.integers(number, size=population_size)] = True
+        trials = problem.repair(np.where(cross, mutants, population))
+        trial_scores = truss_fitness_batch(trials, problem)
+        evaluations += population_size
+        improved = trial_scores < scores
+        if collision_check is not None:
+            for i in np.flatnonzero(improved):
+                trials[i], trial_scores[i] = repair_collisions(trials[i])
+            improved = trial_scores < scores
+        population[improved] = trials[improved]
+        scores[improved] = trial_scores[improved]
+    count("layout.fitness_evaluations", evaluations)
+    return population[int(np.argmin(scores))]
+
+
+def layout_opt(fcl_model, detailed_design_result: DetailedDesignResult, population_size: int = 20,
+               max_iterations: int = 100, time_budget: Optional[float] = None, seed: Optional[int] = 0) -> list:
     """
     桁架与预埋件排布优化
+    :param fcl_model: 保护层与钢筋组成的碰撞检测模型,不会被修改
     :param detailed_design_result:  深化设计结果
+    :param population_size: 种群大小
+    :param max_iterations: 最大迭代次数
+    :param time_budget: 计算时间上限(秒)
+    :param seed: 随机数种子
     :return: 返回桁架钢筋的位置
     """
+    detailed_design = detailed_design_result.detailed_design
+    geometric = detailed_design.geometric_detailed
+    cover = detailed_design.construction_detailed.concrete_cover_thickness
+    problem = truss_layout_problem(detailed_design_result)
 
+    truss_length = geometric.height - geometric.bottom_gap_height - geometric.top_gap_height - 2 * cover
+    truss_lengths_plan = [truss_length] * problem.truss_number
 
-    action_1 = [1, 0, 0]
-    action_2 = [-1, 0, 0]
-
-    # check_rebar = deepcopy(1)
-    # rebar_fcls = fcl_model.new_rebar_fcl(check_rebar, detailed_design_result.horizontal_rebars[0].diameter)
-    # rebar_objs = fcl_model.new_obj(rebar_fcls)
-    # check_ob = fcl_model.collision_check_add(rebar_objs)
-
-    truss_spacing = [160, 320, 330, 350, 310, 330, 150]
-    truss_lengths_plan = [2500, 2500, 2500, 2500, 2600, 2500]
+    z_start = float(geometric.bottom_gap_height + cover)
+    diagonal_step = detailed_design.truss_detailed.diagonal_rebar.spacing / 2
+    z_range = [z_start, z_start + int(truss_length / diagonal_step) * diagonal_step]
+    collision_check = TrussCollisionChecker(fcl_model, detailed_design_result, z_range) \
+        if fcl_model is not None else None
 
-    truss_layout = get_truss_layout(detailed_design_result,truss_spacing,truss_lengths_plan)
+    positions = optimize_truss_positions(problem, collision_check, population_size=population_size,
+                                         max_iterations=max_iterations, time_budget=time_budget, seed=seed)
+    truss_layout = get_truss_layout(detailed_design_result, problem.spacing(positions), truss_lengths_plan)
 
     return truss_layout
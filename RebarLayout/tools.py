@@ -1,52 +1,165 @@
 import math
+from dataclasses import dataclass
+from typing import List
 
 import numpy as np
 
 from DoubleWallDesign.models import RebarDiamSpac, RebarDiam
 
+# 可选钢筋直径与间距
+REBAR_DIAMETERS = [8, 10, 12, 14, 16, 18, 20]
+REBAR_SPACINGS = [100, 125, 150, 180, 200, 220, 240, 250]
+
+
+def _combine_diameters(diameters: List[int]) -> List[List[int]]:
+    """
+    单一直径及相邻直径组合: [d0], [d0, d1], [d1], [d1, d2], ...
+    """
+    combine_diam_sets = []
+    for num in range(len(diameters)):
+        combine_diam_sets.append([diameters[num]])
+        if num < len(diameters) - 1:
+            combine_diam_sets.append([diameters[num], diameters[num + 1]])
+    return combine_diam_sets
+
+
+def _average_area(diameters: List[int]) -> float:
+    average_area = 0
+    for diam in diameters:
+        average_area += (math.pi * diam ** 2) / 4
+    return average_area / len(diameters)
+
+
+# 钢筋面积表(mm^2/m),行为间距,列为直径组合;直径上限只会去掉表尾的列,组合的顺序不变
+_COMBINE_DIAM_SETS = _combine_diameters(REBAR_DIAMETERS)
+_REBAR_AREA_TABLE = np.array(
+    [[_average_area(diams) * (1000 / spacing) for diams in _COMBINE_DIAM_SETS] for spacing in REBAR_SPACINGS]
+)
+_COMBINE_DIAM_MAX = np.tile([max(diams) for diams in _COMBINE_DIAM_SETS], len(REBAR_SPACINGS))  # 按行展开
+
+# 多目标选型的目标: 钢筋面积、每米钢筋根数、直径种类数,均越小越好;按行展开,与 _REBAR_AREA_TABLE.ravel() 对应
+_OBJECTIVES = np.stack([
+    _REBAR_AREA_TABLE.ravel(),
+    np.repeat([1000 / spacing for spacing in REBAR_SPACINGS], len(_COMBINE_DIAM_SETS)),
+    np.tile([len(set(diams)) for diams in _COMBINE_DIAM_SETS], len(REBAR_SPACINGS)),
+], axis=1)
+# _DOMINATES[j, i]: 组合 j 支配组合 i(各目标均不差于 i 且至少一项更好)
+_DOMINATES = (_OBJECTIVES[:, np.newaxis, :] <= _OBJECTIVES[np.newaxis, :, :]).all(axis=2) \
+    & (_OBJECTIVES[:, np.newaxis, :] < _OBJECTIVES[np.newaxis, :, :]).any(axis=2)
+# 方案排序: 面积 > 根数 > 直径种类数,完全相同时按表中顺序
+_OBJECTIVE_ORDER = np.lexsort(_OBJECTIVES.T[::-1])
+
+
+@dataclass
+class RebarOption:
+    """
+    配筋方案
+    """
+    rebars: List[RebarDiamSpac]  # 钢筋直径与间距,两种直径组合时为两项
+    area: float  # 每米钢筋面积 mm^2/m
+    bars_per_meter: float  # 每米钢筋根数
+    diameter_number: int  # 直径种类数
+
+
 # 钢筋配筋计算
-def rebar_opt(wall_thickness, rebar_ratio, interior_thickness, exterior_thickness, cover):
+def rebar_opt(wall_thickness, rebar_ratio, interior_thickness, exterior_thickness, cover, strategy: str = "area"):
+    """
+    按配筋率选择面积最小且满足要求的钢筋直径与间距
+    :param strategy: "area" 只返回面积最小的方案; "pareto" 同时返回多目标选型的方案列表(见 rebar_pareto_batch)
+    :return: 钢筋直径与间距,两种直径组合时返回两项;
+        strategy 为 "pareto" 时返回 (钢筋直径与间距, 方案列表),钢筋直径与间距即方案列表的第一项
+    """
+    if strategy == "pareto":
+        options = rebar_pareto(wall_thickness, rebar_ratio, interior_thickness, exterior_thickness, cover)
+        return options[0].rebars, options
+    assert strategy == "area", Exception(f"strategy 参数异常:{strategy}")
+    return rebar_opt_batch([wall_thickness], [rebar_ratio], [interior_thickness], [exterior_thickness], [cover])[0]
+
+
+def rebar_opt_batch(wall_thicknesses, rebar_ratios, interior_thicknesses, exterior_thicknesses, covers) \
+        -> List[List[RebarDiamSpac]]:
+    """
+    批量配筋计算,结果与逐个调用 rebar_opt 一致,参数为等长数组或标量(按 numpy 规则广播)
+    :param wall_thicknesses: 墙厚
+    :param rebar_ratios: 配筋率
+    :param interior_thicknesses: 内页厚度
+    :param exterior_thicknesses: 外页厚度
+    :param covers: 保护层厚度
+    :return: 每个墙体的钢筋直径与间距
+    """
+    candidate = _rebar_candidates(wall_thicknesses, rebar_ratios, interior_thicknesses, exterior_thicknesses, covers)
+    return [_rebar_diam_spac(i) for i in _min_area_index(candidate).tolist()]
+
+
+def rebar_pareto_batch(wall_thicknesses, rebar_ratios, interior_thicknesses, exterior_thicknesses, covers) \
+        -> List[List[RebarOption]]:
+    """
+    多目标配筋选型: 在满足配筋要求的组合中,按钢筋面积、每米钢筋根数、直径种类数求 Pareto 最优方案,
+    所有墙体一次计算。参数与 rebar_opt_batch 相同
+    :return: 每个墙体的方案,第一项与 rebar_opt 相同(面积最小,面积相同时取表中靠前者),
+        其后为其余 Pareto 最优方案,按 面积 > 根数 > 直径种类数 排序;
+        面积相同时 rebar_opt 的方案可能被根数更少的方案支配(如 10@125 与 12@180),仍作为第一项;
+        没有满足要求的组合时只有 rebar_opt 的兜底方案
+    """
+    candidate = _rebar_candidates(wall_thicknesses, rebar_ratios, interior_thicknesses, exterior_thicknesses, covers)
+    first = _min_area_index(candidate)
+    # 被任一满足要求的组合支配的组合不是 Pareto 最优
+    dominated = candidate.astype(np.int32) @ _DOMINATES.astype(np.int32) > 0
+    pareto = candidate & ~dominated
+    pareto[np.arange(len(first)), first] = False
+    pareto = pareto[:, _OBJECTIVE_ORDER]
+    return [[_rebar_option(i) for i in [index] + _OBJECTIVE_ORDER[row].tolist()]
+            for index, row in zip(first.tolist(), pareto)]
+
+
+def rebar_pareto(wall_thickness, rebar_ratio, interior_thickness, exterior_thickness, cover) -> List[RebarOption]:
+    """
+    单个墙体的多目标配筋选型,见 rebar_pareto_batch
+    """
+    return rebar_pareto_batch([wall_thickness], [rebar_ratio], [interior_thickness], [exterior_thickness], [cover])[0]
+
+
+def _rebar_candidates(wall_thicknesses, rebar_ratios, interior_thicknesses, exterior_thicknesses, covers) \
+        -> np.ndarray:
+    """
+    各墙体满足配筋要求的组合,(墙体数, 组合数) bool 数组,组合按 _REBAR_AREA_TABLE 按行展开
+    """
+    wall_thickness, rebar_ratio, interior_thickness, exterior_thickness, cover = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(value, dtype=float)) for value in
+          (wall_thicknesses, rebar_ratios, interior_thicknesses, exterior_thicknesses, covers)])
     rebar_area = wall_thickness * rebar_ratio * 10 / 2  # 计算配筋面积
-    dia_max = min(int(wall_thickness / 10), (min(interior_thickness, exterior_thickness) - 2 * cover) / 2)
-    dia_sets = [8, 10, 12, 14, 16, 18, 20]
-    spacing_sets = [100, 125, 150, 180, 200, 220, 240, 250]
-    # 筛选可选钢筋集合
-    allow_dia_sets = []
-    for diam in dia_sets:
-        if diam <= dia_max:
-            allow_dia_sets.append(diam)
-    combine_diam_sets = []
-    for num in range(len(allow_dia_sets)):
-        combine_diam_sets.append([allow_dia_sets[num]])
-        if num < len(allow_dia_sets) - 1:
-            combine_diam_sets.append([allow_dia_sets[num], allow_dia_sets[num + 1]])
-    row = len(spacing_sets)  # 表的行
-    column = len(combine_diam_sets)  # 表的列
-    rebar_area_table = np.zeros((row, column))  # 钢筋面积表
-    for row_ in range(row):
-        for column_ in range(column):
-            average_area = 0
-            for num in range(len(combine_diam_sets[column_])):
-                current_diam = combine_diam_sets[column_][num]
-                average_area += (math.pi * current_diam ** 2) / 4
-            average_area = average_area / len(combine_diam_sets[column_])
-            rebar_area_table[row_][column_] = average_area * (1000 / spacing_sets[row_])
-    min_area = ((math.pi * dia_max ** 2) / 4 * (1000 / spacing_sets[0]))
-    min_area_row = 0
-    min_area_column = 0
-    for row_ in range(row):
-        for column_ in range(column):
-            current_area = rebar_area_table[row_][column_]  # 当前面积
-            if current_area >= rebar_area and current_area < min_area:
-                min_area = current_area
-                min_area_row = row_
-                min_area_column = column_
-    rebar_diam_sets = combine_diam_sets[min_area_column]
-    rebar_spacing = spacing_sets[min_area_row]
-    rebars = []
-    for dia in rebar_diam_sets:
-        rebars.append(RebarDiamSpac(diameter=dia, spacing=rebar_spacing))
-    return rebars
+    dia_max = np.minimum(np.trunc(wall_thickness / 10),
+                         (np.minimum(interior_thickness, exterior_thickness) - 2 * cover) / 2)
+    no_rebar = np.flatnonzero(dia_max < REBAR_DIAMETERS[0])
+    if len(no_rebar):
+        raise IndexError(f"墙厚或保护层厚度不满足最小钢筋直径 {REBAR_DIAMETERS[0]}: {no_rebar.tolist()}")
+
+    # 面积不小于配筋面积且小于初始值
+    min_area = (np.pi * dia_max ** 2) / 4 * (1000 / REBAR_SPACINGS[0])
+    areas = _REBAR_AREA_TABLE.ravel()[np.newaxis, :]
+    return (_COMBINE_DIAM_MAX <= dia_max[:, np.newaxis]) & (areas >= rebar_area[:, np.newaxis]) \
+        & (areas < min_area[:, np.newaxis])
+
+
+def _min_area_index(candidate: np.ndarray) -> np.ndarray:
+    """
+    各墙体面积最小的组合序号,面积相同时取表中按行优先的第一个;
+    没有满足要求的组合时取最小直径、最小间距
+    """
+    index = np.argmin(np.where(candidate, _REBAR_AREA_TABLE.ravel(), np.inf), axis=1)
+    index[~candidate.any(axis=1)] = 0
+    return index
+
+
+def _rebar_diam_spac(index: int) -> List[RebarDiamSpac]:
+    row, column = divmod(index, len(_COMBINE_DIAM_SETS))
+    return [RebarDiamSpac(diameter=dia, spacing=REBAR_SPACINGS[row]) for dia in _COMBINE_DIAM_SETS[column]]
+
+
+def _rebar_option(index: int) -> RebarOption:
+    area, bars_per_meter, diameter_number = _OBJECTIVES[index].tolist()
+    return RebarOption(rebars=_rebar_diam_spac(index), area=area, bars_per_meter=bars_per_meter,
+                       diameter_number=int(diameter_number))
 
 
 def truss_design(detailed_design):
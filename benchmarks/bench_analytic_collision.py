@@ -0,0 +1,160 @@
+"""
+轴对齐几何体解析碰撞检测基准测试: RebarLayout.analytic_collision 与 fcl
+
+运行: python benchmarks/bench_analytic_collision.py [--rebars 500 2000] [--points 1000]
+墙体由保护层长方体、两层钢筋网(水平、竖向钢筋各两段)与少量斜向长方体(仍由 fcl 检测)组成:
+- 点智能体: fcl 查询全部对象、collision_agent、collision_agents
+- 桁架弦杆(竖向钢筋): collision_check_add(fcl) 与 collision_check
+- 线段扫掠: APF 以 3 mm 步长逐步移动检测(collision_agent)与 sweep_agent 一次查询
+- 沿法向平移寻找不碰撞的位置(find_next_point、APF_rebar): 逐次平移检测与 free_agent_shift、free_rebar_shift
+每种查询先与 fcl 的结果比较,再统计耗时
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import fcl
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RebarLayout.collision_detection import ShearWallFCLModel
+from RebarLayout.fcl_models import Agent, Box_fcl, Diagonal_fcl
+from RebarLayout.tools import rotation_matrix_from_vectors
+
+LENGTH = 6000
+HEIGHT = 3000
+THICKNESS = 250
+COVER = 15
+DIAMETER = 10
+
+
+def _wall(rebars: int) -> ShearWallFCLModel:
+    fcl_model = ShearWallFCLModel()
+    fcl_model.add_obj([
+        Box_fcl(x=LENGTH, y=COVER, z=HEIGHT, position=np.array([LENGTH / 2, COVER / 2, HEIGHT / 2])),
+        Box_fcl(x=LENGTH, y=COVER, z=HEIGHT, position=np.array([LENGTH / 2, THICKNESS - COVER / 2, HEIGHT / 2])),
+        Box_fcl(x=LENGTH, y=THICKNESS, z=COVER, position=np.array([LENGTH / 2, THICKNESS / 2, COVER / 2])),
+        Box_fcl(x=LENGTH, y=THICKNESS, z=COVER, position=np.array([LENGTH / 2, THICKNESS / 2, HEIGHT - COVER / 2])),
+    ])
+    transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), np.array([[1, 0, 1]]))
+    fcl_model.add_obj([Diagonal_fcl(x=100, y=50, z=400, transformation=transformation,
+                                    position=np.array([LENGTH * (i + 0.5) / 4, THICKNESS / 2, HEIGHT / 2]))
+                       for i in range(4)])
+    number = rebars // 4
+    for i in range(number):
+        x, z = LENGTH * (i + 0.5) / number, HEIGHT * (i + 0.5) / number
+        for y in (COVER + DIAMETER / 2, THICKNESS - COVER - DIAMETER / 2):
+            fcl_model.add_rebar([[x, y, COVER], [x, y, HEIGHT / 2], [x, y, HEIGHT - COVER]], DIAMETER)
+            y += DIAMETER if y < THICKNESS / 2 else -DIAMETER
+            fcl_model.add_rebar([[COVER, y, z], [LENGTH / 2, y, z], [LENGTH - COVER, y, z]], DIAMETER)
+    return fcl_model
+
+
+def _fcl_sphere(fcl_model: ShearWallFCLModel, position, size: float) -> bool:
+    obj = fcl.CollisionObject(fcl.Sphere(np.ceil(size / 2)), fcl.Transform(np.asarray(position, dtype=float)))
+    return fcl_model._collide_first(obj)
+
+
+def _march(fcl_model: ShearWallFCLModel, start, end, size: float, step_length: float = 3):
+    """
+    逐步移动检测: 返回首个碰撞的步数与查询次数,不碰撞时步数为 None
+    """
+    length = np.linalg.norm(end - start)
+    steps = int(length // step_length)
+    for num in range(1, steps + 1):
+        if fcl_model.collision_agent(Agent(size, start + num * step_length * (end - start) / length)):
+            return num, num
+    return None, steps
+
+
+def _linear_shift(collides, max_steps: int = 301):
+    for k in range(1, max_steps + 1):
+        if not collides(k):
+            return k
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebars", type=int, nargs="+", default=[500, 2000], help="墙体中的钢筋数量")
+    parser.add_argument("--points", type=int, default=1000, help="点智能体数量")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for rebars in args.rebars:
+        fcl_model = _wall(rebars)
+        print(f"rebars={rebars} objects={len(fcl_model.objs)} analytic={len(fcl_model.shapes)}")
+        positions = rng.uniform([0, 0, 0], [LENGTH, THICKNESS, HEIGHT], (args.points, 3))
+        expected = [_fcl_sphere(fcl_model, position, DIAMETER) for position in positions]
+        assert [fcl_model.collision_agent(Agent(DIAMETER, position)) for position in positions] == expected
+        assert fcl_model.collision_agents(positions, DIAMETER).tolist() == expected
+        seconds = [
+            min(timeit.repeat(func, number=1, repeat=3)) / len(positions)
+            for func in (
+                lambda: [_fcl_sphere(fcl_model, position, DIAMETER) for position in positions],
+                lambda: [fcl_model.collision_agent(Agent(DIAMETER, position)) for position in positions],
+                lambda: fcl_model.collision_agents(positions, DIAMETER),
+            )
+        ]
+        print(f"agent  ({sum(expected):4d} hits)  fcl {seconds[0] * 1e6:8.1f} us  collision_agent {seconds[1] * 1e6:8.1f} us"
+              f"  collision_agents {seconds[2] * 1e6:6.1f} us/point")
+
+        chords = [fcl_model.new_rebar_fcl([[x, THICKNESS / 2, COVER], [x, THICKNESS / 2, HEIGHT - COVER]], 8)
+                  for x in rng.uniform(0, LENGTH, 200)]
+        expected = [fcl_model.collision_check_add(fcl_model.new_obj(chord)) for chord in chords]
+        assert [fcl_model.collision_check(chord) for chord in chords] == expected
+        seconds = [
+            min(timeit.repeat(func, number=1, repeat=3)) / len(chords)
+            for func in (
+                lambda: [fcl_model.collision_check_add(fcl_model.new_obj(chord)) for chord in chords],
+                lambda: [fcl_model.collision_check(chord) for chord in chords],
+            )
+        ]
+        print(f"chord  ({sum(expected):4d} hits)  collision_check_add {seconds[0] * 1e6:8.1f} us"
+              f"  collision_check {seconds[1] * 1e6:8.1f} us")
+
+        # 两层钢筋之间沿墙长、墙高方向的线段,斜向长方体由 fcl 保守推进
+        starts = rng.uniform([0, THICKNESS / 2 - 40, 0], [LENGTH, THICKNESS / 2 + 40, HEIGHT], (100, 3))
+        segments = [(start, start + np.eye(3)[axis] * 1000) for start, axis in zip(starts, rng.choice([0, 2], 100))]
+        marches = [_march(fcl_model, start, end, DIAMETER) for start, end in segments]
+        for (start, end), (num, _) in zip(segments, marches):
+            # 逐步移动在首次接触后的第一步检测到碰撞(接触区间短于步长时可能跳过)
+            hit = fcl_model.sweep_agent(start, end, DIAMETER)
+            assert num is None or abs(num - hit * 1000 / 3) < 1 + 1e-6
+        seconds = [
+            min(timeit.repeat(func, number=1, repeat=3)) / len(segments)
+            for func in (
+                lambda: [_march(fcl_model, start, end, DIAMETER) for start, end in segments],
+                lambda: [fcl_model.sweep_agent(start, end, DIAMETER) for start, end in segments],
+            )
+        ]
+        print(f"sweep  ({sum(num is not None for num, _ in marches):4d} hits)  3 mm march {seconds[0] * 1e6:8.1f} us"
+              f" ({np.mean([queries for _, queries in marches]):.0f} queries)  sweep_agent {seconds[1] * 1e6:8.1f} us")
+
+        # 保护层内的点与钢筋沿墙厚方向移出保护层,墙长方向移出斜向长方体
+        shifts = [(np.array([x, 2, z]), np.array([0, 1, 0])) for x, z in rng.uniform(0, [LENGTH, HEIGHT], (50, 2))]
+        shifts += [(np.array([LENGTH * (i + 0.5) / 4, THICKNESS / 2, HEIGHT / 2]), np.array([1, 0, 0]))
+                   for i in range(4)]
+        bars = [(np.array([[x, 2, COVER], [x, 2, HEIGHT - COVER]]), np.array([0, 1, 0]))
+                for x in rng.uniform(0, LENGTH, 20)]
+        for name, cases, linear, search in (
+                ("agent", shifts,
+                 lambda p, a: _linear_shift(lambda k: fcl_model.collision_agent(Agent(DIAMETER, p + k * a))),
+                 lambda p, a: fcl_model.free_agent_shift(p, a, DIAMETER, 301)),
+                ("rebar", bars,
+                 lambda b, a: _linear_shift(
+                     lambda k: fcl_model.collision_check_add(fcl_model.new_obj(fcl_model.new_rebar_fcl(b + k * a, 8)))),
+                 lambda b, a: fcl_model.free_rebar_shift(b, a, 8, 301)),
+        ):
+            expected = [linear(*case) for case in cases]
+            assert [search(*case) for case in cases] == expected
+            seconds = [min(timeit.repeat(lambda: [func(*case) for case in cases], number=1, repeat=3)) / len(cases)
+                       for func in (linear, search)]
+            print(f"shift  {name}  ({np.mean([k for k in expected if k]):.0f} steps)  linear {seconds[0] * 1e6:8.1f} us"
+                  f"  free_{name}_shift {seconds[1] * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+深化设计数据编码基准测试: DoubleWallDesign.codec 二进制编码与 asdict + json
+
+运行: python benchmarks/bench_codec.py [--number 50] [--walls 1 20]
+对示例墙体的计算结果、BIM 钢筋、BVBS 钢筋、桁架钢筋分别统计编码、解码耗时与数据大小;
+--walls 大于 1 时将多面墙体的数据放在一个列表中编码。
+json 解码后逐层构造数据类(与接口中由 json 构造 DetailedDesign 的方式相同,枚举字段保持为 int)
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import timeit
+from dataclasses import asdict
+from enum import Enum
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DoubleWallDesign.codec import decode, encode
+from DoubleWallDesign.detailed_design import detailed_design
+from DoubleWallDesign.models import (
+    CastInsertsDesignMode,
+    CastInsertsNumber,
+    ConstructionDetailed,
+    DetailedDesign,
+    DetailedDesignResult,
+    GeometricDetailed,
+    InsertsDetailed,
+    LiftingInsertsDesignMode,
+    LiftingInsertsPosition,
+    Material,
+    OtherInserts,
+    RebarBVBS,
+    RebarDesignMode,
+    RebarDetailed,
+    RebarDiam,
+    RebarDiamSpac,
+    RebarforBIM,
+    RebarforBVBS,
+    RebarGeoBVBS,
+    RectangleHole,
+    ShearWallID,
+    ShearWallType,
+    SupportInsertsDesignMode,
+    SupportInsertsPosition,
+    TrussDetailed,
+    TrussRebar,
+    TrussRebarforBIM,
+    TrussRebarMode,
+    WallHole,
+    WallHoleType,
+    WallLengthType,
+)
+from dc_rebar import PointArray, Rebar
+
+
+def _sample() -> DetailedDesign:
+    return DetailedDesign(
+        shear_wall_id=ShearWallID(project_ID="CZ1", shear_wall_ID="WSPQ-1928-12"),
+        material=Material(rebar_name="HRB400", concrete_grade=60),
+        construction_detailed=ConstructionDetailed(concrete_cover_thickness=15),
+        geometric_detailed=GeometricDetailed(
+            shear_wall_type=ShearWallType.EXTERIOR, length=1950, height=2800, thickness=250,
+            interior_thickness=50, exterior_thickness=50, bottom_gap_height=50, top_gap_height=160,
+            wall_length_type=WallLengthType.NO, left_gap_length=0, right_gap_length=0, wall_hole=WallHole.YES,
+            wall_hole_type=WallHoleType.RECTANGLE,
+            wall_hole_parameter=RectangleHole(hole_height=200, hole_length=200, hole_horizontal=1000,
+                                              hole_vertical=1400),
+        ),
+        rebar_detailed=RebarDetailed(
+            rebar_design_mode=RebarDesignMode.MANUAL,
+            horizontal_rebars=[RebarDiamSpac(diameter=8, spacing=200), RebarDiamSpac(diameter=10, spacing=200)],
+            vertical_rebars=[RebarDiamSpac(diameter=8, spacing=200), RebarDiamSpac(diameter=10, spacing=200)],
+            horizontal_rebars_ratio=0.3, vertical_rebars_ratio=0.3,
+        ),
+        truss_detailed=TrussDetailed(
+            truss_rebar_mode=TrussRebarMode.MANUAL, material_name="HPB300", top_rebar=RebarDiam(diameter=10),
+            bottom_rebar=RebarDiam(diameter=8), diagonal_rebar=RebarDiamSpac(diameter=6, spacing=200),
+            height=200, width=100, truss_number=6,
+        ),
+        inserts_detailed=InsertsDetailed(
+            lifting_inserts_design_mode=LiftingInsertsDesignMode.MANUAL,
+            support_inserts_design_mode=SupportInsertsDesignMode.MANUAL,
+            cast_inserts_design_mode=CastInsertsDesignMode.MANUAL,
+            cast_inserts_number=CastInsertsNumber(left_number=6, right_number=6, top_number=0, bottom_number=0),
+            other_inserts=OtherInserts.YES, lifting_inserts_diameter=16,
+            lifting_inserts_position=LiftingInsertsPosition(x1=412, x2=1560), support_inserts_parameter=30,
+            support_inserts_position=SupportInsertsPosition(x1=350, x2=1600, y1=150, y2=2000),
+            other_inserts_number=1, other_inserts_parameters=[10], other_inserts_positions=[[350, 150]],
+        ),
+    )
+
+
+def _asdict_contain_enum(data):
+    # 与 design.exchange.tools.custom_asdict_contain_enum 相同
+    return dict((k, v.value if isinstance(v, Enum) else v) for k, v in data)
+
+
+def _json_default(obj):
+    if isinstance(obj, PointArray):
+        return obj.tolist()
+    raise TypeError(type(obj).__name__)
+
+
+def json_encode(objs) -> bytes:
+    content = [asdict(obj, dict_factory=_asdict_contain_enum) for obj in objs]
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _rebar(data):
+    return None if data is None else Rebar(**data)
+
+
+def _rebar_bvbs(data):
+    return RebarBVBS(**dict(data, geometric=[RebarGeoBVBS(**item) for item in data["geometric"]]))
+
+
+# json 解码后的 dict 到数据类,嵌套的数据类字段没有强制类型转换,需要逐层构造
+_FROM_JSON = {
+    DetailedDesignResult: lambda data: DetailedDesignResult(**dict(
+        data,
+        horizontal_rebars=[RebarDiamSpac(**item) for item in data["horizontal_rebars"]],
+        vertical_rebars=[RebarDiamSpac(**item) for item in data["vertical_rebars"]],
+    )),
+    RebarforBIM: lambda data: RebarforBIM(
+        horizontal_rebars=[Rebar(**item) for item in data["horizontal_rebars"]],
+        vertical_rebars=[Rebar(**item) for item in data["vertical_rebars"]],
+    ),
+    RebarforBVBS: lambda data: RebarforBVBS(
+        horizontal_rebars=[_rebar_bvbs(item) for item in data["horizontal_rebars"]],
+        vertical_rebars=[_rebar_bvbs(item) for item in data["vertical_rebars"]],
+    ),
+    TrussRebarforBIM: lambda data: TrussRebarforBIM(truss_rebars=[
+        TrussRebar(**{key: _rebar(value) for key, value in item.items()}) for item in data["truss_rebars"]
+    ]),
+}
+
+
+def json_decode(data: bytes, cls):
+    return [_FROM_JSON[cls](item) for item in json.loads(data)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=50, help="每种方式重复的次数")
+    parser.add_argument("--walls", type=int, nargs="+", default=[1, 20], help="一次编码的墙体数量")
+    args = parser.parse_args()
+
+    outputs = detailed_design(_sample())[:4]
+    for walls in args.walls:
+        print(f"walls={walls}")
+        for obj in outputs:
+            objs = [copy.deepcopy(obj) for _ in range(walls)]  # 各墙体的点数组互不共享
+            binary, text = encode(objs), json_encode(objs)
+            assert decode(binary) == objs
+            if type(obj) is not DetailedDesignResult:  # 由 json 构造的 DetailedDesign 枚举字段为 int
+                assert json_decode(text, type(obj)) == objs
+
+            number = max(1, args.number // walls)
+            seconds = [
+                min(timeit.repeat(func, number=number, repeat=3)) / number
+                for func in (
+                    lambda: encode(objs),
+                    lambda: decode(binary),
+                    lambda: json_encode(objs),
+                    lambda: json_decode(text, type(obj)),
+                )
+            ]
+            print(f"{type(obj).__name__:22s} codec {len(binary):8d} B  encode {seconds[0] * 1e3:7.2f} ms"
+                  f"  decode {seconds[1] * 1e3:7.2f} ms | json {len(text):8d} B  encode {seconds[2] * 1e3:7.2f} ms"
+                  f"  decode {seconds[3] * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+converter_dataclass 实例化基准测试: 反射遍历字段的 post_init 与装饰时生成的 __post_init__(含 __slots__)
+
+运行: python benchmarks/bench_converter_dataclass.py [--number 100000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from functools import partial
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter_dataclass import dataclass_with_converter as dataclass
+from converter_dataclass import field_with_converter as field
+from converter_dataclass import iter_convert, post_init
+from dc_rebar import IndexedPolyCurve, Point3D, Rebar
+
+
+# 与 dc_rebar 中定义相同,__post_init__ 使用反射遍历字段的 post_init
+@dataclass
+class LegacyPoint3D:
+    x: float = 0
+    y: float = 0
+    z: float = 0
+
+
+@dataclass
+class LegacyIndexedPolyCurve:
+    points: List[LegacyPoint3D] = field(
+        converter=partial(iter_convert, func=LegacyPoint3D.converter), default_factory=list
+    )
+    segments: List[List[int]] = field(default_factory=list)
+
+
+@dataclass
+class LegacyRebar:
+    radius: int = 4
+    poly: Optional[LegacyIndexedPolyCurve] = field(converter=LegacyIndexedPolyCurve.converter, default=None)
+
+
+for _cls in (LegacyPoint3D, LegacyIndexedPolyCurve, LegacyRebar):
+    _cls.__post_init__ = post_init
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=100000, help="每种方式创建的对象数量")
+    args = parser.parse_args()
+    number = args.number
+    points = [[float(i), 2.0, 3.0] for i in range(4)]  # 一根钢筋 4 个点,以列表形式传入,由 converter 转换
+
+    assert Rebar(4, IndexedPolyCurve(points)).poly.points[3] == Point3D(3.0, 2.0, 3.0)
+    cases = [
+        ("Point3D", lambda: [LegacyPoint3D(i, 2.0, 3.0) for i in range(number)],
+         lambda: [Point3D(i, 2.0, 3.0) for i in range(number)]),
+        ("Rebar(IndexedPolyCurve(4 points))",
+         lambda: [LegacyRebar(4, LegacyIndexedPolyCurve(points)) for _ in range(number)],
+         lambda: [Rebar(4, IndexedPolyCurve(points)) for _ in range(number)]),
+    ]
+    print(f"number={number}")
+    for name, legacy, generated in cases:
+        legacy_seconds = min(timeit.repeat(legacy, number=1, repeat=3))
+        generated_seconds = min(timeit.repeat(generated, number=1, repeat=3))
+        print(f"{name:36s} post_init {legacy_seconds * 1e3:8.1f} ms  generated {generated_seconds * 1e3:8.1f} ms"
+              f"  speedup {legacy_seconds / generated_seconds:5.2f}x")
+    print(f"{'size Point3D':36s} __dict__ {sys.getsizeof(LegacyPoint3D()) + sys.getsizeof(LegacyPoint3D().__dict__)} B"
+          f"  __slots__ {sys.getsizeof(Point3D())} B")
+
+
+if __name__ == "__main__":
+    main()
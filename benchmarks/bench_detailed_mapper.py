@@ -0,0 +1,53 @@
+"""
+深化设计参数转换基准测试: DetailedDataSerializer 与 detailed_data_2_design
+
+运行: python benchmarks/bench_detailed_mapper.py [--number 2000]
+不访问数据库,使用未保存的 WallDetailedData 实例
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shearWall.settings")
+
+import django
+
+django.setup()
+
+from DoubleWallDesign.models import DetailedDesign
+from design.exchange.detailed import (
+    DETAILED_DATA_FIELDS,
+    DetailedDataSerializer,
+    detailed_data_2_design,
+    detailed_data_2_dict,
+)
+from design.models import WallDetailedData
+from design.tests import WALL_DETAILED_DATA
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000, help="每种方式的转换次数")
+    args = parser.parse_args()
+
+    row = WallDetailedData(**WALL_DETAILED_DATA)
+    values = {name: getattr(row, name) for name in DETAILED_DATA_FIELDS}
+    assert detailed_data_2_design(row) == DetailedDesign(**dict(DetailedDataSerializer(instance=row).data))
+
+    cases = [
+        ("serializer -> dict", lambda: dict(DetailedDataSerializer(instance=row).data)),
+        ("mapper(row) -> dict", lambda: detailed_data_2_dict(row)),
+        ("mapper(values) -> dict", lambda: detailed_data_2_dict(values)),
+        ("serializer -> DetailedDesign", lambda: DetailedDesign(**dict(DetailedDataSerializer(instance=row).data))),
+        ("mapper(row) -> DetailedDesign", lambda: detailed_data_2_design(row)),
+    ]
+    print(f"number={args.number}")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f"{name:32s} {seconds / args.number * 1e6:10.1f} us/row")
+
+
+if __name__ == "__main__":
+    main()
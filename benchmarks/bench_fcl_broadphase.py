@@ -0,0 +1,119 @@
+"""
+fcl 碰撞检测模型基准测试: 持久的 broadphase 与每次查询重新注册全部对象
+
+运行: python benchmarks/bench_fcl_broadphase.py [--rebars 2000] [--number 50] [--layouts vertical mesh]
+在墙体中逐根加入钢筋(每根钢筋为两段),在已加入 N 根钢筋时统计一次 collision_check_add 的耗时;
+重新注册即改动前的查询方式,耗时随已加入钢筋的数量增长。
+- vertical: 两层竖向钢筋
+- mesh: 两层钢筋网。fcl 对旋转后的几何体使用外接球的包围盒,水平钢筋的包围盒覆盖半个墙长,
+  与探测钢筋的包围盒相交的对象数量随钢筋数量增长,查询耗时主要为窄相检测
+加入全部钢筋后,统计点智能体的查询耗时: 生成全部接触点的查询(collision_agent_rebar 的方式)、
+collision_agent 与 collision_agents,hit 为位于钢筋上的点,miss 为两层钢筋之间的点
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import fcl
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RebarLayout.collision_detection import ShearWallFCLModel
+from RebarLayout.fcl_models import Agent
+
+LENGTH = 6000
+HEIGHT = 3000
+DIAMETER = 10
+
+
+def _rebar(i: int, rebars: int, layout: str) -> list:
+    # vertical: 两层竖向钢筋; mesh: 偶数为竖向钢筋,奇数为水平钢筋
+    layer = 30 if i % 4 < 2 else 220
+    number = rebars // 2
+    if layout == "vertical" or i % 2 == 0:
+        x = LENGTH * (i // 2 + 0.5) / number
+        return [[x, layer, 0], [x, layer, HEIGHT / 2], [x, layer, HEIGHT]]
+    z = HEIGHT * (i // 2 + 0.5) / number
+    return [[0, layer + DIAMETER, z], [LENGTH / 2, layer + DIAMETER, z], [LENGTH, layer + DIAMETER, z]]
+
+
+def _rebuild_check(fcl_model: ShearWallFCLModel, objs_new: list) -> bool:
+    manager_orginal = fcl.DynamicAABBTreeCollisionManager()
+    manager_new = fcl.DynamicAABBTreeCollisionManager()
+    manager_orginal.registerObjects(fcl_model.objs)
+    manager_new.registerObjects(objs_new)
+    manager_orginal.setup()
+    manager_new.setup()
+    cdata = fcl.CollisionData(fcl.CollisionRequest(num_max_contacts=10000, enable_contact=True),
+                              fcl.CollisionResult())
+    manager_orginal.collide(manager_new, cdata, fcl.defaultCollisionCallback)
+    return len(cdata.result.contacts) != 0
+
+
+def _contact_agent(fcl_model: ShearWallFCLModel, position, size: float) -> bool:
+    manager_new = fcl.DynamicAABBTreeCollisionManager()
+    manager_new.registerObjects([fcl.CollisionObject(fcl.Sphere(size / 2), fcl.Transform(position))])
+    manager_new.setup()
+    cdata = fcl.CollisionData(fcl.CollisionRequest(num_max_contacts=10000, enable_contact=True),
+                              fcl.CollisionResult())
+    fcl_model.manager.collide(manager_new, cdata, fcl.defaultCollisionCallback)
+    return len(cdata.result.contacts) != 0
+
+
+def _agent_probes(fcl_model: ShearWallFCLModel, rebars: int, number: int):
+    points = {
+        "hit": np.array([[LENGTH * (i + 0.5) / (rebars // 2), 30, HEIGHT / 3] for i in range(number)]),
+        "miss": np.array([[LENGTH * (i + 0.25) / number, 125, HEIGHT / 3] for i in range(number)]),
+    }
+    for name, positions in points.items():
+        expected = [_contact_agent(fcl_model, position, DIAMETER) for position in positions]
+        assert [fcl_model.collision_agent(Agent(DIAMETER, position)) for position in positions] == expected
+        assert fcl_model.collision_agents(positions, DIAMETER).tolist() == expected
+        seconds = [
+            min(timeit.repeat(func, number=1, repeat=3)) / number
+            for func in (
+                lambda: [_contact_agent(fcl_model, position, DIAMETER) for position in positions],
+                lambda: [fcl_model.collision_agent(Agent(DIAMETER, position)) for position in positions],
+                lambda: fcl_model.collision_agents(positions, DIAMETER),
+            )
+        ]
+        print(f"agent {name:4s}  contacts {seconds[0] * 1e6:8.1f} us  collision_agent {seconds[1] * 1e6:8.1f} us"
+              f"  collision_agents {seconds[2] * 1e6:8.1f} us/point")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebars", type=int, default=2000, help="墙体中的钢筋数量")
+    parser.add_argument("--number", type=int, default=50, help="每次统计的查询次数")
+    parser.add_argument("--layouts", nargs="+", default=["vertical", "mesh"], choices=["vertical", "mesh"])
+    args = parser.parse_args()
+
+    checkpoints = sorted({args.rebars // 8, args.rebars // 4, args.rebars // 2, args.rebars})
+    for layout in args.layouts:
+        print(f"layout={layout}")
+        fcl_model = ShearWallFCLModel()
+        # 探测的钢筋: 两层钢筋之间与竖向钢筋平行的短钢筋
+        probe = fcl_model.new_obj(fcl_model.new_rebar_fcl([[100, 125, HEIGHT / 3], [100, 125, HEIGHT * 2 / 3]],
+                                                          DIAMETER))
+        added = 0
+        for checkpoint in checkpoints:
+            add_seconds, start = timeit.default_timer(), added
+            while added < checkpoint:
+                fcl_model.add_rebar(_rebar(added, args.rebars, layout), DIAMETER)
+                added += 1
+            add_seconds = (timeit.default_timer() - add_seconds) / max(1, checkpoint - start)
+            assert fcl_model.collision_check_add(probe) == _rebuild_check(fcl_model, probe)
+            seconds = [
+                min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+                for func in (lambda: fcl_model.collision_check_add(probe), lambda: _rebuild_check(fcl_model, probe))
+            ]
+            print(f"rebars={checkpoint:5d} objects={len(fcl_model.objs):5d}  add_rebar {add_seconds * 1e6:6.1f} us"
+                  f"  | probe persistent {seconds[0] * 1e6:8.1f} us  rebuild {seconds[1] * 1e6:9.1f} us"
+                  f"  ({seconds[1] / seconds[0]:.0f}x)")
+        _agent_probes(fcl_model, args.rebars, args.number)
+
+
+if __name__ == "__main__":
+    main()
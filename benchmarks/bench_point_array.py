@@ -0,0 +1,52 @@
+"""
+IndexedPolyCurve 点存储基准测试: List[Point3D] 与 PointArray((N, 3) float64 数组)
+
+运行: python benchmarks/bench_point_array.py [--rebars 5000] [--points 2 4 8]
+统计创建钢筋占用的内存(tracemalloc)与转换为 (N, 3) 数组的耗时,
+坐标为新建的 float,与实际生成钢筋时一致
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dc_rebar import IndexedPolyCurve, PointArray, Rebar
+
+
+def _memory(factory) -> tuple:
+    tracemalloc.start()
+    objects = factory()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objects, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebars", type=int, default=5000, help="钢筋数量")
+    parser.add_argument("--points", type=int, nargs="+", default=[2, 4, 8], help="每根钢筋的点数")
+    args = parser.parse_args()
+
+    print(f"rebars={args.rebars}")
+    for number in args.points:
+        polys = [[[float(i), float(j * 100), 20.0] for j in range(number)] for i in range(args.rebars)]
+        listed, listed_size = _memory(
+            lambda: [Rebar(5, IndexedPolyCurve([[x + 0.5, y + 0.5, z + 0.5] for x, y, z in poly])) for poly in polys])
+        arrays, array_size = _memory(lambda: [Rebar(5, IndexedPolyCurve.from_array(poly)) for poly in polys])
+        packed, packed_size = _memory(
+            lambda: [Rebar(5, IndexedPolyCurve.from_array(points)) for points in PointArray.pack(polys)])
+        assert arrays == packed and len(listed) == len(arrays)
+
+        listed_seconds = min(timeit.repeat(lambda: [rebar.poly.point_array for rebar in listed], number=1, repeat=3))
+        packed_seconds = min(timeit.repeat(lambda: [rebar.poly.point_array for rebar in packed], number=1, repeat=3))
+        print(f"points={number:3d}  memory List[Point3D] {listed_size / args.rebars:5.0f} B/rebar"
+              f"  PointArray {array_size / args.rebars:5.0f} B/rebar"
+              f"  PointArray.pack {packed_size / args.rebars:5.0f} B/rebar"
+              f"  | to array {listed_seconds * 1e3:6.2f} ms, {packed_seconds * 1e3:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
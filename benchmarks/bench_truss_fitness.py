@@ -0,0 +1,46 @@
+"""
+桁架排布适应度基准测试: 逐个计算 truss_fitness 与一次计算 truss_fitness_batch
+
+运行: python benchmarks/bench_truss_fitness.py [--sizes 100 1000 10000] [--trusses 6]
+使用 1950mm 墙长、一个洞口与 5 个预埋件的排布问题,不依赖 Django
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from RebarLayout.layout_opt import TrussLayoutProblem, truss_fitness, truss_fitness_batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="排布数量")
+    parser.add_argument("--trusses", type=int, default=6, help="桁架数量")
+    args = parser.parse_args()
+
+    problem = TrussLayoutProblem(
+        length=1950, truss_number=args.trusses, truss_width=100, edge_margin=65,
+        obstacles=[[850, 1150], [354, 470], [332, 448], [285, 415], [285, 415], [295, 405]],
+    )
+    rng = np.random.default_rng(0)
+    print(f"trusses={args.trusses}")
+    for size in args.sizes:
+        population = problem.repair(rng.uniform(*problem.bounds, size=(size, args.trusses)))
+        loop = np.array([truss_fitness(positions, problem) for positions in population])
+        assert np.allclose(loop, truss_fitness_batch(population, problem))
+
+        number = max(1, 10000 // size)
+        loop_seconds = min(timeit.repeat(
+            lambda: [truss_fitness(positions, problem) for positions in population], number=1, repeat=3))
+        batch_seconds = min(timeit.repeat(
+            lambda: truss_fitness_batch(population, problem), number=number, repeat=3)) / number
+        print(f"population={size:6d} loop {loop_seconds * 1e3:9.2f} ms  batch {batch_seconds * 1e3:8.3f} ms"
+              f"  speedup {loop_seconds / batch_seconds:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -69,6 +69,64 @@ def post_init(obj):
         post_converter()
 
 
+def _make_post_init(cls) -> Callable:
+    """
+    在装饰时为类生成专用的 __post_init__,与 post_init 的结果相同
+
+    只对声明了 converter 的字段逐个生成 "不为None 时转换" 的语句,不再在每次实例化时遍历全部字段;
+    子类未经装饰时(字段可能不同)退回 post_init
+
+    :param cls: 已经过 dataclass 处理的类
+    :return:
+    """
+    namespace = {"__cls": cls, "__post_init_generic": post_init}
+    lines = [
+        "def __post_init__(self):",
+        "    if self.__class__ is not __cls:",
+        "        return __post_init_generic(self)",
+    ]
+    for _key, _field in getattr(cls, "__dataclass_fields__").items():
+        if isinstance(_field, ConverterField) and _field.converter is not None:
+            namespace[f"__converter_{_key}"] = _field.converter
+            lines += [
+                f"    _value_in = self.{_key}",
+                "    if _value_in is not None:",
+                f"        self.{_key} = __converter_{_key}(_value_in)",
+            ]
+    if callable(getattr(cls, "__post_converter__", None)):
+        lines.append("    self.__post_converter__()")
+    else:
+        lines.append("    pass")
+    exec("\n".join(lines), namespace)
+    post_init_func = namespace["__post_init__"]
+    post_init_func.__qualname__ = f"{cls.__qualname__}.__post_init__"
+    return post_init_func
+
+
+def _add_slots(cls):
+    """
+    以字段名作为 __slots__ 重新创建类(与 python3.10 dataclass(slots=True) 相同),
+    字段默认值已记录在 __init__ 中,从类属性中移除
+    """
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(getattr(cls, "__dataclass_fields__"))
+    inherited_slots = {
+        name for base in cls.__mro__[1:-1] for name in getattr(base, "__slots__", ())
+    }
+    cls_dict["__slots__"] = tuple(
+        name for name in field_names if name not in inherited_slots
+    )
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    qualname = getattr(cls, "__qualname__", None)
+    cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    if qualname is not None:
+        cls.__qualname__ = qualname
+    return cls
+
+
 def convert_dataclass(cls, data):
     if cls is None:
         return None
@@ -107,11 +165,13 @@ def dataclass_with_converter(
     order=False,
     unsafe_hash=False,
     frozen=False,
+    slots=False,
 ):
     """
     对dataclasses 中 dataclass 装饰器的封装
 
     会默认生成__post_init__ 函数,在初始化后执行强制类型转换 —— 可以不在Field 中申明强制类型转换,则不会强制类型转换
+    __post_init__ 在装饰时按字段生成,实例化时不再通过反射遍历字段
 
     会默认未创建的类，生成一个converter 类函数,可以提供默认的,将数据转换成类示例的方式 -—— 可以修改改类强制类型转换的函数
 
@@ -123,6 +183,7 @@ def dataclass_with_converter(
     :param order:
     :param unsafe_hash:
     :param frozen:
+    :param slots: 生成 __slots__,实例不再有 __dict__,不能添加字段以外的属性
     :return:
     """
 
@@ -137,6 +198,9 @@ def dataclass_with_converter(
             unsafe_hash=unsafe_hash,
             frozen=frozen,
         )(cls)
+        if slots:
+            cls_in = _add_slots(cls_in)
+        setattr(cls_in, "__post_init__", _make_post_init(cls_in))
 
         if convert is None:
             convert_func = convert_dataclass
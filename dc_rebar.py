@@ -4,8 +4,11 @@
 
 """
 import logging
+from collections.abc import Sequence
 from functools import partial
-from typing import List, Optional
+from typing import List, Optional, Union
+
+import numpy as np
 
 # from dataclasses import dataclass, field, Field, MISSING
 from converter_dataclass import (
@@ -19,7 +22,7 @@ _LOGGER = logging.getLogger(__name__)
 __version__ = "0.0.6"
 
 
-@dataclass
+@dataclass(slots=True)
 class Point3D:
     """
     定义三维空间中一个点
@@ -30,7 +33,121 @@ class Point3D:
     z: float = 0
 
 
-@dataclass
+class PointArray(Sequence):
+    """
+    以 (N, 3) float64 数组存储的点列表,可替代 List[Point3D]
+
+    按下标取值时返回 Point3D,切片返回共享数据的 PointArray;
+    np.asarray(points) 与 points.array 返回数据的视图,不复制。
+    PointArray.pack 将多根钢筋的点存储在同一数组中,每根钢筋只占一个小对象
+    """
+
+    __slots__ = ("_data", "_start", "_stop")
+
+    def __init__(self, data=()):
+        if isinstance(data, PointArray):
+            data = data.array
+        elif not isinstance(data, np.ndarray):
+            data = [[p.x, p.y, p.z] if isinstance(p, Point3D) else p for p in data]
+        self._data: np.ndarray = np.asarray(data, dtype=np.float64).reshape(-1, 3)
+        self._start = 0
+        self._stop = self._data.shape[0]
+
+    @classmethod
+    def pack(cls, polys) -> List["PointArray"]:
+        """
+        多根钢筋的点存储在同一 (M, 3) 数组中
+        :param polys: 各钢筋的点 [[[x, y, z], ...], ...]
+        :return: 各钢筋的 PointArray
+        """
+        arrays = [np.asarray(poly, dtype=np.float64).reshape(-1, 3) for poly in polys]
+        data = np.concatenate(arrays) if arrays else np.empty((0, 3))
+        stops = np.cumsum([array.shape[0] for array in arrays]).tolist()
+        result = []
+        start = 0
+        for stop in stops:
+            result.append(cls.from_storage(data, start, stop))
+            start = stop
+        return result
+
+    @classmethod
+    def from_storage(cls, data: np.ndarray, start: int, stop: int) -> "PointArray":
+        """
+        使用 data[start:stop] 作为点数据,不复制
+        :param data: (M, 3) float64 数组
+        """
+        points = cls.__new__(cls)
+        points._data, points._start, points._stop = data, start, stop
+        return points
+
+    @property
+    def storage(self) -> tuple:
+        """
+        存储点数据的数组(可能由多个 PointArray 共享)及本对象所占的行范围: (data, start, stop)
+        """
+        return self._data, self._start, self._stop
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._data[self._start:self._stop]
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PointArray(self.array[index])
+        x, y, z = self.array[index].tolist()
+        return Point3D(x, y, z)
+
+    def __iter__(self):
+        for x, y, z in self.array.tolist():
+            yield Point3D(x, y, z)
+
+    def __array__(self, dtype=None):
+        return self.array if dtype is None else self.array.astype(dtype, copy=False)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (PointArray, np.ndarray, list, tuple)):
+            other = PointArray(other).array
+            return self.array.shape == other.shape and bool(np.array_equal(self.array, other))
+        return NotImplemented
+
+    def __getstate__(self):
+        # 同一次序列化中共享数组的 PointArray 只保存一份数组
+        return self._data, self._start, self._stop
+
+    def __setstate__(self, state):
+        self._data, self._start, self._stop = state
+
+    def __repr__(self) -> str:
+        return f"PointArray({self.array.tolist()})"
+
+    def tolist(self) -> List[List[float]]:
+        return self.array.tolist()
+
+
+def convert_points(data) -> Union[List[Point3D], PointArray]:
+    """
+    IndexedPolyCurve.points 的强制类型转换: 数组与 PointArray 保持数组存储,其他可迭代对象转换为 List[Point3D]
+    """
+    if isinstance(data, PointArray):
+        return data
+    if isinstance(data, np.ndarray):
+        return PointArray(data)
+    return iter_convert(data, func=Point3D.converter)
+
+
+def points_array(points: Union[List[Point3D], PointArray]) -> np.ndarray:
+    """
+    点列表的 (N, 3) 数组,PointArray 不复制
+    """
+    if isinstance(points, PointArray):
+        return points.array
+    return np.array([[p.x, p.y, p.z] for p in points], dtype=np.float64).reshape(-1, 3)
+
+
+@dataclass(slots=True)
 class IndexedPolyCurve:
     """
 
@@ -44,13 +161,30 @@ class IndexedPolyCurve:
 
     """
 
-    points: List[Point3D] = field(
-        converter=partial(iter_convert, func=Point3D.converter), default_factory=list
+    points: Union[List[Point3D], PointArray] = field(
+        converter=convert_points, default_factory=list
     )
     segments: List[List[int]] = field(default_factory=list)
 
-
-@dataclass
+    @classmethod
+    def from_array(cls, points, segments: Optional[List[List[int]]] = None) -> "IndexedPolyCurve":
+        """
+        以数组存储点,每个点占 24 字节
+        :param points: PointArray, (N, 3) 数组或 [[x, y, z], ...]
+        """
+        if not isinstance(points, PointArray):
+            points = PointArray(points)
+        return cls(points, segments if segments is not None else [])
+
+    @property
+    def point_array(self) -> np.ndarray:
+        """
+        点的 (N, 3) 数组,以数组存储时不复制
+        """
+        return points_array(self.points)
+
+
+@dataclass(slots=True)
 class Rebar:
     """
     钢筋定义需要的:
@@ -66,7 +200,7 @@ class Rebar:
     )
 
 
-@dataclass
+@dataclass(slots=True)
 class Direction(Point3D):
     """
     定义向量,默认是x 为方向的向量
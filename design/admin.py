@@ -1,6 +1,15 @@
-from django.contrib import admin
-from design.models import WallDetailedData, WallDetailedResult
-from design.tools import call_detailed_design, call_detailed_design_by_model
+from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
+from design.models import (
+    ProjectDesignRun,
+    WallDetailedData,
+    WallDetailedResult,
+    WallDesignArtifact,
+    WallDesignJob,
+    WallRebarQuantity,
+)
+from design.jobs import enqueue_detailed_design, start_project_design
 
 # 登录界面标题
 admin.site.site_header = '复杂预制构件智能深化设计系统'
@@ -13,6 +22,7 @@ admin.site.index_title = '站点管理'
 @admin.register(WallDetailedData)
 class AdminWallDetailedData(admin.ModelAdmin):
     list_display = ["project_num", "shear_wall_num", "remark_name", "pub_date"]
+    actions = ["design_projects"]
     fieldsets = [
         ("剪力墙项目", {
             "fields": [
@@ -186,17 +196,60 @@ class AdminWallDetailedData(admin.ModelAdmin):
         instance: WallDetailedResult
         obj: WallDetailedData
         if obj:
-            # 在这里调用结构计算
-            detailed_result_row = call_detailed_design_by_model(obj)
-            # tasks.total_back_handle.apply_async((detailed_result_row.id,))
+            # 深化设计提交至后台任务队列,不在请求内计算
+            job = enqueue_detailed_design(obj)
+            self.message_user(request, f"已提交深化设计任务:{job.id}", messages.INFO)
         return data_back
 
+    @admin.action(description="深化设计所选墙体所在的整个项目")
+    def design_projects(self, request, queryset):
+        project_nums = sorted(
+            set(queryset.exclude(project_num__isnull=True).exclude(project_num="").values_list("project_num", flat=True))
+        )
+        if not project_nums:
+            self.message_user(request, "所选墙体没有项目编号", messages.WARNING)
+        for project_num in project_nums:
+            run = start_project_design(project_num)
+            url = reverse("admin:design_projectdesignrun_change", args=[run.id])
+            self.message_user(
+                request,
+                format_html('已提交项目深化设计:{},共 {} 个墙体,<a href="{}">查看进度</a>', project_num, run.total, url),
+                messages.INFO,
+            )
+
+class WallRebarQuantityInline(admin.TabularInline):
+    model = WallRebarQuantity
+    extra = 0
+    can_delete = False
+    readonly_fields = ["direction", "mark", "grade", "diameter", "length", "quantity", "weight"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class WallDesignArtifactInline(admin.TabularInline):
+    model = WallDesignArtifact
+    extra = 0
+    can_delete = False
+    readonly_fields = ["kind", "size", "gzip_size", "created_time", "download"]
+    exclude = ["sha256"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="下载")
+    def download(self, obj: WallDesignArtifact):
+        url = reverse("design:result-artifact", args=[obj.result_id, obj.kind])
+        return format_html('<a href="{}">{}</a>', url, obj.get_kind_display())
+
+
 @admin.register(WallDetailedResult)
 class AdminWallDetailedResult(admin.ModelAdmin):
     list_display = [
         "remark_name",
         "success",
     ]
+    inlines = [WallRebarQuantityInline, WallDesignArtifactInline]
 
     def get_fieldsets(self, request, obj=None):
         obj: WallDetailedResult
@@ -220,7 +273,7 @@ class AdminWallDetailedResult(admin.ModelAdmin):
                 ("状态控制", {"fields": ["success", "message"]}),
             ]
         else:
-            fieldsets = ("状态控制", {"fields": ["success", "message"]})
+            fieldsets = [("状态控制", {"fields": ["success", "message"]})]
         return fieldsets
 
     @admin.display(description="别名")
@@ -230,4 +283,94 @@ class AdminWallDetailedResult(admin.ModelAdmin):
         else:
             return None
 
-    remark_name.short_description = "别名"
\ No newline at end of file
+    remark_name.short_description = "别名"
+
+@admin.register(WallDesignJob)
+class AdminWallDesignJob(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "remark_name",
+        "status",
+        "created_time",
+        "started_time",
+        "finished_time",
+        "wait_seconds",
+        "run_seconds",
+    ]
+    list_filter = ["status"]
+    readonly_fields = [
+        "wall",
+        "result",
+        "status",
+        "message",
+        "created_time",
+        "started_time",
+        "finished_time",
+        "wait_seconds",
+        "run_seconds",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="别名")
+    def remark_name(self, obj: WallDesignJob):
+        return obj.wall.remark_name
+
+    @admin.display(description="排队时长(s)")
+    def wait_seconds(self, obj: WallDesignJob):
+        return obj.wait_seconds
+
+    @admin.display(description="计算时长(s)")
+    def run_seconds(self, obj: WallDesignJob):
+        return obj.run_seconds
+
+
+@admin.register(ProjectDesignRun)
+class AdminProjectDesignRun(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "project_num",
+        "status",
+        "total",
+        "done",
+        "failed",
+        "progress",
+        "eta",
+        "created_time",
+        "finished_time",
+    ]
+    list_filter = ["status"]
+    search_fields = ["project_num"]
+    readonly_fields = [
+        "project_num",
+        "status",
+        "worker_number",
+        "total",
+        "done",
+        "failed",
+        "progress",
+        "eta",
+        "elapsed",
+        "message",
+        "created_time",
+        "started_time",
+        "finished_time",
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="进度")
+    def progress(self, obj: ProjectDesignRun):
+        return f"{obj.progress:.0%}"
+
+    @admin.display(description="预计剩余(s)")
+    def eta(self, obj: ProjectDesignRun):
+        eta = obj.eta_seconds
+        return None if eta is None else round(eta)
+
+    @admin.display(description="已用时长(s)")
+    def elapsed(self, obj: ProjectDesignRun):
+        elapsed = obj.elapsed_seconds
+        return None if elapsed is None else round(elapsed, 1)
@@ -5,3 +5,8 @@ class DesignConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "design"
     verbose_name = "双皮剪力墙设计"
+
+    def ready(self):
+        from .jobs import configure_metrics
+
+        configure_metrics()
@@ -0,0 +1,214 @@
+"""
+深化设计文件仓库
+
+文件按内容哈希(sha256)保存在 settings.DESIGN_ARTIFACT_ROOT 下,下载时通过 FileResponse 分块读取,
+支持 ETag、Range 请求与预压缩的 gzip 文件,文件不会整体读入 web 进程内存
+"""
+import gzip
+import hashlib
+import os
+import re
+import shutil
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.http import FileResponse, HttpRequest, HttpResponse
+
+from .models import WallDesignArtifact, WallDetailedResult
+
+_CHUNK_SIZE = 1024 * 1024
+
+ARTIFACT_EXTENSION = {
+    WallDesignArtifact.KIND_IFC: ".ifc",
+    WallDesignArtifact.KIND_BVBS: ".abs",
+    WallDesignArtifact.KIND_DXF: ".dxf",
+}
+ARTIFACT_CONTENT_TYPE = {
+    WallDesignArtifact.KIND_IFC: "application/x-step",
+    WallDesignArtifact.KIND_BVBS: "text/plain; charset=utf-8",
+    WallDesignArtifact.KIND_DXF: "image/vnd.dxf",
+}
+
+
+def artifact_root() -> str:
+    return str(settings.DESIGN_ARTIFACT_ROOT)
+
+
+def artifact_temp_dir() -> str:
+    """
+    计算进程写入临时文件的目录,与文件仓库位于同一磁盘
+    """
+    path = os.path.join(artifact_root(), "tmp")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def artifact_path(sha256: str, kind: str) -> str:
+    return os.path.join(artifact_root(), sha256[:2], f"{sha256}{ARTIFACT_EXTENSION[kind]}")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_gzip(path: str) -> int:
+    gzip_path = f"{path}.gz"
+    if not os.path.exists(gzip_path):
+        temp_path = f"{gzip_path}.{os.getpid()}.tmp"
+        with open(path, "rb") as src, gzip.open(temp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        os.replace(temp_path, gzip_path)
+    return os.path.getsize(gzip_path)
+
+
+def store_artifact(result: WallDetailedResult, kind: str, temp_path: str) -> WallDesignArtifact:
+    """
+    将计算进程生成的临时文件移入文件仓库,并记录到对应的深化设计结果
+    :param result: 深化设计结果
+    :param kind: 文件类型
+    :param temp_path: 临时文件路径,处理后删除
+    :return:
+    """
+    sha256 = _file_sha256(temp_path)
+    path = artifact_path(sha256, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):  # 内容相同的文件已存在
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, path)
+    gzip_size = _write_gzip(path) if settings.DESIGN_ARTIFACT_GZIP else None
+
+    artifact, _ = WallDesignArtifact.objects.update_or_create(
+        result=result,
+        kind=kind,
+        defaults=dict(sha256=sha256, size=os.path.getsize(path), gzip_size=gzip_size),
+    )
+    return artifact
+
+
+class _FileRange:
+    """
+    只读取文件指定区间的文件对象,供 FileResponse 分块读取
+    """
+
+    def __init__(self, file, start: int, length: int):
+        self._file = file
+        self._file.seek(start)
+        self._remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个区间的 Range 请求头
+    :return: (起始位置, 结束位置[含]), 无法满足时返回 None
+    """
+    match = _RANGE.match(header.strip())
+    if match is None:
+        raise ValueError(header)
+    first, last = match.groups()
+    if first == "" and last == "":
+        raise ValueError(header)
+    if first == "":  # 最后 n 个字节
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = size - 1 if last == "" else min(int(last), size - 1)
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def artifact_response(request: HttpRequest, artifact: WallDesignArtifact, filename: str) -> HttpResponse:
+    """
+    生成文件下载响应
+    :param request:
+    :param artifact: 文件记录
+    :param filename: 下载文件名
+    :return:
+    """
+    path = artifact_path(artifact.sha256, artifact.kind)
+    size = os.path.getsize(path)
+    etag = f'"{artifact.sha256}"'
+    content_type = ARTIFACT_CONTENT_TYPE[artifact.kind]
+    range_header = request.META.get("HTTP_RANGE")
+    if range_header and request.META.get("HTTP_IF_RANGE", etag) != etag:
+        range_header = None  # 文件已变化,返回完整文件
+    byte_range = None
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            range_header = None  # 无法解析(或多区间)的 Range 请求忽略,返回完整文件
+
+    gzip_path = f"{path}.gz"
+    use_gzip = (
+        not range_header
+        and artifact.gzip_size is not None
+        and "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+        and os.path.exists(gzip_path)
+    )
+    if use_gzip:
+        etag = f'"{artifact.sha256}-gzip"'
+
+    if _etag_matches(request.META.get("HTTP_IF_NONE_MATCH"), etag):
+        response = HttpResponse(status=304)
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    if use_gzip:
+        response = FileResponse(open(gzip_path, "rb"), as_attachment=True, filename=filename)
+        response["Content-Type"] = content_type
+        response["Content-Encoding"] = "gzip"
+        response["Content-Length"] = str(os.path.getsize(gzip_path))
+    elif range_header:
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            _FileRange(open(path, "rb"), start, length), as_attachment=True, filename=filename, status=206
+        )
+        response["Content-Type"] = content_type
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        response = FileResponse(open(path, "rb"), as_attachment=True, filename=filename)
+        response["Content-Type"] = content_type
+        response["Content-Length"] = str(size)
+
+    response["ETag"] = etag
+    response["Accept-Ranges"] = "bytes"
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "private, max-age=0, must-revalidate"
+    return response
@@ -0,0 +1,123 @@
+"""
+深化设计结果缓存
+
+以深化设计参数的规范化哈希为键,缓存计算结果与钢筋数据,命中时不再调用深化设计流程。
+剪力墙编号不参与哈希,同一项目中相同类型的墙体可以共用计算结果,取出时替换为当前编号。
+
+缓存只在本进程的内存中: 每个 web 进程与 run_design_jobs 进程各有一份,互不共享,进程重启后清空;
+缓存在投递任务的进程中读写,进程池的计算进程不使用缓存。持久化的结果保存在 WallDetailedResult 中。
+"""
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from DoubleWallDesign.models import DetailedDesign, DetailedDesignResult, RebarforBVBS, ShearWallID
+
+from .exchange.tools import custom_asdict_contain_enum
+from .workers import DesignArtifacts
+
+
+def detailed_design_key(parameter: DetailedDesign) -> str:
+    """
+    深化设计参数的规范化哈希(sha256),不包含剪力墙编号
+    :param parameter: 深化设计参数
+    :return:
+    """
+    # 由序列化器生成的参数中可能含有 ReturnDict, asdict 无法直接重建, 深拷贝时会转换为 dict
+    content = asdict(copy.deepcopy(parameter), dict_factory=custom_asdict_contain_enum)
+    content.pop("shear_wall_id", None)
+    text = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedDesign:
+    """
+    缓存的深化设计结果
+    """
+    result: DetailedDesignResult
+    artifacts: DesignArtifacts
+
+    def for_shear_wall(self, shear_wall_id: ShearWallID) -> "CachedDesign":
+        """
+        返回替换剪力墙编号后的副本,缓存中的对象本身不做修改
+        """
+        if self.result.detailed_design.shear_wall_id == shear_wall_id:
+            return self
+
+        detailed = copy.copy(self.result.detailed_design)
+        detailed.shear_wall_id = shear_wall_id
+        result = copy.copy(self.result)
+        result.detailed_design = detailed
+
+        ids = dict(project_ID=shear_wall_id.project_ID, shear_wall_ID=shear_wall_id.shear_wall_ID)
+        bvbs = self.artifacts.rebar_for_BVBS
+        artifacts = replace(
+            self.artifacts,
+            rebar_for_BVBS=RebarforBVBS(
+                horizontal_rebars=[replace(rebar, **ids) for rebar in bvbs.horizontal_rebars],
+                vertical_rebars=[replace(rebar, **ids) for rebar in bvbs.vertical_rebars],
+            ),
+        )
+        return CachedDesign(result=result, artifacts=artifacts)
+
+
+class DesignResultCache:
+    """
+    线程安全的 LRU 缓存,超过容量时淘汰最久未使用的结果
+
+    只在本进程内有效(见模块说明),容量按进程计算,总内存占用约为 进程数 × maxsize 条结果
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, CachedDesign]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedDesign]:
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return cached
+
+    def put(self, key: str, cached: CachedDesign):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = cached
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                size=len(self._data),
+                maxsize=self.maxsize,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+
+design_cache = DesignResultCache(maxsize=getattr(settings, "DESIGN_CACHE_SIZE", 256))
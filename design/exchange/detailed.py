@@ -1,10 +1,14 @@
 import ast
 import logging
+import math
 import traceback
 from collections import OrderedDict
+from collections.abc import Mapping
 from dataclasses import asdict, dataclass
-from typing import Optional, Dict, Callable
+from operator import attrgetter
+from typing import Optional, Dict, Callable, List, Union
 
+from django.db import transaction
 from rest_framework import serializers
 
 from DoubleWallDesign.models import (
@@ -23,6 +27,8 @@ from DoubleWallDesign.models import (
     TrussRebarMode,
     CircleHole,
     RectangleHole,
+    DetailedDesign,
+    RebarforBVBS,
 )
 
 from design import exchange
@@ -31,6 +37,7 @@ from design.models import (
     DetailDataCopyChangeWrite,
     WallDetailedData,
     WallDetailedResult,
+    WallRebarQuantity,
 )
 
 import traceback
@@ -421,6 +428,258 @@ class DetailedDataSerializer(serializers.ModelSerializer):
         ]
 
 
+# 深化设计参数用到的 WallDetailedData 字段,可直接用于 QuerySet.values(*DETAILED_DATA_FIELDS)
+DETAILED_DATA_FIELDS = (
+    "project_num",
+    "shear_wall_num",
+    "rebar_name",
+    "concrete_grade",
+    "protective_layer_thickness",
+    "shear_wall_type",
+    "wall_length_type",
+    "length",
+    "thickness",
+    "height",
+    "interior_thickness",
+    "exterior_thickness",
+    "bottom_gap_height",
+    "top_gap_height",
+    "left_gap_length",
+    "right_gap_length",
+    "wall_hole",
+    "wall_hole_type",
+    "rectangle_hole_height",
+    "rectangle_hole_length",
+    "rectangle_hole_horizontal",
+    "rectangle_hole_vertical",
+    "circle_hole_diameter",
+    "circle_hole_horizontal",
+    "circle_hole_vertical",
+    "rebar_design_mode",
+    "horizontal_rebar_diameter",
+    "horizontal_rebar_spacing",
+    "horizontal_rebars_ratio",
+    "vertical_rebar_diameter",
+    "vertical_rebar_spacing",
+    "vertical_rebars_ratio",
+    "truss_rebar_mode",
+    "distributed_rebar",
+    "lifting_rebar",
+    "truss_height",
+    "truss_width",
+    "truss_number",
+    "truss_top_rebar_diameter",
+    "truss_bottom_rebar_diameter",
+    "diagonal_rebar_diameter",
+    "diagonal_rebar_spacing",
+    "lifting_inserts_design_mode",
+    "lifting_inserts_diameter",
+    "lifting_inserts_position_x1",
+    "lifting_inserts_position_x2",
+    "support_inserts_design_mode",
+    "support_inserts_hole_diameter",
+    "support_inserts_position_x1",
+    "support_inserts_position_x2",
+    "support_inserts_position_y1",
+    "support_inserts_position_y2",
+    "cast_inserts_design_mode",
+    "cast_inserts_left_number",
+    "cast_inserts_right_number",
+    "cast_inserts_top_number",
+    "cast_inserts_bottom_number",
+    "other_inserts",
+    "other_inserts_number",
+    "other_inserts_parameters",
+    "other_inserts_positions",
+)
+
+_get_detailed_fields_from_row = attrgetter(*DETAILED_DATA_FIELDS)
+
+_RECTANGLE = WallHoleType.RECTANGLE.value
+_MANUAL_REBAR = RebarDesignMode.MANUAL.value
+_MANUAL_TRUSS = TrussRebarMode.MANUAL.value
+_MANUAL_LIFTING = LiftingInsertsDesignMode.MANUAL.value
+_MANUAL_SUPPORT = SupportInsertsDesignMode.MANUAL.value
+_MANUAL_CAST = CastInsertsDesignMode.MANUAL.value
+
+
+def _int(value):
+    return None if value is None else int(value)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def _other_inserts_parameters(value) -> list:
+    try:
+        return list(map(int, value.split(",")))
+    except Exception as e:
+        _logger.error(f"{e}, data: {value}")
+        return []
+
+
+def _other_inserts_positions(value) -> list:
+    try:
+        return ast.literal_eval(f"[{value}]")
+    except Exception as e:
+        _logger.error(f"{e}, data: {value}")
+        return []
+
+
+def detailed_data_2_dict(data: Union[WallDetailedData, Mapping]) -> Dict:
+    """
+    WallDetailedData 表行(或 values() 得到的字典)直接转换为 DetailedDesign 的参数字典
+
+    结果与 DetailedDataSerializer(instance=row).data 一致,但不创建嵌套的序列化器,用于批量计算
+    """
+    if not isinstance(data, Mapping):
+        data = dict(zip(DETAILED_DATA_FIELDS, _get_detailed_fields_from_row(data)))
+    d = data
+
+    if d["wall_hole"] == WallHole.YES.value:
+        if d["wall_hole_type"] == _RECTANGLE:
+            wall_hole_parameter = {
+                "hole_height": _int(d["rectangle_hole_height"]),
+                "hole_length": _int(d["rectangle_hole_length"]),
+                "hole_horizontal": _int(d["rectangle_hole_horizontal"]),
+                "hole_vertical": _int(d["rectangle_hole_vertical"]),
+            }
+        else:
+            wall_hole_parameter = {
+                "hole_diameter": _int(d["circle_hole_diameter"]),
+                "hole_horizontal": _int(d["circle_hole_horizontal"]),
+                "hole_vertical": _int(d["circle_hole_vertical"]),
+            }
+    else:
+        wall_hole_parameter = None
+
+    if d["rebar_design_mode"] == _MANUAL_REBAR:
+        horizontal_rebars = {
+            "diameter": _int(d["horizontal_rebar_diameter"]),
+            "spacing": _int(d["horizontal_rebar_spacing"]),
+        }
+        vertical_rebars = {
+            "diameter": _int(d["vertical_rebar_diameter"]),
+            "spacing": _int(d["vertical_rebar_spacing"]),
+        }
+    else:
+        horizontal_rebars = vertical_rebars = None
+
+    if d["truss_rebar_mode"] == _MANUAL_TRUSS:
+        top_rebar = {"diameter": _int(d["truss_top_rebar_diameter"])}
+        bottom_rebar = {"diameter": _int(d["truss_bottom_rebar_diameter"])}
+        diagonal_rebar = {
+            "diameter": _int(d["diagonal_rebar_diameter"]),
+            "spacing": _int(d["diagonal_rebar_spacing"]),
+        }
+    else:
+        top_rebar = bottom_rebar = diagonal_rebar = None
+
+    if d["lifting_inserts_design_mode"] == _MANUAL_LIFTING:
+        lifting_inserts_position = {
+            "x1": _int(d["lifting_inserts_position_x1"]),
+            "x2": _int(d["lifting_inserts_position_x2"]),
+        }
+    else:
+        lifting_inserts_position = None
+
+    if d["support_inserts_design_mode"] == _MANUAL_SUPPORT:
+        support_inserts_position = {
+            "x1": _int(d["support_inserts_position_x1"]),
+            "x2": _int(d["support_inserts_position_x2"]),
+            "y1": _int(d["support_inserts_position_y1"]),
+            "y2": _int(d["support_inserts_position_y2"]),
+        }
+    else:
+        support_inserts_position = None
+
+    if d["cast_inserts_design_mode"] == _MANUAL_CAST:
+        cast_inserts_number = {
+            "left_number": _int(d["cast_inserts_left_number"]),
+            "right_number": _int(d["cast_inserts_right_number"]),
+            "top_number": _int(d["cast_inserts_top_number"]),
+            "bottom_number": _int(d["cast_inserts_bottom_number"]),
+        }
+    else:
+        cast_inserts_number = None
+
+    return {
+        "shear_wall_id": {
+            "project_ID": _str(d["project_num"]),
+            "shear_wall_ID": _str(d["shear_wall_num"]),
+        },
+        "material": {
+            "rebar_name": d["rebar_name"],
+            "concrete_grade": d["concrete_grade"],
+        },
+        "construction_detailed": {
+            "concrete_cover_thickness": _int(d["protective_layer_thickness"]),
+        },
+        "geometric_detailed": {
+            "shear_wall_type": d["shear_wall_type"],
+            "wall_length_type": d["wall_length_type"],
+            "length": _int(d["length"]),
+            "thickness": _int(d["thickness"]),
+            "height": _int(d["height"]),
+            "interior_thickness": _int(d["interior_thickness"]),
+            "exterior_thickness": _int(d["exterior_thickness"]),
+            "bottom_gap_height": _int(d["bottom_gap_height"]),
+            "top_gap_height": _int(d["top_gap_height"]),
+            "left_gap_length": _int(d["left_gap_length"]),
+            "right_gap_length": _int(d["right_gap_length"]),
+            "wall_hole": d["wall_hole"],
+            "wall_hole_type": d["wall_hole_type"],
+            "wall_hole_parameter": wall_hole_parameter,
+        },
+        "rebar_detailed": {
+            "rebar_design_mode": d["rebar_design_mode"],
+            "horizontal_rebars": horizontal_rebars,
+            "vertical_rebars": vertical_rebars,
+            "horizontal_rebars_ratio": _float(d["horizontal_rebars_ratio"]),
+            "vertical_rebars_ratio": _float(d["vertical_rebars_ratio"]),
+        },
+        "truss_detailed": {
+            "truss_rebar_mode": _int(d["truss_rebar_mode"]),
+            "distributed_rebar": _int(d["distributed_rebar"]),
+            "lifting_rebar": _int(d["lifting_rebar"]),
+            "height": _int(d["truss_height"]),
+            "width": _int(d["truss_width"]),
+            "truss_number": _int(d["truss_number"]),
+            # 与 _TrussDetailedSerializer.get_material_name 保持一致
+            "material_name": {"rebar_name": d["rebar_name"]},
+            "top_rebar": top_rebar,
+            "bottom_rebar": bottom_rebar,
+            "diagonal_rebar": diagonal_rebar,
+        },
+        "inserts_detailed": {
+            "lifting_inserts_design_mode": _int(d["lifting_inserts_design_mode"]),
+            "lifting_inserts_diameter": _int(d["lifting_inserts_diameter"]),
+            "lifting_inserts_position": lifting_inserts_position,
+            "support_inserts_design_mode": _int(d["support_inserts_design_mode"]),
+            "support_inserts_parameter": _int(d["support_inserts_hole_diameter"]),
+            "support_inserts_position": support_inserts_position,
+            "cast_inserts_design_mode": _int(d["cast_inserts_design_mode"]),
+            "cast_inserts_number": cast_inserts_number,
+            "other_inserts": _int(d["other_inserts"]),
+            "other_inserts_number": _int(d["other_inserts_number"]),
+            "other_inserts_parameters": _other_inserts_parameters(d["other_inserts_parameters"]),
+            "other_inserts_positions": _other_inserts_positions(d["other_inserts_positions"]),
+        },
+    }
+
+
+def detailed_data_2_design(data: Union[WallDetailedData, Mapping]) -> DetailedDesign:
+    """
+    WallDetailedData 表行(或 values() 得到的字典)转换为深化设计参数,替代 DetailedDataSerializer
+    """
+    return DetailedDesign(**detailed_data_2_dict(data))
+
+
 def _dataclass_2_dict_with_head(
     data: dataclass,
     head: Optional[str] = None,
@@ -449,11 +708,63 @@ def _dataclass_2_dict_with_head(
     return data_back
 
 
+def detail_result_summary(result: DetailedDesignResult) -> Dict:
+    """
+    深化设计结果摘要,去除输入参数部分,可直接 json 序列化
+    """
+    summary = asdict(result, dict_factory=custom_asdict_contain_enum)
+    summary.pop("detailed_design", None)
+    return summary
+
+
+def _rebar_specs_2_json(rebars) -> Optional[list]:
+    """
+    钢筋直径间距列表转换为 json 格式 [{"diameter": 8, "spacing": 200}, ...]
+    """
+    if rebars is None:
+        return None
+    return [asdict(rebar) if not isinstance(rebar, dict) else dict(rebar) for rebar in rebars]
+
+
+def rebar_quantities_from_bvbs(
+    rebar_for_BVBS: RebarforBVBS, result: WallDetailedResult
+) -> List[WallRebarQuantity]:
+    """
+    由 BVBS 钢筋数据生成钢筋用量表行[未保存],重量计算与 create_bvbs 一致
+    """
+    quantities = []
+    for direction, rebars in (
+        (WallRebarQuantity.DIRECTION_HORIZONTAL, rebar_for_BVBS.horizontal_rebars),
+        (WallRebarQuantity.DIRECTION_VERTICAL, rebar_for_BVBS.vertical_rebars),
+    ):
+        for rebar in rebars:
+            weight_per_rebar = 7.85 * math.pi * rebar.rebar_diameter ** 2 / 4 * rebar.rebar_length / 1e6  # kg
+            quantities.append(
+                WallRebarQuantity(
+                    result=result,
+                    direction=direction,
+                    mark=rebar.mark,
+                    grade=rebar.rebar_grade,
+                    diameter=rebar.rebar_diameter,
+                    length=rebar.rebar_length,
+                    quantity=rebar.rebar_quantity,
+                    weight=weight_per_rebar * rebar.rebar_quantity,
+                )
+            )
+    return quantities
+
+
 def detail_result_2_model_result(
-    result: DetailedDesignResult, detailed_data: WallDetailedData
+    result: DetailedDesignResult,
+    detailed_data: WallDetailedData,
+    rebar_for_BVBS: Optional[RebarforBVBS] = None,
 ) -> WallDetailedResult:
     """
-    完成dataclass 嵌套格式的数据,到数据库表orm 的转换[手动] 默认不保存
+    完成dataclass 嵌套格式的数据,到数据库表orm 的转换,每个参数对应一条结果
+    :param result: 深化设计结果
+    :param detailed_data: 对应的深化设计参数
+    :param rebar_for_BVBS: BVBS 钢筋数据,传入时同时更新钢筋用量
+    :return:
     """
     # if WallHoleType(result.wall_hole_type) == WallHoleType.RECTANGLE:
     #     wall_hole_parameter = _dataclass_2_dict_with_head(
@@ -477,24 +788,32 @@ def detail_result_2_model_result(
     else:
         raise ccw_serializer.errors
 
-    result_orm = WallDetailedResult.objects.update_or_create(
-        defaults=dict(
-            interior_height=result.interior_height,
-            exterior_height=result.exterior_height,
-            left_gap_length=result.left_gap_length,
-            right_gap_length=result.right_gap_length,
-            interior_length=result.interior_length,
-            exterior_length=result.exterior_length,
-            volume=result.volume,
-            area=result.area,
-            weight=result.weight,
-            horizontal_rebars=result.horizontal_rebars,
-            vertical_rebars=result.vertical_rebars,
-        ),
-    )[0]
+    with transaction.atomic():
+        result_orm = WallDetailedResult.objects.update_or_create(
+            wall=detailed_data,
+            defaults=dict(
+                interior_height=result.interior_height,
+                exterior_height=result.exterior_height,
+                left_gap_length=result.left_gap_length,
+                right_gap_length=result.right_gap_length,
+                interior_length=result.interior_length,
+                exterior_length=result.exterior_length,
+                volume=result.volume,
+                area=result.area,
+                weight=result.weight,
+                horizontal_rebars=_rebar_specs_2_json(result.horizontal_rebars),
+                vertical_rebars=_rebar_specs_2_json(result.vertical_rebars),
+                success=True,
+                message="; ".join(result.warnings)[:256] or None,  # 计算成功时记录警告
+            ),
+        )[0]
+        if rebar_for_BVBS is not None:
+            result_orm.rebar_quantities.all().delete()
+            WallRebarQuantity.objects.bulk_create(rebar_quantities_from_bvbs(rebar_for_BVBS, result_orm))
 
     return result_orm
 
+
 class SerializerBtnDesignResultCopyWrite(serializers.ModelSerializer):
     """
     完成复制出来的参数的插入和导出——双向
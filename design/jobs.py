@@ -0,0 +1,484 @@
+"""
+深化设计后台任务队列
+
+任务持久化在数据库(WallDesignJob)中,由本地进程池执行,无需额外的消息队列服务
+"""
+import logging
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone as dt_timezone
+from functools import partial
+from traceback import format_exc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from DoubleWallDesign import instrumentation
+from DoubleWallDesign.models import DetailedDesignResult, ShearWallID
+
+from .cache import CachedDesign, design_cache, detailed_design_key
+from .exchange.detailed import detail_result_2_model_result, detailed_data_2_design
+from .artifacts import artifact_temp_dir, store_artifact
+from .models import ProjectDesignRun, WallDesignJob, WallDetailedData, WallDetailedResult
+from .workers import DesignArtifacts, export_design_artifacts, run_detailed_design
+
+_logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_design_executor() -> ProcessPoolExecutor:
+    """
+    获取深化设计进程池,首次调用时创建,进程数由 settings.DESIGN_WORKER_NUMBER 控制
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = getattr(settings, "DESIGN_WORKER_NUMBER", None)
+            _executor = _create_executor(max_workers)
+        return _executor
+
+
+def submit_design_task(fn: Callable, *args, **kwargs) -> Future:
+    """
+    投递至公共进程池
+    计算进程异常退出(如 OCC/FCL 段错误)后进程池不再可用(BrokenProcessPool),此时重建进程池后重新投递;
+    进程池已被 shutdown_design_executor 关闭时抛出 RuntimeError
+    """
+    executor = get_design_executor()
+    try:
+        return executor.submit(fn, *args, **kwargs)
+    except BrokenExecutor:
+        _logger.warning("深化设计进程池的计算进程异常退出,重建进程池")
+        _discard_executor(executor)
+        return get_design_executor().submit(fn, *args, **kwargs)
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """
+    关闭不可用的进程池,下次获取时重新创建;其他线程已重建时不做处理
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def configure_metrics():
+    """
+    按 settings 配置本进程的性能统计输出
+    """
+    instrumentation.configure(*_metrics_config())
+
+
+def _metrics_config() -> Tuple[bool, Optional[str]]:
+    directory = getattr(settings, "DESIGN_METRICS_DIR", None)
+    return bool(getattr(settings, "DESIGN_METRICS_LOG", False)), str(directory) if directory else None
+
+
+def _create_executor(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    # 计算进程不执行 django.setup, 由 initializer 配置性能统计输出
+    return ProcessPoolExecutor(
+        max_workers=max_workers, initializer=instrumentation.configure, initargs=_metrics_config()
+    )
+
+
+def shutdown_design_executor(wait: bool = True):
+    """
+    关闭深化设计进程池
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def enqueue_detailed_design(wall: WallDetailedData) -> WallDesignJob:
+    """
+    创建深化设计任务,事务提交后投递至进程池,立即返回
+    """
+    job = WallDesignJob.objects.create(wall=wall)
+    transaction.on_commit(partial(submit_design_job, job.id))
+    return job
+
+
+def submit_design_job(job_id: int) -> Optional[Future]:
+    """
+    将排队中的任务投递至进程池,参数与已有结果相同时直接使用缓存结果
+    任务以一条 UPDATE 从排队中改为计算中,多个进程(web 与 run_design_jobs)同时投递时只有一个能领取
+    """
+    claimed = WallDesignJob.objects.filter(id=job_id, status=WallDesignJob.STATUS_QUEUED).update(
+        status=WallDesignJob.STATUS_RUNNING
+    )
+    if claimed != 1:
+        return None
+    job = WallDesignJob.objects.select_related("wall").get(id=job_id)
+    try:
+        parameter = detailed_data_2_design(job.wall)
+        key = detailed_design_key(parameter)
+    except Exception:
+        _mark_failed(job, format_exc())
+        return None
+
+    cached = design_cache.get(key)
+    if cached is not None:
+        now = timezone.now().timestamp()
+        try:
+            cached = cached.for_shear_wall(parameter.shear_wall_id)
+            _save_job_result(job, cached.result, cached.artifacts, now, now)
+        except Exception:
+            _mark_failed(job, format_exc())
+        return None
+
+    # 保存结果只需要配筋与 BVBS 钢筋,桁架排布在生成 ifc/dxf 文件时计算
+    try:
+        future = submit_design_task(run_detailed_design, parameter, truss=False)
+    except BrokenExecutor:  # 重建后的进程池仍不可用,任务重新排队,由 run_design_jobs 再次投递
+        _logger.exception(f"深化设计任务投递失败: {job_id}")
+        WallDesignJob.objects.filter(id=job_id).update(status=WallDesignJob.STATUS_QUEUED)
+        return None
+    except RuntimeError:  # 进程池已关闭,任务重新排队
+        WallDesignJob.objects.filter(id=job_id).update(status=WallDesignJob.STATUS_QUEUED)
+        raise
+    future.add_done_callback(partial(_on_job_done, job.id, key))
+    return future
+
+
+def submit_queued_jobs() -> int:
+    """
+    投递所有排队中的任务(例如服务重启前未执行的任务),返回投递数量,项目整体深化设计的任务由 run_project_design 执行
+    """
+    job_ids = list(
+        WallDesignJob.objects.filter(status=WallDesignJob.STATUS_QUEUED, project_run__isnull=True).values_list(
+            "id", flat=True
+        )
+    )
+    for job_id in job_ids:
+        submit_design_job(job_id)
+    return len(job_ids)
+
+
+def requeue_running_jobs() -> int:
+    """
+    将计算中的任务重新排队,返回数量
+    执行任务的进程退出时未完成的任务会一直停留在计算中,任务不记录执行进程,无法区分已中断与其他进程(如 web)仍在计算,
+    只应在确认没有其他进程执行任务时调用(run_design_jobs --requeue-running);
+    项目整体深化设计的任务由 run_project_design 继续计算
+    """
+    return WallDesignJob.objects.filter(status=WallDesignJob.STATUS_RUNNING, project_run__isnull=True).update(
+        status=WallDesignJob.STATUS_QUEUED
+    )
+
+
+def _on_job_done(job_id: int, key: str, future: Future):
+    """
+    进程池任务完成回调,在进程池的管理线程中执行,需要自行管理数据库连接
+    """
+    close_old_connections()
+    try:
+        job = WallDesignJob.objects.select_related("wall").get(id=job_id)
+        try:
+            result, artifacts, started, finished = future.result()
+        except Exception:
+            _mark_failed(job, format_exc())
+            return
+        design_cache.put(key, CachedDesign(result=result, artifacts=artifacts))
+        try:
+            _save_job_result(job, result, artifacts, started, finished)
+        except Exception:
+            _mark_failed(job, format_exc())
+    except Exception:
+        _logger.exception(f"深化设计任务回调异常: {job_id}")
+    finally:
+        close_old_connections()
+
+
+def _save_job_result(
+    job: WallDesignJob,
+    result: DetailedDesignResult,
+    artifacts: DesignArtifacts,
+    started: float,
+    finished: float,
+):
+    with transaction.atomic():
+        job.result = detail_result_2_model_result(result, job.wall, artifacts.rebar_for_BVBS)
+        job.status = WallDesignJob.STATUS_SUCCESS
+        job.started_time = _from_timestamp(started)
+        job.finished_time = _from_timestamp(finished)
+        job.save(update_fields=["result", "status", "started_time", "finished_time"])
+    submit_artifact_export(job.result, result, artifacts)
+
+
+def submit_artifact_export(
+    result_orm: WallDetailedResult, result: DetailedDesignResult, artifacts: DesignArtifacts
+) -> Optional[Future]:
+    """
+    在进程池中生成深化设计文件(settings.DESIGN_ARTIFACT_KINDS),完成后存入文件仓库
+    """
+    kinds = list(getattr(settings, "DESIGN_ARTIFACT_KINDS", []))
+    if not kinds:
+        return None
+    try:
+        future = submit_design_task(
+            export_design_artifacts,
+            result,
+            artifacts,
+            artifact_temp_dir(),
+            kinds,
+            str(settings.DESIGN_DXF_TEMPLATE),
+        )
+    except RuntimeError:  # 进程池已关闭
+        _logger.exception(f"深化设计文件生成任务提交失败: {result_orm.id}")
+        return None
+    future.add_done_callback(partial(_on_artifacts_done, result_orm.id))
+    return future
+
+
+def _on_artifacts_done(result_id: int, future: Future):
+    """
+    深化设计文件生成完成回调,将临时文件移入文件仓库
+    """
+    close_old_connections()
+    try:
+        paths = future.result()
+        result_orm = WallDetailedResult.objects.get(id=result_id)
+        for kind, path in paths.items():
+            store_artifact(result_orm, kind, path)
+    except Exception:
+        _logger.exception(f"深化设计文件生成失败: {result_id}")
+    finally:
+        close_old_connections()
+
+
+def create_project_design_run(project_num: str, worker_number: Optional[int] = None) -> ProjectDesignRun:
+    """
+    创建项目整体深化设计,项目下每个墙体创建一个深化设计任务
+    :param project_num: 项目编号
+    :param worker_number: 计算进程数,为空时使用公共进程池
+    :return:
+    """
+    with transaction.atomic():
+        run = ProjectDesignRun.objects.create(project_num=project_num, worker_number=worker_number)
+        walls = WallDetailedData.objects.filter(project_num=project_num).only("id")
+        jobs = WallDesignJob.objects.bulk_create([WallDesignJob(wall=wall, project_run=run) for wall in walls])
+        run.total = len(jobs)
+        run.save(update_fields=["total"])
+    return run
+
+
+def start_project_design(project_num: str, worker_number: Optional[int] = None) -> ProjectDesignRun:
+    """
+    创建项目整体深化设计,事务提交后在后台线程中执行,立即返回
+    """
+    run = create_project_design_run(project_num, worker_number)
+    transaction.on_commit(partial(_start_project_thread, run.id))
+    return run
+
+
+def run_project_design(
+    run_id: int,
+    executor: Optional[ProcessPoolExecutor] = None,
+    batch_size: Optional[int] = None,
+    on_progress: Optional[Callable[[ProjectDesignRun], None]] = None,
+) -> ProjectDesignRun:
+    """
+    执行项目整体深化设计,阻塞至全部墙体计算完成。只计算排队中或计算中的任务,中断后可再次调用继续计算
+    :param run_id: 项目深化设计编号
+    :param executor: 进程池,为空时按 worker_number 创建专用进程池,未设置进程数时使用公共进程池
+    :param batch_size: 每批写入数据库的墙体数量,默认 settings.DESIGN_PROJECT_BATCH_SIZE
+    :param on_progress: 每批写入数据库后的回调
+    :return:
+    """
+    run = ProjectDesignRun.objects.get(id=run_id)
+    batch_size = batch_size or getattr(settings, "DESIGN_PROJECT_BATCH_SIZE", 50)
+    own_executor = None
+    if executor is None and run.worker_number:
+        executor = own_executor = _create_executor(run.worker_number)
+    # 公共进程池通过 submit_design_task 投递,计算进程异常退出后自动重建
+    submit = submit_design_task if executor is None else executor.submit
+    try:
+        _run_project_jobs(run, submit, _ProjectBatch(run, batch_size, on_progress))
+    except Exception:
+        message = format_exc()
+        _logger.error(f"项目深化设计异常终止: {run.id}\n{message}")
+        ProjectDesignRun.objects.filter(id=run.id).update(
+            status=ProjectDesignRun.STATUS_FAILED, message=message, finished_time=timezone.now()
+        )
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown(wait=True)
+    run.refresh_from_db()
+    return run
+
+
+def _start_project_thread(run_id: int):
+    thread = threading.Thread(
+        target=_run_project_design_in_thread, args=(run_id,), name=f"project-design-{run_id}", daemon=True
+    )
+    thread.start()
+
+
+def _run_project_design_in_thread(run_id: int):
+    close_old_connections()
+    try:
+        run_project_design(run_id)
+    except Exception:
+        _logger.exception(f"项目深化设计线程异常: {run_id}")
+    finally:
+        close_old_connections()
+
+
+def _run_project_jobs(run: ProjectDesignRun, submit: Callable[..., Future], batch: "_ProjectBatch"):
+    jobs = list(
+        run.jobs.select_related("wall").filter(
+            status__in=[WallDesignJob.STATUS_QUEUED, WallDesignJob.STATUS_RUNNING]
+        )
+    )
+    counts = run.jobs.aggregate(
+        total=Count("id"),
+        done=Count("id", filter=Q(status=WallDesignJob.STATUS_SUCCESS)),
+        failed=Count("id", filter=Q(status=WallDesignJob.STATUS_FAILED)),
+    )
+    now = timezone.now()
+    ProjectDesignRun.objects.filter(id=run.id).update(
+        status=ProjectDesignRun.STATUS_RUNNING, started_time=run.started_time or now, finished_time=None, **counts
+    )
+    run.refresh_from_db()
+
+    # 参数相同的墙体只计算一次
+    pending: Dict[str, Future] = {}
+    waiting: Dict[Future, List[Tuple[WallDesignJob, ShearWallID]]] = {}
+    for job in jobs:
+        try:
+            parameter = detailed_data_2_design(job.wall)
+            key = detailed_design_key(parameter)
+        except Exception:
+            batch.add_failed(job, format_exc())
+            continue
+        if key in pending:
+            waiting[pending[key]].append((job, parameter.shear_wall_id))
+            continue
+        cached = design_cache.get(key)
+        if cached is not None:
+            now_ts = time.time()
+            batch.add(job, cached.for_shear_wall(parameter.shear_wall_id), now_ts, now_ts)
+            continue
+        future = submit(run_detailed_design, parameter, truss=False)
+        pending[key] = future
+        waiting[future] = [(job, parameter.shear_wall_id)]
+
+    running = [job for items in waiting.values() for job, _ in items]
+    for job in running:
+        job.status = WallDesignJob.STATUS_RUNNING
+        job.started_time = now
+    WallDesignJob.objects.filter(id__in=[job.id for job in running]).update(
+        status=WallDesignJob.STATUS_RUNNING, started_time=now
+    )
+
+    keys = {future: key for key, future in pending.items()}
+    for future in as_completed(waiting):
+        try:
+            result, artifacts, started, finished = future.result()
+        except Exception:
+            message = format_exc()
+            for job, _ in waiting[future]:
+                batch.add_failed(job, message)
+            continue
+        cached = CachedDesign(result=result, artifacts=artifacts)
+        design_cache.put(keys[future], cached)
+        for job, shear_wall_id in waiting[future]:
+            batch.add(job, cached.for_shear_wall(shear_wall_id), started, finished)
+    batch.flush()
+
+    ProjectDesignRun.objects.filter(id=run.id).update(
+        status=ProjectDesignRun.STATUS_FINISHED, finished_time=timezone.now()
+    )
+
+
+class _ProjectBatch:
+    """
+    暂存计算完成的墙体,达到批量后在一个事务中写入结果、任务状态与项目进度
+    """
+
+    def __init__(
+        self,
+        run: ProjectDesignRun,
+        batch_size: int,
+        on_progress: Optional[Callable[[ProjectDesignRun], None]] = None,
+    ):
+        self.run = run
+        self.batch_size = max(batch_size, 1)
+        self.on_progress = on_progress
+        self._items: List[Tuple[WallDesignJob, Optional[CachedDesign], float, float, Optional[str]]] = []
+
+    def add(self, job: WallDesignJob, cached: CachedDesign, started: float, finished: float):
+        self._items.append((job, cached, started, finished, None))
+        if len(self._items) >= self.batch_size:
+            self.flush()
+
+    def add_failed(self, job: WallDesignJob, message: str):
+        now = time.time()
+        self._items.append((job, None, now, now, message))
+        if len(self._items) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._items:
+            return
+        saved: List[Tuple[WallDetailedResult, CachedDesign]] = []
+        done = failed = 0
+        with transaction.atomic():
+            for job, cached, started, finished, message in self._items:
+                if cached is not None:
+                    try:
+                        with transaction.atomic():
+                            job.result = detail_result_2_model_result(
+                                cached.result, job.wall, cached.artifacts.rebar_for_BVBS
+                            )
+                    except Exception:
+                        message = format_exc()
+                    else:
+                        job.status = WallDesignJob.STATUS_SUCCESS
+                        job.started_time = _from_timestamp(started)
+                        job.finished_time = _from_timestamp(finished)
+                        saved.append((job.result, cached))
+                        done += 1
+                        continue
+                _logger.error(f"深化设计任务失败: {job.id}\n{message}")
+                job.status = WallDesignJob.STATUS_FAILED
+                job.message = message
+                job.started_time = job.started_time or _from_timestamp(started)
+                job.finished_time = _from_timestamp(finished)
+                failed += 1
+            WallDesignJob.objects.bulk_update(
+                [item[0] for item in self._items], ["result", "status", "message", "started_time", "finished_time"]
+            )
+            ProjectDesignRun.objects.filter(id=self.run.id).update(done=F("done") + done, failed=F("failed") + failed)
+        self._items = []
+
+        for result_orm, cached in saved:
+            submit_artifact_export(result_orm, cached.result, cached.artifacts)
+        self.run.refresh_from_db(fields=["status", "total", "done", "failed", "started_time", "finished_time"])
+        if self.on_progress is not None:
+            self.on_progress(self.run)
+
+
+def _mark_failed(job: WallDesignJob, message: str):
+    _logger.error(f"深化设计任务失败: {job.id}\n{message}")
+    now = timezone.now()
+    job.status = WallDesignJob.STATUS_FAILED
+    job.message = message
+    job.started_time = job.started_time or now
+    job.finished_time = now
+    job.save(update_fields=["status", "message", "started_time", "finished_time"])
+
+
+def _from_timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
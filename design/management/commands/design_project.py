@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from design.jobs import create_project_design_run, run_project_design, shutdown_design_executor
+from design.models import ProjectDesignRun
+
+
+class Command(BaseCommand):
+    help = "深化设计项目下的全部墙体"
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_num", nargs="?", help="项目编号")
+        parser.add_argument("--workers", type=int, default=None, help="计算进程数,默认使用公共进程池")
+        parser.add_argument("--batch-size", type=int, default=None, help="每批写入数据库的墙体数量")
+        parser.add_argument("--resume", type=int, default=None, help="继续执行中断的项目深化设计(编号)")
+
+    def handle(self, *args, **options):
+        if options["resume"] is not None:
+            if not ProjectDesignRun.objects.filter(id=options["resume"]).exists():
+                raise CommandError(f"项目深化设计不存在:{options['resume']}")
+            run_id = options["resume"]
+        elif options["project_num"]:
+            run = create_project_design_run(options["project_num"], options["workers"])
+            self.stdout.write(f"项目 {run.project_num} 共 {run.total} 个墙体,编号 {run.id}")
+            run_id = run.id
+        else:
+            raise CommandError("需要项目编号或 --resume")
+
+        try:
+            run = run_project_design(run_id, batch_size=options["batch_size"], on_progress=self._progress)
+        finally:
+            # 等待深化设计文件生成完成
+            shutdown_design_executor(wait=True)
+        if run.status == ProjectDesignRun.STATUS_FAILED:
+            raise CommandError(run.message)
+        self.stdout.write(
+            self.style.SUCCESS(f"完成:成功 {run.done},失败 {run.failed},耗时 {run.elapsed_seconds:.1f}s")
+        )
+
+    def _progress(self, run: ProjectDesignRun):
+        eta = run.eta_seconds
+        self.stdout.write(
+            f"{run.finished_number}/{run.total} 成功 {run.done} 失败 {run.failed}"
+            + (f" 预计剩余 {eta:.0f}s" if eta is not None else "")
+        )
@@ -0,0 +1,57 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DoubleWallDesign.models import DetailedDesign
+from DoubleWallDesign.sweep import parse_range, run_sweep, sweep_points, write_sweep_csv
+from design.exchange.detailed import detailed_data_2_design
+from design.models import WallDetailedData
+
+
+class Command(BaseCommand):
+    help = "标准墙型参数扫描,结果写入 csv"
+
+    def add_arguments(self, parser):
+        base = parser.add_mutually_exclusive_group(required=True)
+        base.add_argument("--base", help="基准深化设计参数 json 文件")
+        base.add_argument("--wall", type=int, help="以该深化设计数据(编号)为基准")
+        parser.add_argument("--lengths", help='墙长,如 "1800:3000:300" 或 "1950,2400"')
+        parser.add_argument("--heights", help="墙高")
+        parser.add_argument("--thicknesses", help="墙厚")
+        parser.add_argument("--rebar-ratios", help="配筋率,按自动配筋计算")
+        parser.add_argument("--workers", type=int, default=None, help="计算进程数,0 表示在当前进程中计算")
+        parser.add_argument("--chunksize", type=int, default=8, help="每次分发给计算进程的组合数量")
+        parser.add_argument("-o", "--output", default="-", help="csv 文件,默认输出到标准输出")
+
+    def handle(self, *args, **options):
+        try:
+            base = self._base(options)
+            points = sweep_points(
+                base,
+                lengths=parse_range(options["lengths"]) if options["lengths"] else None,
+                heights=parse_range(options["heights"]) if options["heights"] else None,
+                thicknesses=parse_range(options["thicknesses"]) if options["thicknesses"] else None,
+                rebar_ratios=parse_range(options["rebar_ratios"]) if options["rebar_ratios"] else None,
+            )
+        except (OSError, ValueError, AssertionError) as e:
+            raise CommandError(e)
+        self.stderr.write(f"共 {len(points)} 个组合")
+
+        rows = run_sweep(points, processes=options["workers"], chunksize=options["chunksize"])
+        if options["output"] == "-":
+            number = write_sweep_csv(rows, sys.stdout)
+        else:
+            with open(options["output"], "w", newline="", encoding="utf-8") as f:
+                number = write_sweep_csv(rows, f)
+        self.stderr.write(self.style.SUCCESS(f"完成:{number} 行"))
+
+    @staticmethod
+    def _base(options) -> DetailedDesign:
+        if options["base"]:
+            with open(options["base"], encoding="utf-8") as f:
+                return DetailedDesign(**json.load(f))
+        row = WallDetailedData.objects.filter(id=options["wall"]).first()
+        if row is None:
+            raise CommandError(f"深化设计数据不存在:{options['wall']}")
+        return detailed_data_2_design(row)
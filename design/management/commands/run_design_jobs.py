@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from design.jobs import requeue_running_jobs, submit_queued_jobs, shutdown_design_executor
+
+
+class Command(BaseCommand):
+    help = "执行排队中的深化设计任务"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="执行完当前排队任务后退出")
+        parser.add_argument("--interval", type=float, default=2.0, help="轮询间隔(秒)")
+        parser.add_argument(
+            "--requeue-running",
+            action="store_true",
+            help="启动时将计算中的任务重新排队,仅在确认没有其他进程(包括 web 进程)正在执行任务时使用",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_running"]:
+            number = requeue_running_jobs()
+            if number:
+                self.stdout.write(f"已将 {number} 个未完成的深化设计任务重新排队")
+        try:
+            while True:
+                number = submit_queued_jobs()
+                if number:
+                    self.stdout.write(f"已投递 {number} 个深化设计任务")
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        finally:
+            # 等待已投递的任务及其回调执行完成
+            shutdown_design_executor(wait=True)
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "design",
+            "0008_rename_horizontal_rebar_ratio_walldetaileddata_horizontal_rebars_ratio_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WallDesignJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "排队中"),
+                            ("running", "计算中"),
+                            ("success", "成功"),
+                            ("failed", "失败"),
+                        ],
+                        db_index=True,
+                        default="queued",
+                        max_length=16,
+                        verbose_name="任务状态",
+                    ),
+                ),
+                (
+                    "message",
+                    models.TextField(blank=True, null=True, verbose_name="错误信息"),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="提交时间"),
+                ),
+                (
+                    "started_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="开始时间"
+                    ),
+                ),
+                (
+                    "finished_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="结束时间"
+                    ),
+                ),
+                (
+                    "result",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="design.walldetailedresult",
+                        verbose_name="计算结果",
+                    ),
+                ),
+                (
+                    "wall",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="design_jobs",
+                        to="design.walldetaileddata",
+                        verbose_name="关联参数",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "深化设计任务",
+                "verbose_name_plural": "深化设计任务",
+                "ordering": ["-id"],
+            },
+        ),
+    ]
@@ -0,0 +1,180 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:45
+
+import json
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+_REBAR_DIAM_SPAC = re.compile(r"RebarDiamSpac\(diameter=(\d+), spacing=(\d+)\)")
+
+
+def _repr_2_json(text):
+    """
+    "[RebarDiamSpac(diameter=8, spacing=200)]" -> '[{"diameter": 8, "spacing": 200}]'
+    """
+    if not text:
+        return None
+    rebars = [
+        {"diameter": int(diameter), "spacing": int(spacing)}
+        for diameter, spacing in _REBAR_DIAM_SPAC.findall(text)
+    ]
+    return json.dumps(rebars)
+
+
+def _json_2_repr(text):
+    if not text:
+        return None
+    rebars = json.loads(text)
+    items = ", ".join(
+        f"RebarDiamSpac(diameter={rebar['diameter']}, spacing={rebar['spacing']})"
+        for rebar in rebars
+    )
+    return f"[{items}]"
+
+
+def _convert_rebars(apps, convert):
+    WallDetailedResult = apps.get_model("design", "WallDetailedResult")
+    for row in WallDetailedResult.objects.all().only(
+        "horizontal_rebars", "vertical_rebars"
+    ):
+        row.horizontal_rebars = convert(row.horizontal_rebars)
+        row.vertical_rebars = convert(row.vertical_rebars)
+        row.save(update_fields=["horizontal_rebars", "vertical_rebars"])
+
+
+def rebars_repr_2_json(apps, schema_editor):
+    _convert_rebars(apps, _repr_2_json)
+
+
+def rebars_json_2_repr(apps, schema_editor):
+    _convert_rebars(apps, _json_2_repr)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("design", "0009_walldesignjob"),
+    ]
+
+    operations = [
+        # 原有数据为 python repr 文本,先转换为 json 文本再修改字段类型
+        migrations.RunPython(rebars_repr_2_json, rebars_json_2_repr),
+        migrations.AlterField(
+            model_name="walldetaileddata",
+            name="project_num",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="下层结构计算需要该参数",
+                max_length=32,
+                null=True,
+                verbose_name="项目编号",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="walldetailedresult",
+            name="area",
+            field=models.FloatField(db_index=True, null=True, verbose_name="面积"),
+        ),
+        migrations.AlterField(
+            model_name="walldetailedresult",
+            name="horizontal_rebars",
+            field=models.JSONField(
+                blank=True,
+                help_text='[{"diameter": 8, "spacing": 200}, ...]',
+                null=True,
+                verbose_name="水平钢筋",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="walldetailedresult",
+            name="vertical_rebars",
+            field=models.JSONField(
+                blank=True,
+                help_text='[{"diameter": 8, "spacing": 200}, ...]',
+                null=True,
+                verbose_name="竖向钢筋",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="walldetailedresult",
+            name="volume",
+            field=models.FloatField(db_index=True, null=True, verbose_name="体积"),
+        ),
+        migrations.AlterField(
+            model_name="walldetailedresult",
+            name="wall",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="results",
+                to="design.walldetaileddata",
+                verbose_name="关联参数",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="walldetailedresult",
+            name="weight",
+            field=models.FloatField(db_index=True, null=True, verbose_name="重量"),
+        ),
+        migrations.CreateModel(
+            name="WallRebarQuantity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "direction",
+                    models.CharField(
+                        choices=[("horizontal", "水平钢筋"), ("vertical", "竖向钢筋")],
+                        max_length=16,
+                        verbose_name="钢筋方向",
+                    ),
+                ),
+                (
+                    "mark",
+                    models.IntegerField(blank=True, null=True, verbose_name="钢筋编号"),
+                ),
+                (
+                    "grade",
+                    models.CharField(
+                        blank=True, max_length=32, null=True, verbose_name="钢筋等级"
+                    ),
+                ),
+                (
+                    "diameter",
+                    models.IntegerField(db_index=True, verbose_name="钢筋直径 (mm)"),
+                ),
+                ("length", models.FloatField(verbose_name="单根长度 (mm)")),
+                ("quantity", models.IntegerField(verbose_name="数量")),
+                ("weight", models.FloatField(verbose_name="总重量 (kg)")),
+                (
+                    "result",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rebar_quantities",
+                        to="design.walldetailedresult",
+                        verbose_name="深化设计结果",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "深化设计结果-钢筋用量",
+                "verbose_name_plural": "深化设计结果-钢筋用量",
+                "indexes": [
+                    models.Index(
+                        fields=["result", "diameter"],
+                        name="design_wall_result__5710d0_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("design", "0010_walldetailedresult_json_rebars"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WallDesignArtifact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("ifc", "IFC 模型"),
+                            ("bvbs", "BVBS 加工数据"),
+                            ("dxf", "DXF 图纸"),
+                        ],
+                        max_length=16,
+                        verbose_name="文件类型",
+                    ),
+                ),
+                (
+                    "sha256",
+                    models.CharField(
+                        db_index=True, max_length=64, verbose_name="内容哈希"
+                    ),
+                ),
+                ("size", models.BigIntegerField(verbose_name="文件大小 (byte)")),
+                (
+                    "gzip_size",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="压缩后大小 (byte)"
+                    ),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now=True, verbose_name="生成时间"),
+                ),
+                (
+                    "result",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="artifacts",
+                        to="design.walldetailedresult",
+                        verbose_name="深化设计结果",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "深化设计文件",
+                "verbose_name_plural": "深化设计文件",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="walldesignartifact",
+            constraint=models.UniqueConstraint(
+                fields=("result", "kind"), name="unique_design_artifact_kind"
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("design", "0011_walldesignartifact"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectDesignRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "project_num",
+                    models.CharField(
+                        db_index=True, max_length=32, verbose_name="项目编号"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "排队中"),
+                            ("running", "计算中"),
+                            ("finished", "已完成"),
+                            ("failed", "异常终止"),
+                        ],
+                        db_index=True,
+                        default="queued",
+                        max_length=16,
+                        verbose_name="状态",
+                    ),
+                ),
+                (
+                    "worker_number",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text="为空时使用公共进程池",
+                        null=True,
+                        verbose_name="计算进程数",
+                    ),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(default=0, verbose_name="墙体数量"),
+                ),
+                (
+                    "done",
+                    models.PositiveIntegerField(default=0, verbose_name="成功数量"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="失败数量"),
+                ),
+                (
+                    "message",
+                    models.TextField(blank=True, null=True, verbose_name="错误信息"),
+                ),
+                (
+                    "created_time",
+                    models.DateTimeField(auto_now_add=True, verbose_name="提交时间"),
+                ),
+                (
+                    "started_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="开始时间"
+                    ),
+                ),
+                (
+                    "finished_time",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="结束时间"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "项目深化设计",
+                "verbose_name_plural": "项目深化设计",
+                "ordering": ["-id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="walldesignjob",
+            name="project_run",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="jobs",
+                to="design.projectdesignrun",
+                verbose_name="项目深化设计",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+def remove_duplicate_results(apps, schema_editor):
+    """
+    每组参数只保留最新(id 最大)的结果;未关联参数的结果不受唯一约束限制,全部保留
+    """
+    WallDetailedResult = apps.get_model("design", "WallDetailedResult")
+    results = WallDetailedResult.objects.filter(wall__isnull=False)
+    latest = (
+        results.values("wall")
+        .annotate(latest_id=models.Max("id"))
+        .values_list("latest_id", flat=True)
+    )
+    results.exclude(id__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("design", "0012_projectdesignrun"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_results, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="walldetailedresult",
+            constraint=models.UniqueConstraint(
+                fields=("wall",), name="unique_wall_detailed_result"
+            ),
+        ),
+    ]
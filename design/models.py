@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from DoubleWallDesign.models import (
@@ -52,6 +53,7 @@ class WallDetailedData(models.Model):
         blank=True,
         max_length=32,
         help_text="下层结构计算需要该参数",
+        db_index=True,
     )
     shear_wall_num = models.CharField(
         verbose_name="剪力墙编号",
@@ -352,6 +354,45 @@ class WallDetailedData(models.Model):
         verbose_name_plural = verbose_name
 
 
+class WallDetailedResultQuerySet(models.QuerySet):
+    """
+    深化设计结果查询,工程量汇总均在数据库中完成
+    """
+
+    def for_project(self, project_num: str) -> "WallDetailedResultQuerySet":
+        """
+        指定项目下计算成功的结果
+        """
+        return self.filter(wall__project_num=project_num, success=True)
+
+    def concrete_totals(self) -> dict:
+        """
+        墙板数量、混凝土体积(m^3)、面积(m^2)、重量(T)合计
+        """
+        totals = self.aggregate(
+            wall_number=models.Count("id"),
+            volume=models.Sum("volume"),
+            area=models.Sum("area"),
+            weight=models.Sum("weight"),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+    def steel_by_diameter(self) -> models.QuerySet:
+        """
+        按钢筋直径汇总的钢筋数量、总长(mm)、重量(kg)
+        """
+        return (
+            WallRebarQuantity.objects.filter(result__in=self)
+            .values("diameter")
+            .annotate(
+                total_quantity=models.Sum("quantity"),
+                total_length=models.Sum(models.F("length") * models.F("quantity")),
+                total_weight=models.Sum("weight"),
+            )
+            .order_by("diameter")
+        )
+
+
 class WallDetailedResult(models.Model):
     """
     双皮剪力墙深化设计结果
@@ -359,6 +400,7 @@ class WallDetailedResult(models.Model):
     wall = models.ForeignKey(
         to=WallDetailedData,
         verbose_name="关联参数",
+        related_name="results",
         null=True,
         blank=True,
         on_delete=models.CASCADE,
@@ -369,18 +411,20 @@ class WallDetailedResult(models.Model):
     right_gap_length = models.FloatField(verbose_name="右边间隙 (mm)", null=True)
     interior_length = models.FloatField(verbose_name="内墙长度 (mm)", null=True)
     exterior_length = models.FloatField(verbose_name="外墙长度 (mm)", null=True)
-    volume = models.FloatField(verbose_name="体积", null=True)
-    area = models.FloatField(verbose_name="面积", null=True)
-    weight = models.FloatField(verbose_name="重量", null=True)
-    horizontal_rebars = models.TextField(
+    volume = models.FloatField(verbose_name="体积", null=True, db_index=True)
+    area = models.FloatField(verbose_name="面积", null=True, db_index=True)
+    weight = models.FloatField(verbose_name="重量", null=True, db_index=True)
+    horizontal_rebars = models.JSONField(
         verbose_name="水平钢筋",
         null=True,
         blank=True,
+        help_text='[{"diameter": 8, "spacing": 200}, ...]',
     )
-    vertical_rebars = models.TextField(
+    vertical_rebars = models.JSONField(
         verbose_name="竖向钢筋",
         null=True,
         blank=True,
+        help_text='[{"diameter": 8, "spacing": 200}, ...]',
     )
 
     # 调用状态
@@ -395,9 +439,81 @@ class WallDetailedResult(models.Model):
         max_length=256,
     )
 
+    objects = WallDetailedResultQuerySet.as_manager()
+
     class Meta:
         verbose_name = "深化设计结果"
         verbose_name_plural = verbose_name
+        constraints = [
+            # 每组参数只保留一个结果,重新计算时覆盖(detail_result_2_model_result)
+            models.UniqueConstraint(fields=["wall"], name="unique_wall_detailed_result"),
+        ]
+
+
+class WallRebarQuantity(models.Model):
+    """
+    深化设计结果的钢筋用量,由 BVBS 钢筋数据生成,每种钢筋(编号)一行
+    """
+    DIRECTION_HORIZONTAL = "horizontal"
+    DIRECTION_VERTICAL = "vertical"
+    DIRECTION_CHOICE = (
+        (DIRECTION_HORIZONTAL, "水平钢筋"),
+        (DIRECTION_VERTICAL, "竖向钢筋"),
+    )
+
+    result = models.ForeignKey(
+        to=WallDetailedResult,
+        verbose_name="深化设计结果",
+        related_name="rebar_quantities",
+        on_delete=models.CASCADE,
+    )
+    direction = models.CharField(verbose_name="钢筋方向", choices=DIRECTION_CHOICE, max_length=16)
+    mark = models.IntegerField(verbose_name="钢筋编号", null=True, blank=True)
+    grade = models.CharField(verbose_name="钢筋等级", max_length=32, null=True, blank=True)
+    diameter = models.IntegerField(verbose_name="钢筋直径 (mm)", db_index=True)
+    length = models.FloatField(verbose_name="单根长度 (mm)")
+    quantity = models.IntegerField(verbose_name="数量")
+    weight = models.FloatField(verbose_name="总重量 (kg)")
+
+    class Meta:
+        verbose_name = "深化设计结果-钢筋用量"
+        verbose_name_plural = verbose_name
+        indexes = [models.Index(fields=["result", "diameter"])]
+
+
+class WallDesignArtifact(models.Model):
+    """
+    深化设计生成的文件(IFC/BVBS/DXF)
+
+    文件按内容哈希保存在 settings.DESIGN_ARTIFACT_ROOT 下,内容相同的文件只保存一份
+    """
+    KIND_IFC = "ifc"
+    KIND_BVBS = "bvbs"
+    KIND_DXF = "dxf"
+    KIND_CHOICE = (
+        (KIND_IFC, "IFC 模型"),
+        (KIND_BVBS, "BVBS 加工数据"),
+        (KIND_DXF, "DXF 图纸"),
+    )
+
+    result = models.ForeignKey(
+        to=WallDetailedResult,
+        verbose_name="深化设计结果",
+        related_name="artifacts",
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(verbose_name="文件类型", choices=KIND_CHOICE, max_length=16)
+    sha256 = models.CharField(verbose_name="内容哈希", max_length=64, db_index=True)
+    size = models.BigIntegerField(verbose_name="文件大小 (byte)")
+    gzip_size = models.BigIntegerField(verbose_name="压缩后大小 (byte)", null=True, blank=True)
+    created_time = models.DateTimeField(verbose_name="生成时间", auto_now=True)
+
+    class Meta:
+        verbose_name = "深化设计文件"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=["result", "kind"], name="unique_design_artifact_kind"),
+        ]
 
 
 class DetailDataCopyChangeWrite(models.Model):
@@ -409,4 +525,148 @@ class DetailDataCopyChangeWrite(models.Model):
 
     class Meta:
         verbose_name = "深化设计-参数修改"
-        verbose_name_plural = verbose_name
\ No newline at end of file
+        verbose_name_plural = verbose_name
+
+class WallDesignJob(models.Model):
+    """
+    双皮剪力墙深化设计后台任务
+
+    保存参数时仅入队,由本地进程池执行深化设计,避免阻塞 web 请求
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCESS = "success"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICE = (
+        (STATUS_QUEUED, "排队中"),
+        (STATUS_RUNNING, "计算中"),
+        (STATUS_SUCCESS, "成功"),
+        (STATUS_FAILED, "失败"),
+    )
+
+    wall = models.ForeignKey(
+        to=WallDetailedData,
+        verbose_name="关联参数",
+        related_name="design_jobs",
+        on_delete=models.CASCADE,
+    )
+    result = models.ForeignKey(
+        to=WallDetailedResult,
+        verbose_name="计算结果",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    project_run = models.ForeignKey(
+        to="ProjectDesignRun",
+        verbose_name="项目深化设计",
+        related_name="jobs",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    status = models.CharField(
+        verbose_name="任务状态",
+        choices=STATUS_CHOICE,
+        default=STATUS_QUEUED,
+        max_length=16,
+        db_index=True,
+    )
+    message = models.TextField(verbose_name="错误信息", null=True, blank=True)
+    created_time = models.DateTimeField(verbose_name="提交时间", auto_now_add=True)
+    started_time = models.DateTimeField(verbose_name="开始时间", null=True, blank=True)
+    finished_time = models.DateTimeField(verbose_name="结束时间", null=True, blank=True)
+
+    @property
+    def wait_seconds(self):
+        """
+        排队等待时长(秒)
+        """
+        if self.started_time is None:
+            return None
+        return (self.started_time - self.created_time).total_seconds()
+
+    @property
+    def run_seconds(self):
+        """
+        深化设计计算时长(秒)
+        """
+        if self.started_time is None or self.finished_time is None:
+            return None
+        return (self.finished_time - self.started_time).total_seconds()
+
+    class Meta:
+        verbose_name = "深化设计任务"
+        verbose_name_plural = verbose_name
+        ordering = ["-id"]
+
+
+class ProjectDesignRun(models.Model):
+    """
+    项目整体深化设计
+
+    项目下的全部墙体在进程池中并行计算,结果分批写入数据库,并记录进度
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_FINISHED = "finished"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICE = (
+        (STATUS_QUEUED, "排队中"),
+        (STATUS_RUNNING, "计算中"),
+        (STATUS_FINISHED, "已完成"),
+        (STATUS_FAILED, "异常终止"),
+    )
+
+    project_num = models.CharField(verbose_name="项目编号", max_length=32, db_index=True)
+    status = models.CharField(
+        verbose_name="状态",
+        choices=STATUS_CHOICE,
+        default=STATUS_QUEUED,
+        max_length=16,
+        db_index=True,
+    )
+    worker_number = models.PositiveIntegerField(
+        verbose_name="计算进程数", null=True, blank=True, help_text="为空时使用公共进程池"
+    )
+    total = models.PositiveIntegerField(verbose_name="墙体数量", default=0)
+    done = models.PositiveIntegerField(verbose_name="成功数量", default=0)
+    failed = models.PositiveIntegerField(verbose_name="失败数量", default=0)
+    message = models.TextField(verbose_name="错误信息", null=True, blank=True)
+    created_time = models.DateTimeField(verbose_name="提交时间", auto_now_add=True)
+    started_time = models.DateTimeField(verbose_name="开始时间", null=True, blank=True)
+    finished_time = models.DateTimeField(verbose_name="结束时间", null=True, blank=True)
+
+    @property
+    def finished_number(self) -> int:
+        return self.done + self.failed
+
+    @property
+    def progress(self) -> float:
+        """
+        完成比例 0~1
+        """
+        if self.total == 0:
+            return 1.0 if self.status == self.STATUS_FINISHED else 0.0
+        return self.finished_number / self.total
+
+    @property
+    def elapsed_seconds(self):
+        if self.started_time is None:
+            return None
+        end = self.finished_time or timezone.now()
+        return (end - self.started_time).total_seconds()
+
+    @property
+    def eta_seconds(self):
+        """
+        按已完成墙体的平均耗时估算的剩余时长(秒)
+        """
+        if self.status != self.STATUS_RUNNING or self.finished_number == 0:
+            return None
+        return self.elapsed_seconds / self.finished_number * (self.total - self.finished_number)
+
+    class Meta:
+        verbose_name = "项目深化设计"
+        verbose_name_plural = verbose_name
+        ordering = ["-id"]
@@ -1,3 +1,1214 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+from unittest import mock
+
+import fcl
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from DoubleWallDesign.models import (
+    CastInsertsDesignMode,
+    DetailedDesign,
+    LiftingInsertsDesignMode,
+    LiftingInsertsPosition,
+    OtherInserts,
+    RebarDesignMode,
+    RectangleHole,
+    ShearWallID,
+    ShearWallType,
+    SupportInsertsDesignMode,
+    SupportInsertsPosition,
+    TrussRebarMode,
+    WallHole,
+    WallHoleType,
+    WallLengthType,
+)
+from converter_dataclass import dataclass_with_converter, field_with_converter
+from dc_rebar import Direction, IndexedPolyCurve, Point3D, PointArray, Rebar
+from DoubleWallDesign import instrumentation
+from DoubleWallDesign.codec import CodecError, decode, encode
+from DoubleWallDesign.detailed_design import detailed_design, detailed_design_many
+from DoubleWallDesign.pipeline import DesignPipeline, canonical
+from DoubleWallDesign.session import DesignSession
+from DoubleWallDesign.sweep import SWEEP_COLUMNS, parse_range, run_sweep, sweep_points, write_sweep_csv
+from RebarLayout.layout_opt import (
+    TrussCollisionChecker,
+    TrussLayoutProblem,
+    layout_opt,
+    truss_fitness,
+    truss_fitness_batch,
+    truss_layout_problem,
+)
+from RebarLayout.collision_detection import ShearWallFCLModel
+from RebarLayout.Rebar_layout import APF
+from RebarLayout.fcl_models import Agent, Box_fcl, Cylinder_fcl, Diagonal_fcl, Rebar_fcl
+from RebarLayout.tools import rotation_matrix_from_vectors
+from RebarLayout.inserts_layout import InsertsLayout, place_inserts
+from RebarLayout.tools import rebar_opt, rebar_opt_batch, rebar_pareto, rebar_pareto_batch
+from design.artifacts import artifact_path, artifact_temp_dir, store_artifact
+from design.cache import CachedDesign, DesignResultCache, design_cache, detailed_design_key
+from design.exchange.detailed import (
+    DETAILED_DATA_FIELDS,
+    DetailedDataSerializer,
+    detail_result_2_model_result,
+    detail_result_summary,
+    detailed_data_2_design,
+    detailed_data_2_dict,
+)
+from design.jobs import (
+    create_project_design_run,
+    get_design_executor,
+    requeue_running_jobs,
+    run_project_design,
+    shutdown_design_executor,
+    submit_design_job,
+    submit_design_task,
+)
+from design.models import ProjectDesignRun, WallDesignJob, WallDetailedData, WallDetailedResult
+from design.workers import export_design_artifacts, run_detailed_design
+
 
 # Create your tests here.
+def detailed_design_payload() -> dict:
+    """
+    可直接计算的深化设计参数(json 格式),与根目录 tests.py 中的算例一致
+    """
+    return {
+        "shear_wall_id": {"project_ID": "CZ1", "shear_wall_ID": "WSPQ-1928-12"},
+        "material": {"rebar_name": "HRB400", "concrete_grade": 60},
+        "construction_detailed": {"concrete_cover_thickness": 15},
+        "geometric_detailed": {
+            "shear_wall_type": 0,
+            "length": 1950,
+            "height": 2800,
+            "thickness": 250,
+            "interior_thickness": 50,
+            "exterior_thickness": 50,
+            "bottom_gap_height": 50,
+            "top_gap_height": 160,
+            "wall_length_type": 0,
+            "left_gap_length": 0,
+            "right_gap_length": 0,
+            "wall_hole": 1,
+            "wall_hole_type": 1,
+            "wall_hole_parameter": {
+                "hole_height": 200,
+                "hole_length": 200,
+                "hole_horizontal": 1000,
+                "hole_vertical": 1400,
+            },
+        },
+        "rebar_detailed": {
+            "rebar_design_mode": 1,
+            "horizontal_rebars": [{"diameter": 8, "spacing": 200}, {"diameter": 10, "spacing": 200}],
+            "vertical_rebars": [{"diameter": 8, "spacing": 200}, {"diameter": 10, "spacing": 200}],
+            "horizontal_rebars_ratio": 0.3,
+            "vertical_rebars_ratio": 0.3,
+        },
+        "truss_detailed": {
+            "truss_rebar_mode": 1,
+            "material_name": "HPB300",
+            "top_rebar": {"diameter": 10},
+            "bottom_rebar": {"diameter": 8},
+            "diagonal_rebar": {"diameter": 6, "spacing": 200},
+            "height": 200,
+            "width": 100,
+            "truss_number": 6,
+        },
+        "inserts_detailed": {
+            "lifting_inserts_design_mode": 1,
+            "support_inserts_design_mode": 1,
+            "cast_inserts_design_mode": 1,
+            "cast_inserts_number": {"left_number": 6, "right_number": 6, "top_number": 0, "bottom_number": 0},
+            "other_inserts": 1,
+            "lifting_inserts_diameter": 16,
+            "lifting_inserts_position": {"x1": 412, "x2": 1560},
+            "support_inserts_parameter": 30,
+            "support_inserts_position": {"x1": 350, "x2": 1600, "y1": 150, "y2": 2000},
+            "other_inserts_number": 1,
+            "other_inserts_parameters": [10],
+            "other_inserts_positions": [[350, 150]],
+        },
+    }
+
+
+# 可直接计算的 WallDetailedData 表数据
+WALL_DETAILED_DATA = dict(
+    project_num="CZ1",
+    shear_wall_num="WSPQ-1928-12",
+    rebar_name="HRB400",
+    concrete_grade=30,
+    protective_layer_thickness=15,
+    shear_wall_type=ShearWallType.EXTERIOR.value,
+    wall_length_type=WallLengthType.NO.value,
+    length=1950,
+    thickness=250,
+    height=2800,
+    interior_thickness=50,
+    exterior_thickness=50,
+    bottom_gap_height=50,
+    top_gap_height=160,
+    left_gap_length=0,
+    right_gap_length=0,
+    wall_hole=WallHole.YES.value,
+    wall_hole_type=WallHoleType.RECTANGLE.value,
+    rectangle_hole_height=200,
+    rectangle_hole_length=200,
+    rectangle_hole_horizontal=1000,
+    rectangle_hole_vertical=1400,
+    rebar_design_mode=RebarDesignMode.AUTOMATIC.value,
+    horizontal_rebars_ratio=0.3,
+    vertical_rebars_ratio=0.3,
+    truss_rebar_mode=TrussRebarMode.MANUAL.value,
+    truss_height=200,
+    truss_width=100,
+    truss_number=6,
+    truss_top_rebar_diameter=10,
+    truss_bottom_rebar_diameter=8,
+    diagonal_rebar_diameter=6,
+    diagonal_rebar_spacing=200,
+    lifting_inserts_design_mode=LiftingInsertsDesignMode.MANUAL.value,
+    lifting_inserts_diameter=16,
+    lifting_inserts_position_x1=412,
+    lifting_inserts_position_x2=1560,
+    support_inserts_design_mode=SupportInsertsDesignMode.MANUAL.value,
+    support_inserts_hole_diameter=30,
+    support_inserts_position_x1=350,
+    support_inserts_position_x2=1600,
+    support_inserts_position_y1=150,
+    support_inserts_position_y2=2000,
+    cast_inserts_design_mode=CastInsertsDesignMode.MANUAL.value,
+    cast_inserts_left_number=6,
+    cast_inserts_right_number=6,
+    cast_inserts_top_number=0,
+    cast_inserts_bottom_number=0,
+    other_inserts=OtherInserts.YES.value,
+    other_inserts_number=1,
+    other_inserts_parameters="10",
+    other_inserts_positions="[350, 150]",
+)
+
+
+class TestBulkDetailedDesign(TestCase):
+    def setUp(self):
+        design_cache.clear()
+        self.client.force_login(User.objects.create_user("designer"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_design_executor()
+        super().tearDownClass()
+
+    def test_stream_with_item_error(self):
+        bad = detailed_design_payload()
+        bad["geometric_detailed"].pop("length")
+        response = self.client.post(
+            reverse("design:detailed-bulk"),
+            data=[detailed_design_payload(), bad, detailed_design_payload()],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        lines = {line["index"]: line for line in lines}
+
+        self.assertEqual(sorted(lines), [0, 1, 2])
+        self.assertFalse(lines[1]["success"])
+        for index in (0, 2):
+            self.assertTrue(lines[index]["success"], lines[index])
+            self.assertNotIn("detailed_design", lines[index]["result"])
+            self.assertGreater(lines[index]["result"]["volume"], 0)
+        # 相同参数只计算一次
+        self.assertEqual(sorted(lines[index]["cached"] for index in (0, 2)), [False, True])
+        self.assertEqual(len(design_cache), 1)
+
+    def _post_two_walls(self, outcomes: list) -> dict:
+        no_hole = detailed_design_payload()
+        no_hole["geometric_detailed"].update(wall_hole=WallHole.NO.value, wall_hole_parameter=None)
+
+        def submit(fn, *args, **kwargs):
+            outcome, future = outcomes.pop(0), Future()
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            elif outcome == "submit":
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            else:
+                future.set_result(fn(*args, **kwargs))
+            return future
+
+        with mock.patch("design.views.submit_design_task", side_effect=submit):
+            response = self.client.post(
+                reverse("design:detailed-bulk"),
+                data=[detailed_design_payload(), no_hole],
+                content_type="application/json",
+            )
+            lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(outcomes, [])
+        return {line["index"]: line for line in lines}
+
+    def test_submit_error(self):
+        lines = self._post_two_walls(["submit", "run"])
+        self.assertEqual(sorted(lines), [0, 1])
+        self.assertFalse(lines[0]["success"])
+        self.assertIn("shutdown", lines[0]["error"])
+        self.assertTrue(lines[1]["success"])
+
+    def test_worker_crash(self):
+        # 第 0 项使计算进程退出,进程池内未完成的第 1 项重新计算后成功
+        crashed = BrokenProcessPool("crashed")
+        lines = self._post_two_walls([crashed, crashed, crashed, "run"])
+        self.assertEqual(sorted(lines), [0, 1])
+        self.assertFalse(lines[0]["success"])
+        self.assertIn("BrokenProcessPool", lines[0]["error"])
+        self.assertTrue(lines[1]["success"])
+
+    def test_wall_hole(self):
+        geometric = DetailedDesign(**detailed_design_payload()).geometric_detailed
+        self.assertIs(geometric.wall_hole, WallHole.YES)
+        self.assertIs(geometric.wall_hole_type, WallHoleType.RECTANGLE)
+        self.assertIs(geometric.shear_wall_type, ShearWallType.EXTERIOR)
+        self.assertIs(geometric.wall_length_type, WallLengthType.NO)
+        self.assertIsInstance(geometric.wall_hole_parameter, RectangleHole)
+
+        no_hole = detailed_design_payload()
+        no_hole["geometric_detailed"].update(wall_hole=WallHole.NO.value, wall_hole_parameter=None)
+        response = self.client.post(
+            reverse("design:detailed-bulk"),
+            data=[detailed_design_payload(), no_hole],
+            content_type="application/json",
+        )
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        volumes = {line["index"]: line["result"]["volume"] for line in lines}
+        # 200x200 的洞口贯穿内外页
+        self.assertAlmostEqual(volumes[1] - volumes[0], 0.2 * 0.2 * (0.05 + 0.05), places=6)
+
+    def test_reject_non_list(self):
+        response = self.client.post(
+            reverse("design:detailed-bulk"),
+            data=detailed_design_payload(),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(DESIGN_BULK_MAX_ITEMS=2)
+    def test_reject_too_many(self):
+        response = self.client.post(
+            reverse("design:detailed-bulk"),
+            data=[detailed_design_payload()] * 3,
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_require_login(self):
+        self.client.logout()
+        response = self.client.post(
+            reverse("design:detailed-bulk"),
+            data=[detailed_design_payload()],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class TestDesignResultCache(TestCase):
+    def test_key_ignore_shear_wall_id(self):
+        first = DetailedDesign(**detailed_design_payload())
+        other = detailed_design_payload()
+        other["shear_wall_id"]["shear_wall_ID"] = "WSPQ-1928-13"
+        second = DetailedDesign(**other)
+        self.assertEqual(detailed_design_key(first), detailed_design_key(second))
+
+        other["construction_detailed"]["concrete_cover_thickness"] = 16
+        self.assertNotEqual(detailed_design_key(first), detailed_design_key(DetailedDesign(**other)))
+
+    def test_lru_and_counter(self):
+        cache = DesignResultCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # 淘汰最久未使用的 b
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats(), dict(size=2, maxsize=2, hits=2, misses=1))
+
+    def test_for_shear_wall(self):
+        result, artifacts, _, _ = run_detailed_design(DetailedDesign(**detailed_design_payload()))
+        cached = CachedDesign(result=result, artifacts=artifacts)
+        shear_wall_id = ShearWallID(project_ID="CZ2", shear_wall_ID="WSPQ-1")
+        other = cached.for_shear_wall(shear_wall_id)
+
+        self.assertEqual(other.result.detailed_design.shear_wall_id, shear_wall_id)
+        self.assertEqual(other.result.volume, result.volume)
+        self.assertTrue(all(rebar.project_ID == "CZ2" for rebar in other.artifacts.rebar_for_BVBS.horizontal_rebars))
+        # 缓存中的原结果不受影响
+        self.assertEqual(result.detailed_design.shear_wall_id.project_ID, "CZ1")
+        self.assertTrue(all(rebar.project_ID == "CZ1" for rebar in artifacts.rebar_for_BVBS.horizontal_rebars))
+
+
+class TestDesignPipeline(TestCase):
+    def test_same_as_full_run(self):
+        parameter = DetailedDesign(**detailed_design_payload())
+        pipeline = DesignPipeline()
+        pipeline.run(DetailedDesign(**detailed_design_payload()))
+        cached = detailed_design(parameter, pipeline=pipeline)
+        full = detailed_design(DetailedDesign(**detailed_design_payload()))
+        for first, second in zip(cached[:4], full[:4]):
+            self.assertEqual(canonical(first), canonical(second))
+
+    def test_reuse_stages(self):
+        pipeline = DesignPipeline()
+        first = pipeline.run(DetailedDesign(**detailed_design_payload()))
+        self.assertEqual(first.reused, [])
+
+        payload = detailed_design_payload()
+        payload["inserts_detailed"]["lifting_inserts_diameter"] = 20  # 预埋件只影响预埋件定位与桁架排布
+        run = pipeline.run(DetailedDesign(**payload))
+        self.assertIn("fcl_model", run.reused)
+        self.assertEqual(run.computed, ["inserts", "result", "truss_layout", "truss_rebars", "rebar_data"])
+        self.assertEqual(run.outputs["result"].detailed_design.inserts_detailed.lifting_inserts_diameter, 20)
+
+        payload["truss_detailed"]["diagonal_rebar"]["spacing"] = 100  # 只重新计算桁架相关阶段
+        run = pipeline.run(DetailedDesign(**payload))
+        self.assertIn("fcl_model", run.reused)
+        self.assertEqual(run.computed, ["truss", "inserts", "result", "truss_layout", "truss_rebars", "rebar_data"])
+
+    def test_parameter_not_modified(self):
+        payload = detailed_design_payload()
+        payload["truss_detailed"] = {"truss_rebar_mode": 0}
+        parameter = DetailedDesign(**payload)
+        result = DesignPipeline().run(parameter).outputs["result"]
+        self.assertIsNone(parameter.truss_detailed.top_rebar)
+        self.assertEqual(result.detailed_design.truss_detailed.top_rebar.diameter, 10)
+
+
+class TestDesignSession(TestCase):
+    def test_lazy(self):
+        session = DesignSession(DetailedDesign(**detailed_design_payload()))
+        self.assertGreater(session.result.volume, 0)
+        self.assertEqual(session.computed, ["geometry", "rebar", "truss", "inserts", "result"])
+
+        self.assertTrue(session.rebar_for_BVBS.horizontal_rebars)
+        self.assertNotIn("fcl_model", session.computed)
+        self.assertEqual(len(session.truss_rebar_for_BIM.truss_rebars), len(session.truss_layout))
+        self.assertIn("fcl_model", session.computed)
+
+    def test_skip_truss(self):
+        result, artifacts, _, _ = run_detailed_design(DetailedDesign(**detailed_design_payload()), truss=False)
+        self.assertIsNone(artifacts.truss_rebar_for_BIM)
+        self.assertTrue(artifacts.rebar_for_BVBS.vertical_rebars)
+
+
+class TestInstrumentation(TestCase):
+    def test_session_metrics(self):
+        session = DesignSession(DetailedDesign(**detailed_design_payload()))
+        session.detailed_design_output()
+        metrics = session.metrics
+        self.assertEqual(metrics.spans["design.fcl_model"].count, 1)
+        self.assertEqual(metrics.counters["rebar.horizontal"], len(session.rebar_for_BIM.horizontal_rebars))
+        self.assertGreater(metrics.counters["fcl.objects"], 0)
+
+        again = DesignSession(DetailedDesign(**detailed_design_payload()), pipeline=session.pipeline)
+        again.result
+        self.assertEqual(again.metrics.spans["design.result"].count, 1)
+
+    def test_exporters(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        exporter = instrumentation.PrometheusExporter(directory, interval=3600)
+        instrumentation.add_exporter(exporter)
+        self.addCleanup(instrumentation.remove_exporter, exporter)
+
+        with self.assertLogs("DoubleWallDesign.instrumentation", level="INFO") as logs:
+            instrumentation.configure(log=True)
+            self.addCleanup(instrumentation.configure)
+            with instrumentation.span("test.span"):
+                instrumentation.count("test.items", 3)
+        self.assertEqual(json.loads(logs.records[0].getMessage())["name"], "test.span")
+
+        exporter.write()
+        with open(exporter.path, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('shear_wall_design_span_count_total{span="test.span"', text)
+        self.assertIn('shear_wall_design_items_total{name="test.items"', text)
+
+    def test_prometheus_file_lifecycle(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # 计数时同样写入文件
+        exporter = instrumentation.PrometheusExporter(directory, interval=0)
+        exporter.on_count("test.items", 3)
+        self.assertTrue(os.path.exists(exporter.path))
+        exporter.close()
+        self.assertEqual(os.listdir(directory), [])
+
+        exporter = instrumentation.PrometheusExporter(directory, interval=3600, keep_file=True)
+        exporter.write()
+        exporter.on_count("test.items", 5)
+        exporter.close()  # 写入最终的统计数据
+        with open(exporter.path, encoding="utf-8") as f:
+            self.assertIn('name="test.items",pid=', f.read())
+
+        # 进程池的子进程退出时删除其文件
+        os.remove(exporter.path)
+        executor = ProcessPoolExecutor(max_workers=1, initializer=instrumentation.configure, initargs=(False, directory))
+        executor.submit(instrumentation.count, "test.items", 3).result()
+        self.assertEqual(len(os.listdir(directory)), 1)
+        executor.shutdown(wait=True)
+        self.assertEqual(os.listdir(directory), [])
+
+
+    def test_concurrent_write(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        exporter = instrumentation.PrometheusExporter(directory, interval=0)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(exporter.on_count, "test.items", 1) for _ in range(200)]
+        for future in futures:
+            future.result()
+        exporter.write()
+        with open(exporter.path, encoding="utf-8") as f:
+            self.assertIn('name="test.items",pid="%d"} 200' % os.getpid(), f.read())
+
+    def test_exporter_error(self):
+        exporter = mock.Mock()
+        exporter.on_span.side_effect = OSError("disk full")
+        exporter.on_count.side_effect = OSError("disk full")
+        instrumentation.add_exporter(exporter)
+        self.addCleanup(instrumentation.remove_exporter, exporter)
+        with self.assertLogs("DoubleWallDesign.instrumentation", level="WARNING"):
+            with instrumentation.collect() as summary:
+                instrumentation.count("test.items", 3)
+                # 输出出错时保留计算本身的异常
+                with self.assertRaises(ZeroDivisionError):
+                    with instrumentation.span("test.span"):
+                        1 / 0
+        self.assertEqual(summary.counters["test.items"], 3)
+        self.assertEqual(summary.spans["test.span"].count, 1)
+
+
+class TestRebarOpt(TestCase):
+    # (墙厚, 配筋率, 内页厚度, 外页厚度, 保护层厚度) -> [(直径, 间距)], 与查表前的逐项搜索结果一致
+    CASES = [
+        ((250, 0.3, 50, 50, 15), [(10, 200)]),
+        ((250, 0.4, 60, 60, 15), [(8, 100)]),
+        ((250, 0.7, 60, 60, 15), [(12, 150), (14, 150)]),
+        ((250, 1.0, 60, 60, 15), [(12, 100), (14, 100)]),
+        ((200, 2.0, 70, 70, 10), [(16, 100)]),
+        ((300, 0.05, 50, 50, 15), [(8, 250)]),
+    ]
+
+    def test_rebar_opt(self):
+        for parameter, expected in self.CASES:
+            rebars = rebar_opt(*parameter)
+            self.assertEqual([(rebar.diameter, rebar.spacing) for rebar in rebars], expected, parameter)
+
+    def test_batch(self):
+        parameters = [parameter for parameter, _ in self.CASES]
+        batch = rebar_opt_batch(*zip(*parameters))
+        self.assertEqual(batch, [rebar_opt(*parameter) for parameter in parameters])
+        # 标量参数广播
+        self.assertEqual(
+            rebar_opt_batch([250, 250], [0.7, 1.0], 60, 60, 15),
+            [rebar_opt(250, 0.7, 60, 60, 15), rebar_opt(250, 1.0, 60, 60, 15)],
+        )
+        with self.assertRaises(IndexError):
+            rebar_opt_batch([250, 250], 0.3, 50, 50, [15, 20])
+
+    def test_pareto(self):
+        options = rebar_pareto(250, 0.7, 60, 60, 15)
+        self.assertEqual(
+            [([(rebar.diameter, rebar.spacing) for rebar in option.rebars], option.diameter_number)
+             for option in options],
+            [([(12, 150), (14, 150)], 2), ([(12, 125)], 1), ([(14, 150)], 1)],
+        )
+        objectives = [(option.area, option.bars_per_meter, option.diameter_number) for option in options]
+        self.assertEqual(objectives, sorted(objectives))
+        for first in objectives:  # 互不支配
+            for second in objectives:
+                self.assertFalse(first != second and all(a <= b for a, b in zip(first, second)))
+        parameters = [parameter for parameter, _ in self.CASES]
+        batch = rebar_pareto_batch(*zip(*parameters))
+        self.assertEqual(batch, [rebar_pareto(*parameter) for parameter in parameters])
+        self.assertEqual([options[0].rebars for options in batch], rebar_opt_batch(*zip(*parameters)))
+        # 没有满足要求的组合时与 rebar_opt 相同
+        self.assertEqual([option.rebars for option in rebar_pareto(250, 5.0, 50, 50, 15)],
+                         [rebar_opt(250, 5.0, 50, 50, 15)])
+
+    def test_pareto_tie(self):
+        # 10@125 与 12@180 面积相同,rebar_opt 取表中靠前的 10@125,即使被根数更少的 12@180 支配仍为第一项
+        rebars, options = rebar_opt(250, 0.5, 60, 60, 15, strategy="pareto")
+        self.assertEqual(rebars, rebar_opt(250, 0.5, 60, 60, 15))
+        self.assertEqual([[(rebar.diameter, rebar.spacing) for rebar in option.rebars] for option in options],
+                         [[(10, 125)], [(12, 180)], [(14, 240)]])
+        self.assertAlmostEqual(options[0].area, options[1].area)
+        self.assertEqual(rebar_pareto_batch([250, 250], [0.5, 0.7], 60, 60, 15),
+                         [options, rebar_pareto(250, 0.7, 60, 60, 15)])
+        with self.assertRaises(Exception):
+            rebar_opt(250, 0.5, 60, 60, 15, strategy="other")
+
+
+class TestTrussLayout(TestCase):
+    def test_layout_opt(self):
+        session = DesignSession(DetailedDesign(**detailed_design_payload()))
+        result, fcl_model = session.result, session.fcl_model
+        objs = len(fcl_model.objs)
+        layout = layout_opt(fcl_model, result, max_iterations=30, seed=1)
+        self.assertEqual(layout, layout_opt(fcl_model, result, max_iterations=30, seed=1))
+        self.assertEqual(len(fcl_model.objs), objs)
+
+        problem = truss_layout_problem(result)
+        positions = [truss[0][0] for truss in layout]
+        self.assertEqual(len(positions), problem.truss_number)
+        self.assertEqual(positions, sorted(positions))
+        for x in positions:
+            self.assertTrue(problem.edge_margin <= x <= problem.length - problem.edge_margin)
+            # 不占用洞口与预埋件
+            for x_min, x_max in problem.obstacles:
+                self.assertTrue(x + problem.truss_width / 2 <= x_min or x - problem.truss_width / 2 >= x_max)
+        checker = TrussCollisionChecker(fcl_model, result, [layout[0][0][2], layout[0][1][2]])
+        self.assertFalse(any(checker.collides(x) for x in positions))
+
+    def test_fitness_batch(self):
+        problem = TrussLayoutProblem(length=1000, truss_number=2, truss_width=100, edge_margin=60,
+                                     obstacles=[[400, 600]])
+        population = np.array([
+            [250, 750],  # 均匀排布
+            [250, 800],  # 间距不均匀
+            [250, 600],  # 与洞口重叠 50mm
+            [30, 750],  # 超出墙边距 30mm
+        ])
+        scores = truss_fitness_batch(population, problem)
+        self.assertEqual(scores[0], 0)
+        self.assertGreater(scores[1], 0)
+        self.assertGreaterEqual(scores[2], 500)
+        self.assertGreaterEqual(scores[3], 300)
+        self.assertEqual(scores.tolist(), [truss_fitness(positions, problem) for positions in population])
+
+
+class TestShearWallFCLModel(TestCase):
+    def test_incremental_manager(self):
+        fcl_model = ShearWallFCLModel()
+        probe = fcl_model.new_obj(fcl_model.new_rebar_fcl([[100, 50, 0], [100, 50, 1000]], 10))
+        self.assertFalse(fcl_model.collision_check_add(probe))
+        fcl_model.add_rebar([[0, 50, 500], [1000, 50, 500]], 10)
+        self.assertTrue(fcl_model.collision_check_add(probe))
+        fcl_model.add_rebar([[300, 50, 0], [300, 50, 1000]], 10)
+        self.assertEqual(fcl_model.manager.size(), len(fcl_model.objs))
+        # 查询不改变模型
+        self.assertTrue(fcl_model.collision_check_add(probe))
+        self.assertEqual(fcl_model.manager.size(), 2)
+
+    def test_collision_agent(self):
+        fcl_model = ShearWallFCLModel()
+        fcl_model.add_rebar([[0, 50, 500], [1000, 50, 500]], 10)
+        fcl_model.add_rebar([[300, 50, 0], [300, 50, 1000]], 10)
+        positions = [[100, 50, 500], [100, 50, 509], [100, 50, 511], [300, 80, 200], [600, 50, 800]]
+        collisions = [fcl_model.collision_agent(Agent(size=10, position=position)) for position in positions]
+        self.assertEqual(collisions, [True, True, False, False, False])
+        self.assertEqual(fcl_model.collision_agents(positions, 10).tolist(), collisions)
+        self.assertEqual(fcl_model.collision_agents([], 10).tolist(), [])
+        # 胶囊体: 与竖向钢筋相交,端点均不碰撞
+        self.assertTrue(fcl_model.collision_agent(Agent(size=10, position=[200, 50, 200], end=[400, 50, 200])))
+        self.assertFalse(fcl_model.collision_agent(Agent(size=10, position=[200, 50, 200], end=[280, 50, 200])))
+        self.assertEqual(len(fcl_model.objs), 2)
+
+    def test_analytic_cross_check(self):
+        rng = np.random.default_rng(0)
+
+        def random_obj():
+            position = rng.uniform(0, 400, 3)
+            kind = rng.integers(5)
+            if kind == 0:
+                return Box_fcl(*rng.uniform(5, 100, 3), position=position)
+            if kind == 1:
+                return Cylinder_fcl(radius=rng.uniform(3, 30), length=rng.uniform(5, 200), position=position)
+            # 沿坐标轴或斜向的钢筋与长方体,斜向的由 fcl 检测
+            direction = np.eye(3)[rng.integers(3)] * rng.choice([-1, 1]) if kind < 4 else rng.normal(size=3)
+            transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), direction.reshape(1, 3))
+            if kind == 2:
+                return Diagonal_fcl(*rng.uniform(5, 100, 3), transformation=transformation, position=position)
+            return Rebar_fcl(diameter=rng.uniform(6, 30), length=rng.uniform(5, 300), transformation=transformation,
+                             position=position)
+
+        fcl_model = ShearWallFCLModel()
+        fcl_model.add_obj([random_obj() for _ in range(40)])
+        self.assertTrue(0 < len(fcl_model.shapes) < len(fcl_model.objs))
+
+        def expected_pair(obj, other) -> bool:
+            return bool(fcl.collide(obj, other, fcl.CollisionRequest()))
+
+        def expected(obj) -> bool:
+            return any(expected_pair(obj, other) for other in fcl_model.objs)
+
+        positions = rng.uniform(-20, 420, (300, 3))
+        collisions = [expected(fcl.CollisionObject(fcl.Sphere(5), fcl.Transform(position))) for position in positions]
+        self.assertTrue(any(collisions) and not all(collisions))
+        self.assertEqual(fcl_model.collision_agents(positions, 10).tolist(), collisions)
+        self.assertEqual([fcl_model.collision_agent(Agent(size=10, position=position)) for position in positions],
+                         collisions)
+        probes = [random_obj() for _ in range(200)]
+        self.assertEqual([fcl_model.collision_check([probe]) for probe in probes],
+                         [expected(fcl_model.new_obj([probe])[0]) for probe in probes])
+
+        # 相切的钢筋与长方体: 与 fcl 相同,相切不算碰撞,略微重叠为碰撞
+        def bar(axis: int, position) -> Rebar_fcl:
+            transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), np.eye(3)[axis].reshape(1, 3))
+            return Rebar_fcl(diameter=10, length=100, transformation=transformation, position=np.array(position))
+
+        pairs = [
+            (bar(2, [0., 0, 0]), bar(2, [10., 0, 0])),  # 平行
+            (bar(2, [0., 0, 0]), bar(2, [0., 0, 100])),  # 端部对接
+            (bar(2, [0., 0, 0]), bar(0, [0., 10, 0])),  # 垂直交叉
+            (bar(2, [0., 0, 0]), Box_fcl(20, 20, 20, position=np.array([15., 0, 0]))),
+            (bar(2, [0., 0, 0]), Box_fcl(20, 20, 20, position=np.array([0., 0, 60]))),
+        ]
+        for first, second in pairs:
+            for shift, collide in ((0, False), (-1e-3, True)):
+                second.position = second.position + shift * np.sign(second.position)
+                for fixed, probe in ((first, second), (second, first)):
+                    model = ShearWallFCLModel()
+                    model.add_obj([fixed])
+                    self.assertEqual(model.collision_check([probe]), collide, (fixed, probe))
+                    self.assertEqual(expected_pair(model.objs[0], model.new_obj([probe])[0]), collide)
+
+    def test_sweep_agent(self):
+        fcl_model = ShearWallFCLModel()
+        fcl_model.add_obj([Box_fcl(x=100, y=100, z=100, position=np.array([0, 0, 500])),
+                           Box_fcl(x=60, y=100, z=40, position=np.array([30, 0, 800]))])
+        # 沿 z 向移动,球面在 z = 445 处接触长方体底面
+        self.assertAlmostEqual(fcl_model.sweep_agent([0, 0, 0], [0, 0, 1000], 10), 0.445, places=6)
+        self.assertIsNone(fcl_model.sweep_agent([0, 0, 0], [0, 0, 400], 10))
+        # 斜向移动: 先经过的长方体在后加入的长方体之前接触
+        start, end = np.array([54., 0, 446]), np.array([0., 0, 1195])
+        hit = fcl_model.sweep_agent(start, end, 10)
+        samples = np.linspace(0, 1, 10001)
+        collisions = fcl_model.collision_agents(start + samples[:, None] * (end - start), 10)
+        self.assertAlmostEqual(hit, samples[np.argmax(collisions)], places=3)
+        # 斜向长方体由 fcl 保守推进
+        transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), np.array([[1, 0, 1]]))
+        fcl_model.add_obj([Diagonal_fcl(x=50, y=50, z=200, transformation=transformation,
+                                        position=np.array([300, 0, 200]))])
+        hit = fcl_model.sweep_agent([300, 0, 0], [300, 0, 400], 10)
+        self.assertTrue(0 < hit < 0.5)
+        self.assertFalse(fcl_model.collision_agent(Agent(size=10, position=[300, 0, 400 * hit - 0.01])))
+        self.assertTrue(fcl_model.collision_agent(Agent(size=10, position=[300, 0, 400 * hit + 0.01])))
+
+    def test_free_shift(self):
+        rng = np.random.default_rng(1)
+        fcl_model = ShearWallFCLModel()
+        transformation = rotation_matrix_from_vectors(np.array([[0, 0, 1]]), np.array([[1, 1, 1]]))
+        fcl_model.add_obj([Box_fcl(*rng.uniform(5, 60, 3), position=rng.uniform(0, 200, 3)) for _ in range(20)] +
+                          [Diagonal_fcl(20, 20, 100, transformation=transformation, position=np.array([100, 100, 100]))])
+        for i in range(20):
+            fcl_model.add_rebar([[10 * i, 0, 50], [10 * i, 200, 50]], 6)
+
+        def linear(collides):
+            return next((k for k in range(1, 302) if not collides(k)), None)
+
+        for position in rng.uniform(0, 200, (30, 3)):
+            for action in np.eye(3)[rng.permutation(3)[:2]] * rng.choice([-1, 1], 2)[:, None]:
+                self.assertEqual(
+                    fcl_model.free_agent_shift(position, action, 10, 301),
+                    linear(lambda k: fcl_model.collision_agent(Agent(size=10, position=position + k * action))))
+                rebar = np.array([position, position + [0, 0, 80], position + [60, 0, 80]])
+                self.assertEqual(
+                    fcl_model.free_rebar_shift(rebar, action, 8, 301),
+                    linear(lambda k: fcl_model.collision_check_add(
+                        fcl_model.new_obj(fcl_model.new_rebar_fcl(rebar + k * action, 8)))))
+
+    def test_apf_continuous(self):
+        fcl_model = ShearWallFCLModel()
+        fcl_model.add_obj([Box_fcl(x=100, y=100, z=100, position=np.array([0, 0, 500]))])
+        start, end = np.array([0., 0, 0]), np.array([0., 0, 1200])
+        discrete = APF(start, end, fcl_model, 10, 0, np.array([1., 0, 0]))
+        continuous = APF(start, end, fcl_model, 10, 0, np.array([1., 0, 0]), continuous=True)
+        self.assertLess(len(continuous), len(discrete) / 10)
+        # 首次绕开障碍物的位置相同
+        def detour(points):
+            first = next(i for i, point in enumerate(points) if abs(point[0]) > 1e-6)
+            return np.round(points[first - 1:first + 1], 6).tolist()
+
+        self.assertEqual(detour(continuous), detour(discrete))
+        self.assertEqual(continuous[-1], end.tolist())
+        self.assertFalse(fcl_model.collision_agents(continuous[1:-1], 10).any())
+
+
+class TestInsertsLayout(TestCase):
+    def automatic(self) -> DetailedDesign:
+        payload = detailed_design_payload()
+        payload["inserts_detailed"].update(
+            lifting_inserts_design_mode=LiftingInsertsDesignMode.AUTOMATIC.value, lifting_inserts_position=None,
+            support_inserts_design_mode=SupportInsertsDesignMode.AUTOMATIC.value, support_inserts_position=None,
+        )
+        return DetailedDesign(**payload)
+
+    def test_place_inserts(self):
+        parameter = self.automatic()
+        session = DesignSession(parameter)
+        inserts = session.result.detailed_design.inserts_detailed
+        self.assertIsNone(parameter.inserts_detailed.lifting_inserts_position)  # 不修改参数
+        self.assertEqual((inserts.lifting_inserts_position.x1, inserts.lifting_inserts_position.x2), (300, 300))
+
+        layout = InsertsLayout(session.result)
+        support = inserts.support_inserts_position
+        for x in (support.x1, layout.length - support.x2):
+            for x_min, x_max in np.vstack([layout.trusses, layout.vertical_rebars]):
+                self.assertTrue(x + 15 <= x_min or x - 15 >= x_max)
+        for z in (support.y1, layout.height - support.y2):
+            for z_min, z_max in layout.horizontal_rebars:
+                self.assertTrue(z + 15 <= z_min or z - 15 >= z_max)
+        # 钢筋位置与生成的内页钢筋一致
+        rebars = session.rebar_for_BIM
+        self.assertEqual(
+            sorted({rebar.poly.points[0].x for rebar in rebars.vertical_rebars if rebar.poly.points[0].y < 50}),
+            (layout.vertical_rebars.mean(axis=1)).tolist(),
+        )
+        # 桁架排布避开自动定位的预埋件
+        for truss in session.truss_layout:
+            self.assertGreaterEqual(abs(truss[0][0] - inserts.lifting_inserts_position.x1), 50 + 8)
+
+    def test_avoid_hole(self):
+        # 洞口位于吊装预埋件目标位置下方
+        parameter = self.automatic()
+        parameter = replace(parameter, geometric_detailed=replace(
+            parameter.geometric_detailed, wall_hole=WallHole.YES, wall_hole_type=WallHoleType.RECTANGLE,
+            wall_hole_parameter=RectangleHole(hole_height=400, hole_length=300, hole_horizontal=300,
+                                              hole_vertical=2400)))
+        inserts = place_inserts(DesignSession(parameter).result)
+        lifting = inserts.lifting_inserts_position
+        self.assertGreaterEqual(lifting.x1, 300 + 150 + 50 + 8)
+        self.assertEqual(lifting.x1, lifting.x2)  # 优先对称
+        # 手动模式不修改
+        manual = DetailedDesign(**detailed_design_payload())
+        self.assertIs(place_inserts(DesignSession(manual).result), manual.inserts_detailed)
+
+    def test_ignore_client_positions(self):
+        # 自动模式下传入的位置(json)转换为数据类,定位时不作为占用
+        payload = detailed_design_payload()
+        payload["inserts_detailed"].update(
+            lifting_inserts_design_mode=LiftingInsertsDesignMode.AUTOMATIC.value,
+            support_inserts_design_mode=SupportInsertsDesignMode.AUTOMATIC.value,
+        )
+        parameter = DetailedDesign(**payload)
+        self.assertIsInstance(parameter.inserts_detailed.lifting_inserts_position, LiftingInsertsPosition)
+        self.assertIsInstance(parameter.inserts_detailed.support_inserts_position, SupportInsertsPosition)
+        expected = DesignSession(self.automatic()).result.detailed_design.inserts_detailed
+        inserts = DesignSession(parameter).result.detailed_design.inserts_detailed
+        self.assertEqual(inserts.lifting_inserts_position, expected.lifting_inserts_position)
+        self.assertEqual(inserts.support_inserts_position, expected.support_inserts_position)
+
+    def test_short_wall(self):
+        # 短墙没有满足净距要求的位置时仍完成深化设计,并记录警告
+        parameter = self.automatic()
+        parameter = replace(parameter, geometric_detailed=replace(
+            parameter.geometric_detailed, length=900,
+            wall_hole_parameter=replace(parameter.geometric_detailed.wall_hole_parameter, hole_horizontal=450)))
+        result, _, _, _ = run_detailed_design(parameter)
+        self.assertEqual(len(result.warnings), 2)
+        lifting = result.detailed_design.inserts_detailed.lifting_inserts_position
+        self.assertLessEqual(lifting.x1 + lifting.x2, 900 - 16 - 50)
+        self.assertEqual(detail_result_summary(result)["warnings"], result.warnings)
+        self.assertEqual(DesignSession(self.automatic()).result.warnings, [])
+
+
+class TestDetailedDesignMany(TestCase):
+    def parameters(self):
+        bad = detailed_design_payload()
+        bad["construction_detailed"]["concrete_cover_thickness"] = 20
+        bad["rebar_detailed"]["rebar_design_mode"] = RebarDesignMode.AUTOMATIC.value
+        other = detailed_design_payload()
+        other["geometric_detailed"]["length"] = 1800
+        return [DetailedDesign(**payload) for payload in (detailed_design_payload(), bad, other)]
+
+    def test_in_order_with_error(self):
+        for processes in (0, 2):
+            outcomes = list(
+                detailed_design_many(self.parameters(), processes=processes, chunksize=1, max_tasks_per_child=1)
+            )
+            self.assertEqual([outcome.index for outcome in outcomes], [0, 1, 2])
+            self.assertEqual([outcome.success for outcome in outcomes], [True, False, True])
+            self.assertIsInstance(outcomes[1].error, IndexError)
+            self.assertIn("rebar_opt", outcomes[1].traceback)
+            self.assertLess(outcomes[2].result.volume, outcomes[0].result.volume)
+            self.assertTrue(outcomes[0].truss_rebar_for_BIM.truss_rebars)
+            self.assertGreater(outcomes[0].seconds, 0)
+            self.assertEqual(outcomes[2].shear_wall_data.length, 1800)
+
+
+class TestSweep(TestCase):
+    def test_parse_range(self):
+        self.assertEqual(parse_range("1800:2400:300"), [1800, 2100, 2400])
+        self.assertEqual(parse_range("0.3:0.5:0.1"), [0.3, 0.4, 0.5])
+        self.assertEqual(parse_range("1950, 2400"), [1950, 2400])
+
+    def test_sweep(self):
+        base = DetailedDesign(**detailed_design_payload())  # 手动配筋
+        # 重复取值与手动配筋时的配筋率不产生新的组合
+        self.assertEqual(len(sweep_points(base, lengths=[1950, 2400, 1950])), 2)
+        points = sweep_points(base, lengths=[1950], thicknesses=[250, 260], rebar_ratios=[0.3, 0.3])
+        self.assertEqual([(point.thickness, point.rebar_ratio) for point in points], [(250, 0.3), (260, 0.3)])
+        # 未扫描的参数与基准参数相同,枚举等类型不变
+        shear_wall_type = ShearWallType(base.geometric_detailed.shear_wall_type)
+        base.geometric_detailed.shear_wall_type = shear_wall_type
+        self.assertIs(sweep_points(base)[0].parameter.geometric_detailed.shear_wall_type, shear_wall_type)
+        self.assertEqual(sweep_points(base)[0].parameter, base)
+        points.append(sweep_points(base, lengths=[100])[0])  # 墙长不足以排布桁架
+
+        rows = list(run_sweep(points, processes=0))
+        self.assertEqual([row["status"] for row in rows], ["ok", "ok", "failed"])
+        self.assertEqual(rows[0]["horizontal_rebars"], "10@200")  # 自动配筋
+        self.assertEqual(rows[0]["layout_status"], "ok")
+        self.assertTrue(rows[2]["error"])
+
+        file = io.StringIO()
+        self.assertEqual(write_sweep_csv(rows, file), 3)
+        self.assertEqual(file.getvalue().splitlines()[0], ",".join(SWEEP_COLUMNS))
+
+
+class TestConverterDataclass(TestCase):
+    def test_generated_post_init(self):
+        rebar = Rebar(4, {"points": [[0, 0, 0], {"x": 1, "y": 2, "z": 3}]})
+        self.assertEqual(rebar.poly, IndexedPolyCurve([Point3D(0, 0, 0), Point3D(1, 2, 3)]))
+        self.assertIsNone(Rebar().poly)  # None 不转换
+        self.assertEqual(Direction(), Direction(1, 0, 0))
+        with self.assertRaises(AttributeError):  # __slots__
+            Point3D().w = 1
+
+    def test_subclass(self):
+        @dataclass_with_converter
+        class Parent:
+            value: int = field_with_converter(converter=int, default=0)
+
+            def __post_converter__(self):
+                self.checked = True
+
+        class Child(Parent):  # 未经装饰的子类使用通用的 post_init
+            pass
+
+        for cls in (Parent, Child):
+            instance = cls("12")
+            self.assertEqual(instance.value, 12)
+            self.assertTrue(instance.checked)
+
+
+class TestPointArray(TestCase):
+    def test_compatible(self):
+        poly = IndexedPolyCurve.from_array([[0, 0, 0], [1, 2, 3]])
+        self.assertEqual(poly, IndexedPolyCurve([Point3D(0, 0, 0), Point3D(1, 2, 3)]))
+        self.assertEqual(poly.points[1], Point3D(1, 2, 3))
+        self.assertEqual(list(poly.points), [Point3D(0, 0, 0), Point3D(1, 2, 3)])
+        self.assertEqual(len(poly.points[1:]), 1)
+        self.assertIs(np.asarray(poly.points).base, poly.points.array.base)  # 不复制
+        # 数组作为 points 时保持数组存储
+        self.assertIsInstance(IndexedPolyCurve(np.zeros((2, 3))).points, PointArray)
+
+    def test_pack(self):
+        polys = PointArray.pack([[[0, 0, 0], [1, 0, 0]], [[0, 1, 0], [1, 1, 0], [2, 1, 0]]])
+        self.assertEqual([len(points) for points in polys], [2, 3])
+        self.assertTrue(np.shares_memory(polys[0].array, polys[1].array.base))
+        rebars = [Rebar(4, IndexedPolyCurve.from_array(points)) for points in polys]
+        loaded = pickle.loads(pickle.dumps(rebars))
+        self.assertEqual(loaded, rebars)
+        self.assertIs(loaded[0].poly.points.array.base, loaded[1].poly.points.array.base)
+
+
+class TestCodec(TestCase):
+    def test_round_trip(self):
+        outputs = detailed_design(DetailedDesign(**detailed_design_payload()))
+        for obj in outputs[:4]:  # 计算结果、BIM 钢筋、BVBS 钢筋、桁架钢筋
+            loaded = decode(encode(obj))
+            self.assertIs(type(loaded), type(obj))
+            self.assertEqual(loaded, obj)
+        rebars = decode(encode(outputs[1])).horizontal_rebars
+        self.assertIsInstance(rebars[0].poly.points, PointArray)
+        self.assertIs(rebars[0].poly.points.array.base, rebars[1].poly.points.array.base)  # 共享的点数组只写一次
+
+    def test_types(self):
+        value = {"hole": WallHole.YES, "ids": (ShearWallID("P", "W"), None), "big": 2 ** 70, "flag": True,
+                 "points": [Point3D(0.5, 1.0, 2.0)], "mixed": [Point3D(1, 2, 3)]}
+        loaded = decode(encode(value))
+        self.assertEqual(loaded, value)
+        self.assertIs(loaded["hole"], WallHole.YES)
+        self.assertIsInstance(loaded["ids"], tuple)
+        self.assertIs(type(loaded["mixed"][0].x), int)
+        points = PointArray([[0.1, 2.0, 3.0]])  # 0.1 不能由 float32 精确表示
+        self.assertEqual(decode(encode(points)).array.tolist(), [[0.1, 2.0, 3.0]])
+        with self.assertRaises(CodecError):
+            encode(object())
+        with self.assertRaises(CodecError):
+            decode(b"JSON" + encode(value)[4:])
+        with self.assertRaises(CodecError):
+            decode(encode(value)[:-1])
+
+
+class TestDetailedDataMapper(TestCase):
+    """
+    detailed_data_2_dict 与 DetailedDataSerializer 的结果应完全一致
+    """
+
+    def assert_same_as_serializer(self, **kwargs):
+        row = WallDetailedData.objects.create(**dict(WALL_DETAILED_DATA, **kwargs))
+        expected = json.loads(json.dumps(DetailedDataSerializer(instance=row).data))
+        self.assertEqual(detailed_data_2_dict(row), expected)
+        values = WallDetailedData.objects.filter(id=row.id).values(*DETAILED_DATA_FIELDS).get()
+        self.assertEqual(detailed_data_2_dict(values), expected)
+        self.assertEqual(detailed_data_2_design(row), DetailedDesign(**expected))
+
+    def test_default(self):
+        self.assert_same_as_serializer()
+
+    def test_manual_and_circle_hole(self):
+        self.assert_same_as_serializer(
+            wall_hole_type=WallHoleType.CIRCLE.value,
+            circle_hole_diameter=300,
+            circle_hole_horizontal=900,
+            circle_hole_vertical=1200,
+            rebar_design_mode=RebarDesignMode.MANUAL.value,
+            horizontal_rebar_diameter=8,
+            horizontal_rebar_spacing=200,
+            vertical_rebar_diameter=10,
+            vertical_rebar_spacing=150,
+        )
+
+    def test_automatic_and_no_hole(self):
+        self.assert_same_as_serializer(
+            wall_hole=WallHole.NO.value,
+            truss_rebar_mode=TrussRebarMode.AUTOMATIC.value,
+            lifting_inserts_design_mode=LiftingInsertsDesignMode.AUTOMATIC.value,
+            support_inserts_design_mode=SupportInsertsDesignMode.AUTOMATIC.value,
+            cast_inserts_design_mode=CastInsertsDesignMode.AUTOMATIC.value,
+            other_inserts_parameters="10,x",
+            other_inserts_positions="[350,",
+        )
+
+
+class TestProjectQuantity(TestCase):
+    def save_result(self, **kwargs) -> WallDetailedResult:
+        row = WallDetailedData.objects.create(**dict(WALL_DETAILED_DATA, **kwargs))
+        result, artifacts, _, _ = run_detailed_design(detailed_data_2_design(row))
+        return detail_result_2_model_result(result, row, artifacts.rebar_for_BVBS)
+
+    def test_result_linked_to_wall(self):
+        first = self.save_result()
+        result = run_detailed_design(detailed_data_2_design(first.wall))[0]
+        again = detail_result_2_model_result(result, first.wall)
+        self.assertEqual(first.id, again.id)
+        self.assertTrue(again.success)
+        self.assertEqual(WallDetailedResult.objects.filter(wall=first.wall).count(), 1)
+        self.assertIsInstance(again.horizontal_rebars, list)
+        self.assertEqual(set(again.horizontal_rebars[0]), {"diameter", "spacing"})
+        self.assertTrue(first.rebar_quantities.exists())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            WallDetailedResult.objects.create(wall=first.wall)
+
+    def test_project_totals(self):
+        first = self.save_result()
+        second = self.save_result(shear_wall_num="WSPQ-1928-13")
+        self.save_result(project_num="CZ2")
+
+        url = reverse("design:project-quantities", args=["CZ1"])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user("designer"))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["wall_number"], 2)
+        self.assertAlmostEqual(data["concrete_volume"], first.volume + second.volume)
+
+        rebars = list(first.rebar_quantities.all()) + list(second.rebar_quantities.all())
+        self.assertAlmostEqual(data["steel_weight"], sum(rebar.weight for rebar in rebars))
+        diameters = sorted({rebar.diameter for rebar in rebars})
+        self.assertEqual([item["diameter"] for item in data["steel_by_diameter"]], diameters)
+        for item in data["steel_by_diameter"]:
+            same = [rebar for rebar in rebars if rebar.diameter == item["diameter"]]
+            self.assertEqual(item["total_quantity"], sum(rebar.quantity for rebar in same))
+            self.assertAlmostEqual(item["total_length"], sum(rebar.length * rebar.quantity for rebar in same))
+
+
+class TestDesignArtifact(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = self.settings(DESIGN_ARTIFACT_ROOT=self.root, DESIGN_ARTIFACT_GZIP=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        row = WallDetailedData.objects.create(**WALL_DETAILED_DATA)
+        result, artifacts, _, _ = run_detailed_design(detailed_data_2_design(row))
+        self.result = detail_result_2_model_result(result, row)
+        paths = export_design_artifacts(result, artifacts, artifact_temp_dir(), ["bvbs"])
+        self.artifact = store_artifact(self.result, "bvbs", paths["bvbs"])
+        with open(artifact_path(self.artifact.sha256, "bvbs"), "rb") as f:
+            self.content = f.read()
+        self.url = reverse("design:result-artifact", args=[self.result.id, "bvbs"])
+        self.client.force_login(User.objects.create_user("designer"))
+
+    def test_content_addressed(self):
+        self.assertEqual(self.artifact.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.artifact.size, len(self.content))
+        self.assertTrue(self.content.startswith(b"BF2D@"))
+        # 相同内容再次保存,只保留一份文件
+        result, artifacts, _, _ = run_detailed_design(detailed_data_2_design(self.result.wall))
+        paths = export_design_artifacts(result, artifacts, artifact_temp_dir(), ["bvbs"])
+        again = store_artifact(self.result, "bvbs", paths["bvbs"])
+        self.assertEqual(again.id, self.artifact.id)
+        self.assertEqual(os.listdir(artifact_temp_dir()), [])
+
+    def test_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["ETag"], f'"{self.artifact.sha256}"')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.artifact.sha256}"')
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.content)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5-14")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 5-14/{len(self.content)}")
+        self.assertEqual(b"".join(response.streaming_content), self.content[5:15])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-10", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_require_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class TestDesignJob(TestCase):
+    def setUp(self):
+        design_cache.clear()
+        self.executor = mock.Mock()
+        self.executor.submit.side_effect = lambda *args, **kwargs: Future()
+        patcher = mock.patch("design.jobs.get_design_executor", return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_submit_once(self):
+        job = WallDesignJob.objects.create(wall=WallDetailedData.objects.create(**WALL_DETAILED_DATA))
+        futures = [submit_design_job(job.id), submit_design_job(job.id)]
+        self.assertIsInstance(futures[0], Future)
+        self.assertIsNone(futures[1])
+        self.assertEqual(self.executor.submit.call_count, 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, WallDesignJob.STATUS_RUNNING)
+
+    def test_requeue_running(self):
+        wall = WallDetailedData.objects.create(**WALL_DETAILED_DATA)
+        job = WallDesignJob.objects.create(wall=wall, status=WallDesignJob.STATUS_RUNNING)
+        run = ProjectDesignRun.objects.create(project_num="CZ1")
+        project_job = WallDesignJob.objects.create(wall=wall, status=WallDesignJob.STATUS_RUNNING, project_run=run)
+        self.assertEqual(requeue_running_jobs(), 1)
+        self.assertIsInstance(submit_design_job(job.id), Future)
+        project_job.refresh_from_db()
+        self.assertEqual(project_job.status, WallDesignJob.STATUS_RUNNING)
+
+
+    def test_command_keep_running_by_default(self):
+        job = WallDesignJob.objects.create(
+            wall=WallDetailedData.objects.create(**WALL_DETAILED_DATA), status=WallDesignJob.STATUS_RUNNING
+        )
+        with mock.patch("design.management.commands.run_design_jobs.shutdown_design_executor"):
+            call_command("run_design_jobs", "--once", stdout=io.StringIO())
+            job.refresh_from_db()
+            self.assertEqual(job.status, WallDesignJob.STATUS_RUNNING)
+            call_command("run_design_jobs", "--once", "--requeue-running", stdout=io.StringIO())
+        self.executor.submit.assert_called_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, WallDesignJob.STATUS_RUNNING)
+
+
+class TestDesignExecutor(TestCase):
+    def setUp(self):
+        shutdown_design_executor()
+        self.addCleanup(shutdown_design_executor)
+
+    def test_recover_broken_pool(self):
+        # 计算进程异常退出后进程池不可用
+        crashed = get_design_executor().submit(os._exit, 1)
+        with self.assertRaises(BrokenExecutor):
+            crashed.result()
+        self.assertEqual(submit_design_task(abs, -1).result(), 1)
+
+    def test_submit_job_after_crash(self):
+        broken, executor = mock.Mock(), mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool("crashed")
+        executor.submit.side_effect = lambda *args, **kwargs: Future()
+        job = WallDesignJob.objects.create(wall=WallDetailedData.objects.create(**WALL_DETAILED_DATA))
+        with mock.patch("design.jobs._create_executor", side_effect=[broken, executor]):
+            self.assertIsInstance(submit_design_job(job.id), Future)
+        broken.shutdown.assert_called_once_with(wait=False)
+        job.refresh_from_db()
+        self.assertEqual(job.status, WallDesignJob.STATUS_RUNNING)
+
+
+class TestProjectDesignRun(TestCase):
+    def setUp(self):
+        design_cache.clear()
+        override = self.settings(DESIGN_ARTIFACT_KINDS=[])
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_run_project(self):
+        for number in range(3):
+            WallDetailedData.objects.create(**dict(WALL_DETAILED_DATA, shear_wall_num=f"WSPQ-{number}"))
+        WallDetailedData.objects.create(**dict(WALL_DETAILED_DATA, shear_wall_num="WSPQ-9", thickness=None))
+        WallDetailedData.objects.create(**dict(WALL_DETAILED_DATA, project_num="CZ2"))
+
+        run = create_project_design_run("CZ1", worker_number=2)
+        self.assertEqual(run.total, 4)
+        progress = []
+        run = run_project_design(run.id, batch_size=2, on_progress=lambda item: progress.append(item.finished_number))
+
+        self.assertEqual(run.status, ProjectDesignRun.STATUS_FINISHED)
+        self.assertEqual((run.done, run.failed), (3, 1))
+        self.assertEqual(progress, [2, 4])
+        self.assertEqual(run.progress, 1.0)
+        self.assertIsNone(run.eta_seconds)
+        self.assertEqual(WallDetailedResult.objects.for_project("CZ1").count(), 3)
+        self.assertFalse(WallDetailedResult.objects.for_project("CZ2").exists())
+        failed = run.jobs.get(status=WallDesignJob.STATUS_FAILED)
+        self.assertEqual(failed.wall.shear_wall_num, "WSPQ-9")
+        # 参数相同的墙体只计算一次
+        self.assertEqual(len(design_cache), 1)
+
+        url = reverse("design:project-run", args=[run.id])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user("designer"))
+        self.assertEqual(self.client.get(url).json()["done"], 3)
+
+    def test_resume(self):
+        WallDetailedData.objects.create(**WALL_DETAILED_DATA)
+        run = create_project_design_run("CZ1")
+        run.jobs.update(status=WallDesignJob.STATUS_RUNNING)  # 模拟中断
+        run = run_project_design(run.id, executor=ThreadPoolExecutor(max_workers=1))
+        self.assertEqual((run.status, run.done, run.failed), (ProjectDesignRun.STATUS_FINISHED, 1, 0))
+        # 已完成的任务不再计算
+        run = run_project_design(run.id, executor=ThreadPoolExecutor(max_workers=1))
+        self.assertEqual((run.total, run.done), (1, 1))
+        self.assertEqual(WallDesignJob.objects.count(), 1)
@@ -14,6 +14,7 @@ from DoubleWallDesign.models import (
     DetailedDesign,
 )
 
+from DoubleWallDesign.session import DesignSession
 from DoubleWallDesign.tools import DetailedCalculationBook
 
 # from stair_for_bvbs.data_for_bvbs import data_for_bvbs
@@ -55,13 +56,10 @@ def call_detailed_design(detailed_row: WallDetailedData) -> Optional[DetailedDes
     """
     双皮剪力墙深化设计调用函数
     """
-    detailed_serializer = detailed.DetailedDataSerializer(instance=detailed_row)
+    detailed_parameter = detailed.detailed_data_2_design(detailed_row)
 
-    detailed_parameter = Detailed(
-        **dict(detailed_serializer.data)
-    )
-
-    result = detailed_design(detailed_parameter)[0]
+    # 只计算深化设计结果,不生成钢筋与桁架排布
+    result = DesignSession(detailed_parameter).result
 
     return result
 
@@ -71,8 +69,9 @@ def call_detailed_design_by_model(
     """
     传入表模型,返回表模型,封装深化设计调用过程
     """
-    detailed_design_result: DetailedDesignResult = call_detailed_design(detail_row)
+    detailed_parameter = detailed.detailed_data_2_design(detail_row)
+    detailed_design_result, _, rebar_for_BVBS, _, _ = detailed_design(detailed_parameter)
     result: WallDetailedResult = detail_result_2_model_result(
-        detailed_design_result, detail_row
+        detailed_design_result, detail_row, rebar_for_BVBS
     )
     return result
\ No newline at end of file
@@ -7,4 +7,20 @@ app_name = "design"
 
 urlpatterns = [
     # path('test', views.render("nihao"))
+    path("detailed/bulk/", views.BulkDetailedDesignView.as_view(), name="detailed-bulk"),
+    path(
+        "projects/<str:project_num>/quantities/",
+        views.ProjectQuantityView.as_view(),
+        name="project-quantities",
+    ),
+    path(
+        "project-runs/<int:run_id>/",
+        views.ProjectDesignRunView.as_view(),
+        name="project-run",
+    ),
+    path(
+        "results/<int:result_id>/artifacts/<str:kind>/",
+        views.ResultArtifactDownloadView.as_view(),
+        name="result-artifact",
+    ),
 ]
\ No newline at end of file
@@ -1,13 +1,218 @@
-from django.shortcuts import render
-from rest_framework import pagination
+import json
+import logging
+from concurrent.futures import BrokenExecutor, Future, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from rest_framework import pagination, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from DoubleWallDesign.models import DetailedDesign, ShearWallID
+
+from .artifacts import ARTIFACT_EXTENSION, artifact_response
+from .cache import CachedDesign, design_cache, detailed_design_key
+from .exchange.detailed import detail_result_summary
+from .jobs import submit_design_task
+from .models import ProjectDesignRun, WallDesignArtifact, WallDetailedResult
+from .workers import run_detailed_design
+
+_logger = logging.getLogger(__name__)
+
 
 # Create your views here.
 class DefaultLimitOffsetPagination(pagination.LimitOffsetPagination):
     max_limit = 20
     default_limit = 10
 
+
+class BulkDetailedDesignView(APIView):
+    """
+    批量深化设计
+
+    请求体为 DetailedDesign 参数列表,计算在进程池中并行执行,
+    每完成一项即以 NDJSON 的形式返回一行,单项失败不影响其他项,命中缓存的项不再计算:
+    {"index": 0, "success": true, "result": {...}, "seconds": 0.01, "cached": false}
+    {"index": 1, "success": false, "error": "..."}
+
+    计算进程异常退出时进程池内未完成的项会一并失败,这些项在重建的进程池中逐项重新计算一次,
+    仅使计算进程退出的项返回失败
+
+    每次请求的参数数量不超过 settings.DESIGN_BULK_MAX_ITEMS
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "请求体应为深化设计参数列表"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_items = getattr(settings, "DESIGN_BULK_MAX_ITEMS", 100)
+        if len(items) > max_items:
+            return Response(
+                {"detail": f"每次请求最多 {max_items} 项深化设计参数"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        response = StreamingHttpResponse(
+            self._stream(items), content_type="application/x-ndjson"
+        )
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def _stream(items: List) -> Iterator[str]:
+        pending: Dict[str, Future] = {}  # 参数相同的项只计算一次
+        waiting: Dict[Future, List[Tuple[int, ShearWallID]]] = {}
+        parameters: Dict[Future, DetailedDesign] = {}
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise TypeError(f"参数类型错误:{type(item).__name__}")
+                parameter = DetailedDesign(**item)
+                key = detailed_design_key(parameter)
+            except Exception as e:
+                yield _ndjson_line({"index": index, "success": False, "error": repr(e)})
+                continue
+            if key in pending:
+                waiting[pending[key]].append((index, parameter.shear_wall_id))
+                continue
+            cached = design_cache.get(key)
+            if cached is not None:
+                yield _success_line(index, cached.for_shear_wall(parameter.shear_wall_id), 0.0, True)
+                continue
+            future = _submit_design(parameter)
+            pending[key] = future
+            waiting[future] = [(index, parameter.shear_wall_id)]
+            parameters[future] = parameter
+
+        keys = {future: key for key, future in pending.items()}
+        crashed = set()
+        for future in as_completed(waiting):
+            if isinstance(future.exception(), BrokenExecutor):
+                crashed.add(future)
+                continue
+            yield from _result_lines(future, waiting[future], keys[future])
+        # 按提交顺序逐项重新计算,避免再次异常退出时影响其他项
+        for future in [future for future in waiting if future in crashed]:
+            retry = _submit_design(parameters[future])
+            yield from _result_lines(retry, waiting[future], keys[future])
+
+
+class ProjectQuantityView(APIView):
+    """
+    项目工程量汇总,仅统计计算成功的深化设计结果,汇总在数据库中完成
+
+    混凝土体积(m^3)、面积(m^2)、重量(T),以及按直径汇总的钢筋数量、总长(mm)、重量(kg)
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, project_num: str, *args, **kwargs):
+        results = WallDetailedResult.objects.for_project(project_num)
+        totals = results.concrete_totals()
+        steel = list(results.steel_by_diameter())
+        return Response(
+            {
+                "project_num": project_num,
+                "wall_number": totals["wall_number"],
+                "concrete_volume": totals["volume"],
+                "concrete_area": totals["area"],
+                "concrete_weight": totals["weight"],
+                "steel_weight": sum(item["total_weight"] for item in steel),
+                "steel_by_diameter": steel,
+            }
+        )
+
+
+class ProjectDesignRunView(APIView):
+    """
+    项目整体深化设计进度,供前端轮询
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, run_id: int, *args, **kwargs):
+        run = get_object_or_404(ProjectDesignRun, id=run_id)
+        return Response(
+            {
+                "id": run.id,
+                "project_num": run.project_num,
+                "status": run.status,
+                "total": run.total,
+                "done": run.done,
+                "failed": run.failed,
+                "progress": run.progress,
+                "elapsed_seconds": run.elapsed_seconds,
+                "eta_seconds": run.eta_seconds,
+            }
+        )
+
+
+class ResultArtifactDownloadView(APIView):
+    """
+    下载深化设计文件,支持 ETag、Range 请求与 gzip
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, result_id: int, kind: str, *args, **kwargs):
+        artifact = get_object_or_404(
+            WallDesignArtifact.objects.select_related("result__wall"), result_id=result_id, kind=kind
+        )
+        wall = artifact.result.wall
+        name = wall.remark_name if wall is not None and wall.remark_name else f"result-{result_id}"
+        return artifact_response(request, artifact, f"{name}{ARTIFACT_EXTENSION[kind]}")
+
+
+def _submit_design(parameter: DetailedDesign) -> Future:
+    """
+    投递深化设计,投递失败时返回携带异常的 Future,由调用方按单项失败处理
+    """
+    try:
+        return submit_design_task(run_detailed_design, parameter, truss=False)
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+
+
+def _result_lines(future: Future, items: List[Tuple[int, ShearWallID]], key: str) -> Iterator[str]:
+    try:
+        result, artifacts, started, finished = future.result()
+    except Exception as e:
+        for index, _ in items:
+            _logger.warning(f"批量深化设计第 {index} 项失败: {e!r}")
+            yield _ndjson_line({"index": index, "success": False, "error": repr(e)})
+        return
+    cached = CachedDesign(result=result, artifacts=artifacts)
+    design_cache.put(key, cached)
+    for number, (index, shear_wall_id) in enumerate(items):
+        seconds = finished - started if number == 0 else 0.0
+        yield _success_line(index, cached.for_shear_wall(shear_wall_id), seconds, number > 0)
+
+
+def _success_line(index: int, cached: CachedDesign, seconds: float, from_cache: bool) -> str:
+    return _ndjson_line(
+        {
+            "index": index,
+            "success": True,
+            "result": detail_result_summary(cached.result),
+            "seconds": seconds,
+            "cached": from_cache,
+        }
+    )
+
+
+def _ndjson_line(data: Dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
 # class PreSetModelAPI(ModelViewSet):
 #     queryset = models.PreSetModelData.objects.all()
 #     pagination_class = DefaultLimitOffsetPagination
@@ -17,4 +222,4 @@ class DefaultLimitOffsetPagination(pagination.LimitOffsetPagination):
 #     def list(self, request, *args, **kwargs):
 #         response = super().list(request, *args, **kwargs)
 #         response.headers.setdefault("Access-Control-Allow-Origin", "*")
-#         return response
\ No newline at end of file
+#         return response
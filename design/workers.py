@@ -0,0 +1,131 @@
+"""
+在计算进程中执行的深化设计函数
+
+该模块会被进程池的子进程导入,不能依赖 django(windows 下子进程不会执行 django.setup)
+"""
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from DoubleWallDesign.models import (
+    DetailedDesign,
+    DetailedDesignResult,
+    RebarforBIM,
+    RebarforBVBS,
+    TrussRebarforBIM,
+)
+from DoubleWallDesign.pipeline import DesignPipeline
+from DoubleWallDesign.session import DesignSession
+
+# 每个计算进程保留各阶段的计算结果,同一墙体修改参数后再次计算时只重新计算受影响的阶段
+_pipeline = DesignPipeline()
+
+
+@dataclass
+class DesignArtifacts:
+    """
+    深化设计生成的钢筋数据,用于后续生成 BIM 模型与 BVBS 加工数据
+    """
+    rebar_for_BIM: RebarforBIM
+    rebar_for_BVBS: RebarforBVBS
+    truss_rebar_for_BIM: Optional[TrussRebarforBIM] = None  # 为空时在生成 ifc/dxf 文件时计算
+
+
+def run_detailed_design(
+    parameter: DetailedDesign,
+    truss: bool = True,
+) -> Tuple[DetailedDesignResult, DesignArtifacts, float, float]:
+    """
+    子进程中执行深化设计
+    :param parameter: 深化设计参数
+    :param truss: 是否计算桁架排布与桁架钢筋,不需要时跳过碰撞检测模型与排布优化
+    :return: 深化设计结果, 钢筋数据, 开始时间戳, 结束时间戳
+    """
+    started = time.time()
+    session = DesignSession(parameter, pipeline=_pipeline)
+    artifacts = DesignArtifacts(
+        rebar_for_BIM=session.rebar_for_BIM,
+        rebar_for_BVBS=session.rebar_for_BVBS,
+        truss_rebar_for_BIM=session.truss_rebar_for_BIM if truss else None,
+    )
+    finished = time.time()
+    return session.result, artifacts, started, finished
+
+
+def export_design_artifacts(
+    result: DetailedDesignResult,
+    artifacts: DesignArtifacts,
+    directory: str,
+    kinds: Iterable[str],
+    dxf_template: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    子进程中生成深化设计文件,每个文件写入 directory 下的独立临时文件,互不覆盖
+    :param result: 深化设计结果
+    :param artifacts: 深化设计生成的钢筋数据
+    :param directory: 临时文件目录,与文件仓库位于同一磁盘以便直接移动
+    :param kinds: 需要生成的文件类型 ifc/bvbs/dxf
+    :param dxf_template: dxf 图纸模板路径
+    :return: 文件类型 -> 临时文件路径
+    """
+    from DigitalDesign.create_bvbs import create_bvbs
+    from DigitalDesign.get_data import ShearWallData
+    from DigitalDesign.shear_wall_ifc import shear_wall_IFC_creation
+
+    kinds = set(kinds)
+    shear_wall_data = ShearWallData(detailed_design_result=result)
+    paths = {}
+    try:
+        ifc_doc = None
+        if kinds & {"ifc", "dxf"}:
+            truss_rebar_for_BIM = artifacts.truss_rebar_for_BIM
+            if truss_rebar_for_BIM is None:
+                truss_rebar_for_BIM = DesignSession(result.detailed_design, pipeline=_pipeline).truss_rebar_for_BIM
+            ifc_doc = shear_wall_IFC_creation(
+                artifacts.rebar_for_BIM, truss_rebar_for_BIM, shear_wall_data, save=False
+            )
+        if "ifc" in kinds:
+            paths["ifc"] = _temp_path(directory, ".ifc")
+            ifc_doc.ifcfile.write(paths["ifc"])
+        if "bvbs" in kinds:
+            paths["bvbs"] = _temp_path(directory, ".abs")
+            create_bvbs(ifc_doc, artifacts.rebar_for_BVBS, shear_wall_data, file_name=paths["bvbs"])
+        if "dxf" in kinds:
+            paths["dxf"] = _temp_path(directory, ".dxf")
+            _export_dxf(ifc_doc, dxf_template, paths["dxf"], result.detailed_design)
+    except Exception:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return paths
+
+
+def _temp_path(directory: str, suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    os.close(fd)
+    return path
+
+
+def _export_dxf(ifc_doc, template: str, file_name: str, detailed_design: Optional[DetailedDesign] = None):
+    """
+    由 ifc 模型生成深化设计图纸,需要 pythonocc
+    """
+    import ezdxf
+    from DoubleWallDesign.geometry import DoubleSideWall
+    from GenerateDrawing.generate_occ_data import OCCData, generate_double_wall_geometry
+    from GenerateDrawing.model_data import DoubleShearWallViewData
+    from GenerateDrawing.occ_model import BuildOCCSolid
+    from GenerateDrawing.total_detail_view import DoubleShearWallTotalView
+
+    ifc_file = ifc_doc.ifcfile
+    entity_type = ["IfcStair", "IfcReinforcingBar", "IfcReinforcingBar"]  # 实体名称
+    object_name = ["钢筋", "桁架筋"]  # 对象名称
+    double_wall_geo = generate_double_wall_geometry(ifc_file, entity_type[0], DoubleSideWall())
+    occ_data = OCCData(ifc_file, double_wall_geo, detailed_design=detailed_design)
+    occ_model = BuildOCCSolid(ifc_file, entity_type, object_name, occ_data)
+    model_transform_data = DoubleShearWallViewData(double_wall_geo, entity_type, object_name, occ_model, occ_data)
+    detail_drawing = DoubleShearWallTotalView(ezdxf.readfile(template), model_transform_data)
+    detail_drawing.main_run_process(file_name)
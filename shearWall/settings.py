@@ -124,4 +124,25 @@ STATIC_URL = "static/"
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
\ No newline at end of file
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# 深化设计后台任务进程数,None 表示使用 cpu 核数
+DESIGN_WORKER_NUMBER = int(os.environ["DESIGN_WORKER_NUMBER"]) if os.environ.get("DESIGN_WORKER_NUMBER") else None
+# 项目整体深化设计时每批写入数据库的墙体数量
+DESIGN_PROJECT_BATCH_SIZE = 50
+# 批量深化设计每次请求的最大参数数量
+DESIGN_BULK_MAX_ITEMS = 100
+# 深化设计结果缓存容量(条),0 表示不缓存;缓存在每个进程的内存中,各进程(web、run_design_jobs)互不共享
+DESIGN_CACHE_SIZE = 256
+# 深化设计文件仓库目录,文件按内容哈希保存
+DESIGN_ARTIFACT_ROOT = os.path.join(BASE_DIR, "artifacts")
+# 深化设计完成后自动生成的文件类型,可选 ifc/bvbs/dxf,其中 dxf 需要 pythonocc
+DESIGN_ARTIFACT_KINDS = ["ifc", "bvbs"]
+# 同时保存 gzip 压缩文件,客户端支持时直接下载压缩文件
+DESIGN_ARTIFACT_GZIP = True
+# dxf 图纸模板
+DESIGN_DXF_TEMPLATE = os.path.join(BASE_DIR, "Files", "double_shear_wall_template.dxf")
+# 深化设计性能统计:输出结构化日志(logger DoubleWallDesign.instrumentation)
+DESIGN_METRICS_LOG = False
+# 深化设计性能统计:Prometheus 文本文件目录(每个进程一个文件,进程退出时删除),None 表示不输出
+DESIGN_METRICS_DIR = os.environ.get("DESIGN_METRICS_DIR") or None